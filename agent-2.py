@@ -2,9 +2,12 @@ import os
 import sys
 import json
 import logging
-import difflib
 import re
 from utils.gemini import generate_with_fallback
+from utils.llm_scheduler import llm_priority, PRIORITY_PATCHING
+from utils.key_pool import configured_api_keys
+from utils.prompt_compaction import compact_document
+from utils.cpu_pool import find_close_sentences
 
 
 logging.basicConfig(
@@ -16,13 +19,13 @@ logger = logging.getLogger(__name__)
 
 def get_env_api_key() -> str:
     """
-    Fetch GEMINI_API_KEY from environment. Exit if it's missing.
+    Fetch GEMINI_API_KEY (or the first of GEMINI_API_KEYS) from environment. Exit if it's missing.
     """
-    key = os.getenv("GEMINI_API_KEY")
-    if not key:
-        logger.error("GEMINI_API_KEY environment variable is not set. Aborting.")
+    keys = configured_api_keys(os.getenv("GEMINI_API_KEY"))
+    if not keys:
+        logger.error("GEMINI_API_KEY (or GEMINI_API_KEYS) environment variable is not set. Aborting.")
         sys.exit(1)
-    return key
+    return keys[0]
 
 def load_json_file(filepath: str) -> dict:
     """
@@ -78,7 +81,8 @@ def rewrite_via_llm(original: str, instruction: str, api_key: str) -> str:
         f"\"\"\"{instruction}\"\"\"\n"
     )
     try:
-        output = generate_with_fallback(prompt, api_key)
+        with llm_priority(PRIORITY_PATCHING):
+            output = generate_with_fallback(prompt, api_key, analyzer="rewrite_sentence")
         if output and output.parts: 
             llm_text_output = output.text.strip()
             if llm_text_output.startswith("```json"):
@@ -96,6 +100,8 @@ def rewrite_via_llm(original: str, instruction: str, api_key: str) -> str:
 def call_full_document_llm(text: str, remaining_suggestions: list[dict], api_key: str) -> str:
     """
     Batch all remaining suggestions into a single prompt. Ask Gemini to rewrite the entire document.
+    The document is sent inline rather than as a cached context: it has already been patched by the
+    earlier passes, and it must be the full text, not the compacted text the analyzers' caches hold.
     Returns the full revised document if successful; otherwise returns the original text.
     """
     # Build the prompt
@@ -121,7 +127,8 @@ def call_full_document_llm(text: str, remaining_suggestions: list[dict], api_key
     full_prompt = "\n".join(prompt_lines)
 
     try:
-        result = generate_with_fallback(full_prompt, api_key)
+        with llm_priority(PRIORITY_PATCHING):
+            result = generate_with_fallback(full_prompt, api_key, analyzer="rewrite_document")
         if result and result.parts: 
             llm_text_output = result.text.strip()
 
@@ -139,18 +146,28 @@ def call_full_document_llm(text: str, remaining_suggestions: list[dict], api_key
         return text
 
 
-def apply_readability_patches(text: str, suggestions: list[dict], api_key: str) -> str:
+def apply_readability_patches(text: str, suggestions: list[dict], api_key: str, match_workers: int = 1) -> str:
     """
     Applies readability suggestions in three passes:
      1. Exact string replacement.
      2. Fuzzy matching + single-sentence LLM rewrite.
      3. Full-document LLM fallback for any remaining unapplied suggestions.
-    Returns the fully revised text.
+    match_workers > 1 runs the difflib matching of pass 2 in a process pool (useful for long
+    documents with many suggestions). Returns the fully revised text.
     """
     # 1) Mark all suggestions as not yet applied
     for s in suggestions:
         s["applied"] = False
 
+    # Agent 1 quoted the compacted prompt text; rebuild its offset map to quote the original instead
+    compacted = compact_document(text)
+    for s in suggestions:
+        orig = s.get("original", "")
+        if orig and orig not in text:
+            original_text = compacted.original_text_for(orig)
+            if original_text:
+                s["original"] = original_text
+
     # 1. Exact Replacement 
     for s in suggestions:
         orig = s.get("original", "")
@@ -162,19 +179,15 @@ def apply_readability_patches(text: str, suggestions: list[dict], api_key: str)
 
     # 2. Fuzzy Matching Pass
     sentences = tokenize_sentences(text)
-    for s in suggestions:
-        if s["applied"]:
-            continue
-
-        orig = s.get("original", "")
-        new = s.get("suggestion", "")
-        if not orig or not new:
-            continue
-
-        # Find the closest sentence in 'sentences'
-        matches = difflib.get_close_matches(orig, sentences, n=1, cutoff=0.75)
-        if matches:
-            matched_sentence = matches[0]
+    pending = [
+        s for s in suggestions
+        if not s["applied"] and s.get("original", "") and s.get("suggestion", "")
+    ]
+    # Find the closest sentence in 'sentences' for every pending suggestion up front
+    closest = find_close_sentences([s["original"] for s in pending], sentences, workers=match_workers)
+    for s, matched_sentence in zip(pending, closest):
+        new = s["suggestion"]
+        if matched_sentence:
             instruction = f"Please rewrite for better readability: {new}"
             rewritten_sentence = rewrite_via_llm(matched_sentence, instruction, api_key)
             if rewritten_sentence and rewritten_sentence != matched_sentence:
@@ -196,22 +209,17 @@ def apply_readability_patches(text: str, suggestions: list[dict], api_key: str)
     return text
 
 
-def main():
-    api_key = get_env_api_key()
-
-    scraped_path = "scraped_text.txt"
-    json_path = "analysis_report.json"
-
-    scraped_text = load_text_file(scraped_path)
-
-    analysis_data = load_json_file(json_path)
+def extract_readability_suggestions(analysis_data: dict) -> list[dict]:
+    """
+    Pull well-formed readability suggestions out of an Agent 1 report.
+    Each returned item has the keys: "type", "description", "original", "suggestion".
+    """
     # We expect analysis_data to be a dict, containing a "readability" key with "suggestions"
     suggestions = []
-    if "readability" in analysis_data and isinstance(analysis_data["readability"].get("suggestions"), list):
-        raw_suggestions = analysis_data["readability"]["suggestions"]
+    readability = analysis_data.get("readability") or {}
+    if isinstance(readability, dict) and isinstance(readability.get("suggestions"), list):
         # Agent 1 would have provided objects with original/suggestion fields.
-        # Here, we assume each item is already a dict with the keys: "description", "original", "suggestion".
-        for item in raw_suggestions:
+        for item in readability["suggestions"]:
             if isinstance(item, dict) and "original" in item and "suggestion" in item:
                 suggestions.append({
                     "type": "readability",
@@ -220,14 +228,28 @@ def main():
                     "suggestion": item["suggestion"]
                 })
             else:
-                logger.warning("Skipping malformed suggestion entry in analysis_report.json")
+                logger.warning("Skipping malformed suggestion entry in analysis report")
+    return suggestions
+
+
+def main():
+    api_key = get_env_api_key()
+
+    scraped_path = "scraped_text.txt"
+    json_path = "analysis_report.json"
+
+    scraped_text = load_text_file(scraped_path)
+
+    analysis_data = load_json_file(json_path)
+    suggestions = extract_readability_suggestions(analysis_data)
 
     if not suggestions:
         logger.error("No valid readability suggestions found in analysis_report.json. Aborting.")
         sys.exit(1)
 
     try:
-        revised_text = apply_readability_patches(scraped_text, suggestions, api_key)
+        match_workers = int(os.getenv("PATCH_MATCH_WORKERS", "1"))
+        revised_text = apply_readability_patches(scraped_text, suggestions, api_key, match_workers=match_workers)
     except Exception as e:
         logger.error(f"Unexpected error during patching: {e}")
         # If something truly unexpected happens, fall back to original scraped text
@@ -1,16 +1,41 @@
-import logging 
+import os
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-from .readability_analyzer import analyze_readability 
-from .structure_analyzer import analyze_structure 
-from .completeness_analyzer import analyze_completeness 
-from .style_analyzer import analyze_style 
+from utils.prompt_compaction import compact_document
+from utils.context_cache import context_key
+from .prompts import build_document_context
+from .readability_analyzer import analyze_readability, compute_readability_score
+from .structure_analyzer import analyze_structure
+from .completeness_analyzer import analyze_completeness
+from .style_analyzer import analyze_style
 
-def run_full_analysis(url: str, document_text: str) -> dict:
+# How many analyzer sections run at once; 1 restores the old sequential behaviour
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "4"))
+
+# (report key, label used in logs and error messages)
+SECTIONS = [
+    ("readability", "Readability"),
+    ("structure_and_flow", "Structure and flow"),
+    ("completeness_of_information", "Completeness of information"),
+    ("style_guidelines", "Style guidelines"),
+]
+
+def run_full_analysis(url: str, document_text: str, progress=None, readability_score: float | None = None,
+                      on_chunk=None) -> dict:
     """
     Runs all analyses on the document text and returns a structured report.
+    Sections run concurrently; progress(section_key, section_result) is called as each one finishes,
+    so the fastest section is available first. If on_chunk is given, model output is streamed and
+    on_chunk(section_key, text) receives partial text as it arrives.
+    readability_score lets batch runs pass in a score already computed in a worker process.
+    The analyzers see a compacted copy of the text (utils.prompt_compaction); the size reduction
+    is reported under "prompt_compaction", along with the "context_key" of the shared document
+    context the analyzers used (for ContextCache.release_key).
     """
     report = {
         "url_analyzed": url,
@@ -21,36 +46,59 @@ def run_full_analysis(url: str, document_text: str) -> dict:
         "errors": [] # To capture any errors during analysis sub-steps
     }
 
-    try:
-        logger.info(f"Starting readability analysis for {url}")
-        report["readability"] = analyze_readability(document_text) 
-        logger.info(f"Completed readability analysis for {url}")
-    except Exception as e:
-        logger.error(f"Readability analysis failed in runner: {e}", exc_info=True)
-        report["errors"].append(f"Readability analysis failed: {str(e)}")
-
-    try:
-        logger.info(f"Starting structure and flow analysis for {url}")
-        report["structure_and_flow"] = analyze_structure(document_text)
-        logger.info(f"Completed structure and flow analysis for {url}")
-    except Exception as e:
-        logger.error(f"Structure and flow analysis failed in runner: {e}", exc_info=True)
-        report["errors"].append(f"Structure and flow analysis failed: {str(e)}")
-
-    try:
-        logger.info(f"Starting completeness analysis for {url}")
-        report["completeness_of_information"] = analyze_completeness(document_text)
-        logger.info(f"Completed completeness analysis for {url}")
-    except Exception as e:
-        logger.error(f"Completeness analysis failed in runner: {e}", exc_info=True)
-        report["errors"].append(f"Completeness of information analysis failed: {str(e)}")
-
-    try:
-        logger.info(f"Starting style guidelines analysis for {url}")
-        report["style_guidelines"] = analyze_style(document_text) 
-        logger.info(f"Completed style guidelines analysis for {url}")
-    except Exception as e:
-        logger.error(f"Style guidelines analysis failed in runner: {e}", exc_info=True)
-        report["errors"].append(f"Style guidelines analysis failed: {str(e)}")
+    compacted = compact_document(document_text)
+    report["prompt_compaction"] = compacted.report()
+    report["prompt_compaction"]["context_key"] = context_key(build_document_context(compacted.text))
+    logger.info(
+        f"Prompt compaction for {url}: ~{report['prompt_compaction']['estimated_tokens_before']} -> "
+        f"~{report['prompt_compaction']['estimated_tokens_after']} tokens "
+        f"({report['prompt_compaction']['saved_ratio']:.1%} saved)"
+    )
+    if readability_score is None and compacted.text != document_text:
+        # The score describes the page as published, not the compacted prompt text
+        try:
+            readability_score = compute_readability_score(document_text)
+        except Exception as e:
+            logger.warning(f"Readability score on the original text failed ({e}); scoring the compacted text instead.")
+    document_text = compacted.text
+
+    def section_chunks(key):
+        if on_chunk is None:
+            return None
+        return lambda text: on_chunk(key, text)
+
+    analyzers = {
+        "readability": lambda: analyze_readability(document_text, score=readability_score, on_chunk=section_chunks("readability")),
+        "structure_and_flow": lambda: analyze_structure(document_text, on_chunk=section_chunks("structure_and_flow")),
+        "completeness_of_information": lambda: analyze_completeness(document_text, on_chunk=section_chunks("completeness_of_information")),
+        "style_guidelines": lambda: analyze_style(document_text, on_chunk=section_chunks("style_guidelines")),
+    }
+    labels = dict(SECTIONS)
+
+    def run_section(key):
+        logger.info(f"Starting {labels[key].lower()} analysis for {url}")
+        result = analyzers[key]()
+        logger.info(f"Completed {labels[key].lower()} analysis for {url}")
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, ANALYSIS_CONCURRENCY)) as pool:
+        # Each section gets a copy of the caller's context (e.g. deferred-generation collectors)
+        futures = {
+            pool.submit(contextvars.copy_context().run, run_section, key): key
+            for key, _ in SECTIONS
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                report[key] = future.result()
+            except Exception as e:
+                logger.error(f"{labels[key]} analysis failed in runner: {e}", exc_info=True)
+                report["errors"].append(f"{labels[key]} analysis failed: {str(e)}")
+                continue
+            if progress:
+                try:
+                    progress(key, report[key])
+                except Exception as e:
+                    logger.warning(f"Progress callback failed for {key}: {e}")
 
     return report
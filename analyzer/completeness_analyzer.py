@@ -1,24 +1,24 @@
 import os
 import logging
-from .prompts import COMPLETENESS_PROMPT
+from .prompts import COMPLETENESS_PROMPT, build_document_context
 import json
 from utils.gemini import generate_with_fallback
 
 logger = logging.getLogger(__name__)
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-def analyze_completeness(document_text: str) -> dict:
+def analyze_completeness(document_text: str, on_chunk=None) -> dict:
     analysis_result = { "assessment": "Could not be determined.", "suggestions": [] }
     if not document_text or document_text.isspace():
         analysis_result["assessment"] = "Document text is empty or contains only whitespace."
         return analysis_result
 
     llm_failure_message = "LLM content generation failed. This could be due to an invalid/missing API key, network issues, all model attempts (including fallback) failing, or the models being unavailable."
-    prompt = COMPLETENESS_PROMPT.format(document_text=document_text)
-    if len(prompt) > 750000:
-        logger.warning(f"COMPLETENESS_ANALYZER: Prompt string length is very large ({len(prompt)} chars). This might impact performance or cost.")
+    context = build_document_context(document_text)
+    prompt = COMPLETENESS_PROMPT
+    if len(context) + len(prompt) > 750000:
+        logger.warning(f"COMPLETENESS_ANALYZER: Prompt string length is very large ({len(context) + len(prompt)} chars). This might impact performance or cost.")
 
-    response = generate_with_fallback(prompt, GEMINI_API_KEY)
+    response = generate_with_fallback(prompt, os.getenv("GEMINI_API_KEY"), analyzer="completeness", on_chunk=on_chunk, context=context)
 
     if response:
         try:
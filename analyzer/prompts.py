@@ -1,5 +1,23 @@
+# Every analyzer prompt (and the agent-2 rewrites) starts with the same document context, followed by
+# check-specific instructions. Keeping the large document as an identical prefix lets the model
+# provider cache it once per page instead of re-reading it for each of the four checks.
+DOCUMENT_CONTEXT_TEMPLATE = """
+You are reviewing a MoEngage help-center documentation article. The full article text is below,
+followed by the instructions for the current review task.
+
+--- DOCUMENT TEXT START ---
+{document_text}
+--- DOCUMENT TEXT END ---
+"""
+
+
+def build_document_context(document_text: str) -> str:
+    """Shared document prefix for a page. Whitespace is normalised so every caller builds identical text."""
+    return DOCUMENT_CONTEXT_TEMPLATE.format(document_text=document_text.strip())
+
+
 READABILITY_PROMPT = """
-Analyze the following document text for readability, especially for a non-technical marketer.
+Analyze the document text above for readability, especially for a non-technical marketer.
 
 The document includes markers like [H1], [H2], and "-" to indicate structure. DO NOT suggest changing or flagging these markers — they are intentional and part of the formatting.
 
@@ -20,17 +38,17 @@ Now, here is the REQUIRED format for your output. You MUST return a single JSON
 
 Your output MUST follow this JSON format strictly:
 
-{{
+{
   "assessment": "<your assessment here>",
   "suggestions": [
-    {{
+    {
       "description": "<brief explanation>",
       "original": "<original sentence>",
       "suggestion": "<your rewritten version>"
-    }},
+    },
     ...
   ]
-}}
+}
 
 Instructions:
 
@@ -42,13 +60,11 @@ Only include meaningful, high-impact readability improvements.
 
 Prioritize clarity and quality over quantity.
 
-Here is the Document Text:
-{document_text}
 """
 
 
 STRUCTURE_FLOW_PROMPT = """
-Analyze the structure and flow of the following document.
+Analyze the structure and flow of the document above.
 
 The document uses [H1], [H2], etc. for headings. Use these markers to assess organization. DO NOT suggest changing or removing them.
 
@@ -68,12 +84,10 @@ Return output as a JSON object in this format:
 Only include impactful suggestions that improve navigation, flow, or clarity.
 Avoid suggestions that nitpick perfect structure or make redundant points.
 
-Here is the Document Text:
-{document_text}
 """
 
 COMPLETENESS_PROMPT = """
-Evaluate the completeness of the document in helping a reader fully understand and apply the concept or feature being discussed.
+Evaluate the completeness of the document above in helping a reader fully understand and apply the concept or feature being discussed.
 
 Focus on:
 - Are all necessary steps and use cases clearly explained?
@@ -89,12 +103,10 @@ Return output as a JSON object in this format:
 
 Do NOT make suggestions just to fill space. Be critical, but only when something is truly missing or unclear.
 
-Here is the Document Text:
-{document_text}
 """
 
 STYLE_GUIDELINES_PROMPT = """
-Evaluate this document's writing style based on simplified guidance from professional style guides like Microsoft's.
+Evaluate the writing style of the document above based on simplified guidance from professional style guides like Microsoft's.
 
 Focus on these areas only:
 1. **Voice & Tone** — Is the tone helpful, clear, and user-focused?
@@ -111,6 +123,4 @@ Return output as a JSON object:
 Make only valuable suggestions. DO NOT flood output with marginal or stylistic nitpicks.
 Quality > Quantity.
 
-Here is the Document Text:
-{document_text}
 """
\ No newline at end of file
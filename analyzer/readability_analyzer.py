@@ -1,15 +1,24 @@
 import os
 import logging
-import textstat
-from .prompts import READABILITY_PROMPT
+from .prompts import READABILITY_PROMPT, build_document_context
 import json
 from utils.gemini import generate_with_fallback
 
 logger = logging.getLogger(__name__)
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-def analyze_readability(document_text: str) -> dict:
+def compute_readability_score(document_text: str) -> float:
+    """Flesch reading ease via textstat (imported lazily; it loads large word lists)."""
+    import textstat
+    return textstat.flesch_reading_ease(document_text)
+
+
+def analyze_readability(document_text: str, score: float | None = None, on_chunk=None) -> dict:
+    """
+    Readability analysis: textstat score plus LLM assessment and suggestions.
+    A score precomputed elsewhere (e.g. by the batch process pool) skips the local textstat pass.
+    on_chunk(text), if given, receives the model output as it streams in.
+    """
     analysis_result = {
         "score": None,  
         "assessment": "Could not be determined.",
@@ -21,7 +30,7 @@ def analyze_readability(document_text: str) -> dict:
         return analysis_result
 
     try:
-        analysis_result["score"] = textstat.flesch_reading_ease(document_text)
+        analysis_result["score"] = score if score is not None else compute_readability_score(document_text)
     except Exception as e:
         logger.error(f"Error calculating Flesch-Kincaid score: {e}")
         analysis_result["assessment"] = (
@@ -36,17 +45,18 @@ def analyze_readability(document_text: str) -> dict:
     )
 
 
-    prompt = READABILITY_PROMPT.format(document_text=document_text)
+    context = build_document_context(document_text)
+    prompt = READABILITY_PROMPT
 
-    if len(prompt) > 750000: 
+    if len(context) + len(prompt) > 750000: 
         logger.warning(
-            f"READABILITY_ANALYZER: Prompt string length is very large ({len(prompt)} chars). "
+            f"READABILITY_ANALYZER: Prompt string length is very large ({len(context) + len(prompt)} chars). "
             "This might impact performance or cost."
         )
 
     response = None
     try:
-        response = generate_with_fallback(prompt, GEMINI_API_KEY)
+        response = generate_with_fallback(prompt, os.getenv("GEMINI_API_KEY"), analyzer="readability", on_chunk=on_chunk, context=context)
     except Exception as e:
         logger.error(f"READABILITY_ANALYZER: generate_with_fallback call failed: {e}")
         response = None
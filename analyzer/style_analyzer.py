@@ -1,11 +1,10 @@
 import os
 import logging
 import json
-from .prompts import STYLE_GUIDELINES_PROMPT
+from .prompts import STYLE_GUIDELINES_PROMPT, build_document_context
 from utils.gemini import generate_with_fallback
 
 logger = logging.getLogger(__name__)
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 def extract_text_from_response(response):
     if hasattr(response, "text"):
@@ -36,7 +35,7 @@ def parse_llm_output(llm_text_output):
         logger.error(f"STYLE_ANALYZER: Unexpected error while parsing output: {e}")
         return f"Error during LLM parsing: {e}", [f"Raw output: {llm_text_output}"]
 
-def analyze_style(document_text: str) -> dict:
+def analyze_style(document_text: str, on_chunk=None) -> dict:
     result = {
         "assessment": "Could not be determined.",
         "suggestions": []
@@ -46,12 +45,13 @@ def analyze_style(document_text: str) -> dict:
         result["assessment"] = "Document text is empty or contains only whitespace."
         return result
 
-    prompt = STYLE_GUIDELINES_PROMPT.format(document_text=document_text)
-    if len(prompt) > 750000:
-        logger.warning(f"STYLE_ANALYZER: Large prompt ({len(prompt)} chars).")
+    context = build_document_context(document_text)
+    prompt = STYLE_GUIDELINES_PROMPT
+    if len(context) + len(prompt) > 750000:
+        logger.warning(f"STYLE_ANALYZER: Large prompt ({len(context) + len(prompt)} chars).")
 
     try:
-        response = generate_with_fallback(prompt, GEMINI_API_KEY)
+        response = generate_with_fallback(prompt, os.getenv("GEMINI_API_KEY"), analyzer="style", on_chunk=on_chunk, context=context)
         if not response:
             raise ValueError("LLM generation failed or returned None")
 
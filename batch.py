@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from utils.content_fetcher import ContentFetcher
+from utils.page_readiness import log_fetch_stats, flush_host_profiles
+from utils.report_store import ReportStore, DEFAULT_DB_PATH
+from utils.cpu_pool import parse_and_score_pages, create_cpu_pool, DEFAULT_CPU_WORKERS
+from utils.boilerplate_index import BoilerplateIndex
+from utils.gemini import log_route_stats, log_key_pool_stats, get_context_cache, DeferredCollector, deferred_generation
+from utils.key_pool import configured_api_keys
+from utils.llm_scheduler import llm_priority, log_scheduler_stats, PRIORITY_BATCH
+from utils.batch_backend import GeminiBatchBackend, LocalBatchBackend, run_deferred_jobs
+from analyzer.analysis_runner import run_full_analysis
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+
+def read_urls(path: str) -> list[str]:
+    """One URL per line; blank lines and lines starting with '#' are ignored."""
+    with open(path, "r", encoding="utf-8") as f:
+        urls = [line.strip() for line in f]
+    return list(dict.fromkeys(u for u in urls if u and not u.startswith("#")))
+
+
+def fetch_window(urls: list[str], browser) -> list[tuple[str, str, str | None]]:
+    """Fetch (url, html, content selector) for a window of URLs; failed fetches are logged and skipped."""
+    pages = []
+    for url in urls:
+        fetcher = ContentFetcher(url)
+        try:
+            fetcher.fetch_html(browser=browser)
+        except Exception as e:
+            logger.error(f"Skipping {url}: fetch failed: {e}")
+            continue
+        pages.append((url, fetcher.html, fetcher.content_selector))
+    return pages
+
+
+def crawl_pages(urls: list[str], window_size: int = 25, cpu_workers: int = DEFAULT_CPU_WORKERS):
+    """
+    Fetch every URL with one shared browser in windows of `window_size` pages, then parse and
+    score each window in the process pool, which is started once and reused for every window.
+    Yields lists of parsed page dicts (url, text, score).
+    """
+    from playwright.sync_api import sync_playwright
+
+    cpu_pool = create_cpu_pool(cpu_workers)
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            for start in range(0, len(urls), window_size):
+                window = urls[start:start + window_size]
+                logger.info(f"Fetching pages {start + 1}-{start + len(window)} of {len(urls)}")
+                pages = fetch_window(window, browser)
+
+                parsed = []
+                for page in parse_and_score_pages(pages, workers=cpu_workers, pool=cpu_pool):
+                    if page["error"] and page["text"] is None:
+                        logger.error(f"Skipping {page['url']}: {page['error']}")
+                        continue
+                    parsed.append(page)
+                yield parsed
+        finally:
+            browser.close()
+            if cpu_pool is not None:
+                cpu_pool.shutdown()
+
+
+def dedupe_boilerplate(pages: list[dict], report_path: str | None = None) -> dict:
+    """
+    Find blocks shared across the crawl and replace them in each page's analysis text with a
+    reference line. Returns the shared blocks; logs (and optionally writes) the token savings.
+    """
+    index = BoilerplateIndex()
+    for page in pages:
+        index.add_page(page["url"], page["text"])
+    shared = index.build()
+    for page in pages:
+        page["analysis_text"], page["shared_block_ids"] = index.reduced_text(page["url"])
+
+    savings = index.savings_report()
+    logger.info(
+        f"Boilerplate dedup: {savings['shared_blocks']} shared blocks, ~{savings['estimated_input_tokens_saved']} "
+        f"input tokens saved ({savings['saved_ratio']:.1%}) across {savings['pages']} pages."
+    )
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(savings, f, indent=2, ensure_ascii=False)
+    return shared
+
+
+def analyze_shared_blocks(shared: dict) -> dict:
+    """Analyze every shared block once. Returns block id -> findings (a regular report)."""
+    findings = {}
+    for block_id, block in shared.items():
+        logger.info(f"Analyzing shared block {block_id} (on {len(block['pages'])} pages)")
+        with llm_priority(PRIORITY_BATCH):
+            findings[block_id] = run_full_analysis(f"shared-block:{block_id}", block["text"])
+    return findings
+
+
+def analyze_pages(pages: list[dict], shared_findings: dict | None = None,
+                  page_workers: int = 1) -> list[tuple[dict, str, None]]:
+    """
+    Run the analyzers on parsed pages; returns (report, content, created_at) rows for the store.
+    Pages that went through dedupe_boilerplate are analyzed without their shared blocks, and the
+    shared blocks' findings are attached to the report under "shared_blocks".
+    page_workers > 1 analyzes that many pages at once (worth it when several API keys share the load).
+    """
+    def analyze_page(page):
+        logger.info(f"Analyzing {page['url']}")
+        text = page.get("analysis_text", page["text"])
+        # Crawl traffic yields model-call slots to interactive and patching work in this process
+        with llm_priority(PRIORITY_BATCH):
+            report = run_full_analysis(page["url"], text, readability_score=page["score"])
+        # Nothing else in a batch run reads this page again, so drop its cached contexts now
+        # (keyed on the compacted text the analyzers were given, as reported by run_full_analysis)
+        get_context_cache().release_key(report["prompt_compaction"]["context_key"])
+        if page.get("shared_block_ids"):
+            report["shared_blocks"] = [
+                {"id": block_id, "findings": (shared_findings or {}).get(block_id)}
+                for block_id in page["shared_block_ids"]
+            ]
+        return (report, page["text"], None)
+
+    if page_workers <= 1:
+        return [analyze_page(page) for page in pages]
+    with ThreadPoolExecutor(max_workers=page_workers) as pool:
+        # Each page runs in a copy of the caller's context (e.g. deferred-generation collectors)
+        futures = [pool.submit(contextvars.copy_context().run, analyze_page, page) for page in pages]
+        return [future.result() for future in futures]
+
+
+def _analyze_and_store(pages: list[dict], store: ReportStore, flush_every: int, shared_findings: dict | None,
+                       page_workers: int = 1) -> int:
+    stored = 0
+    for start in range(0, len(pages), flush_every):
+        rows = analyze_pages(pages[start:start + flush_every], shared_findings, page_workers)
+        if rows:
+            stored += len(store.add_reports(rows))
+    return stored
+
+
+def run_batch(urls: list[str], store: ReportStore, flush_every: int = 25,
+              cpu_workers: int = DEFAULT_CPU_WORKERS, dedup: bool = False,
+              dedup_report: str | None = None, page_workers: int = 1) -> int:
+    """
+    Analyze every URL interactively, bulk-inserting each window's reports into the store.
+    With dedup, the whole crawl is fetched first so shared blocks can be found and analyzed once.
+    page_workers pages are analyzed at a time.
+    """
+    if not dedup:
+        stored = 0
+        for pages in crawl_pages(urls, window_size=flush_every, cpu_workers=cpu_workers):
+            stored += _analyze_and_store(pages, store, flush_every, None, page_workers)
+        return stored
+
+    pages = [page for window in crawl_pages(urls, window_size=flush_every, cpu_workers=cpu_workers) for page in window]
+    shared_findings = analyze_shared_blocks(dedupe_boilerplate(pages, dedup_report))
+    return _analyze_and_store(pages, store, flush_every, shared_findings, page_workers)
+
+
+def run_deferred_batch(urls: list[str], store: ReportStore, backend, workdir: str,
+                       flush_every: int = 25, cpu_workers: int = DEFAULT_CPU_WORKERS,
+                       poll_interval: float = 60.0, timeout: float | None = None,
+                       dedup: bool = False, dedup_report: str | None = None) -> int:
+    """
+    Nightly-audit mode: crawl everything, collect every analyzer prompt into bulk job files,
+    submit them through `backend`, wait for completion, then build per-URL reports from the results.
+    """
+    pages = [page for window in crawl_pages(urls, window_size=flush_every, cpu_workers=cpu_workers) for page in window]
+    shared = dedupe_boilerplate(pages, dedup_report) if dedup else {}
+
+    collector = DeferredCollector()
+    with deferred_generation(collector):
+        # collect pass: prompts are recorded, results discarded
+        analyze_shared_blocks(shared)
+        analyze_pages(pages)
+    logger.info(f"Collected {len(collector.requests)} unique prompts from {len(pages)} pages.")
+
+    collector.results = run_deferred_jobs(collector, backend, workdir, poll_interval=poll_interval, timeout=timeout)
+
+    with deferred_generation(collector):
+        shared_findings = analyze_shared_blocks(shared)
+        return _analyze_and_store(pages, store, flush_every, shared_findings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a list of documentation URLs and store the reports.")
+    parser.add_argument("url_file", help="Text file with one URL per line")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="SQLite report database (default: %(default)s)")
+    parser.add_argument("--flush-every", type=int, default=25, help="Pages per fetch/parse window and bulk insert")
+    parser.add_argument("--cpu-workers", type=int, default=DEFAULT_CPU_WORKERS,
+                        help="Processes for HTML parsing and local scoring (default: %(default)s)")
+    parser.add_argument("--deferred", action="store_true",
+                        help="Submit all prompts as bulk batch jobs and wait for them instead of calling the model per page")
+    parser.add_argument("--batch-backend", choices=["gemini", "local"], default="gemini",
+                        help="Bulk backend for --deferred ('local' is a development backend with canned answers; no API calls)")
+    parser.add_argument("--batch-dir", default="batch_jobs",
+                        help="Where --deferred writes job files and the manifest; rerunning with the same dir resumes its jobs")
+    parser.add_argument("--poll-interval", type=float, default=60.0, help="Seconds between batch job polls")
+    parser.add_argument("--batch-timeout", type=float, default=None, help="Give up waiting for batch jobs after N seconds")
+    parser.add_argument("--dedup-boilerplate", action="store_true",
+                        help="Analyze blocks shared across pages once instead of inside every page prompt")
+    parser.add_argument("--dedup-report", default=None, help="Write the per-crawl token savings report to this JSON file")
+    parser.add_argument("--page-workers", type=int, default=None,
+                        help="Pages analyzed concurrently (default: one per configured API key)")
+    args = parser.parse_args(argv)
+
+    api_keys = configured_api_keys(os.getenv("GEMINI_API_KEY"))
+    if not api_keys and not (args.deferred and args.batch_backend == "local"):
+        logger.error("GEMINI_API_KEY (or GEMINI_API_KEYS) environment variable is not set. Aborting.")
+        return 1
+
+    urls = read_urls(args.url_file)
+    if not urls:
+        logger.error(f"No URLs found in '{args.url_file}'.")
+        return 1
+
+    with ReportStore(args.db) as store:
+        if args.deferred:
+            if args.batch_backend == "local":
+                logger.warning("Using the local development batch backend: reports will contain canned answers.")
+                backend = LocalBatchBackend()
+            else:
+                backend = GeminiBatchBackend(api_keys[0])
+            stored = run_deferred_batch(
+                urls, store, backend, args.batch_dir, flush_every=args.flush_every, cpu_workers=args.cpu_workers,
+                poll_interval=args.poll_interval, timeout=args.batch_timeout,
+                dedup=args.dedup_boilerplate, dedup_report=args.dedup_report,
+            )
+        else:
+            stored = run_batch(
+                urls, store, flush_every=args.flush_every, cpu_workers=args.cpu_workers,
+                dedup=args.dedup_boilerplate, dedup_report=args.dedup_report,
+                page_workers=args.page_workers or max(1, len(api_keys)),
+            )
+    logger.info(f"Batch complete: {stored}/{len(urls)} reports stored in {args.db}.")
+    log_route_stats()
+    log_fetch_stats()
+    flush_host_profiles()
+    log_scheduler_stats()
+    log_key_pool_stats()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
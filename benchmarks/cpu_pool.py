@@ -0,0 +1,82 @@
+"""
+Throughput benchmark for the CPU-bound batch stage (utils.cpu_pool).
+
+Generates synthetic help-center pages and times parse+score and difflib matching with
+1, 4 and 16 worker processes:
+
+    python benchmarks/cpu_pool.py --pages 400
+    python benchmarks/cpu_pool.py --stage match --workers 1 4 16
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cpu_pool import parse_and_score_pages, find_close_sentences  # noqa: E402
+
+WORDS = (
+    "campaign segment user attribute push notification email locale delivery schedule "
+    "dashboard analytics event flow journey template personalization integration sdk "
+    "configure enable select create navigate settings audience trigger conversion report"
+).split()
+
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 24))).capitalize() + "."
+
+
+def synthetic_page(rng: random.Random, sections: int = 12) -> str:
+    parts = ['<html><body><nav>Home | Docs</nav><div class="article">']
+    for i in range(sections):
+        parts.append(f"<h2>Section {i}</h2>")
+        parts.extend(f"<p>{_sentence(rng)} {_sentence(rng)}</p>" for _ in range(4))
+        parts.append("<ul>" + "".join(f"<li>{_sentence(rng)}</li>" for _ in range(5)) + "</ul>")
+        if i % 3 == 0:
+            rows = "".join(f"<tr><td>{rng.choice(WORDS)}</td><td>{_sentence(rng)}</td></tr>" for _ in range(8))
+            parts.append(f"<table><tr><th>Field</th><th>Description</th></tr>{rows}</table>")
+    parts.append("</div></body></html>")
+    return "".join(parts)
+
+
+def bench(label: str, fn, workers_list: list[int], units: int):
+    baseline = None
+    print(f"\n{label}")
+    print(f"{'workers':>8} {'seconds':>9} {'items/s':>9} {'speedup':>8}")
+    for workers in workers_list:
+        start = time.perf_counter()
+        fn(workers)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>9.2f} {units / elapsed:>9.1f} {baseline / elapsed:>7.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the batch CPU process pool.")
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--suggestions", type=int, default=64)
+    parser.add_argument("--sentences", type=int, default=400, help="Sentences in the document being patched")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--stage", choices=["all", "parse", "match"], default="all")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    print(f"cpu_count={os.cpu_count()}")
+
+    if args.stage in ("all", "parse"):
+        pages = [(f"https://example.test/{i}", synthetic_page(rng)) for i in range(args.pages)]
+        bench(f"parse + score ({args.pages} pages)",
+              lambda w: parse_and_score_pages(pages, workers=w), args.workers, args.pages)
+
+    if args.stage in ("all", "match"):
+        sentences = [_sentence(rng) for _ in range(args.sentences)]
+        originals = [rng.choice(sentences)[:-1] + " now." for _ in range(args.suggestions)]
+        bench(f"difflib matching ({args.suggestions} suggestions x {len(sentences)} sentences)",
+              lambda w: find_close_sentences(originals, sentences, workers=w), args.workers, args.suggestions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Fetch-time comparison of the fixed and adaptive page-readiness modes (utils.page_readiness).
+
+Fetches every URL in the file once per mode with one shared browser and prints a fetch-time
+histogram for each mode:
+
+    python benchmarks/fetch_readiness.py urls.txt
+    python benchmarks/fetch_readiness.py urls.txt --modes adaptive --rounds 3
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.content_fetcher import ContentFetcher  # noqa: E402
+from utils.page_readiness import get_fetch_stats  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare fetch times of the page-readiness modes.")
+    parser.add_argument("urls_file", help="One URL per line")
+    parser.add_argument("--modes", nargs="+", choices=["fixed", "adaptive"], default=["fixed", "adaptive"])
+    parser.add_argument("--rounds", type=int, default=1, help="Fetches per URL and mode (later rounds use learned profiles)")
+    args = parser.parse_args(argv)
+
+    with open(args.urls_file, "r", encoding="utf-8") as f:
+        urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    from playwright.sync_api import sync_playwright
+
+    failures = {mode: 0 for mode in args.modes}
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            for mode in args.modes:
+                for _ in range(args.rounds):
+                    for url in urls:
+                        start = time.perf_counter()
+                        try:
+                            ContentFetcher(url).fetch_html(browser=browser, readiness=mode)
+                        except Exception as e:
+                            failures[mode] += 1
+                            print(f"{mode:>8} FAILED {url}: {e}")
+                            continue
+                        print(f"{mode:>8} {time.perf_counter() - start:>7.2f}s {url}")
+        finally:
+            browser.close()
+
+    for mode, s in get_fetch_stats().items():
+        print(f"\n{mode}: {s['count']} fetches, mean {s['mean']:.2f}s, max {s['max']:.2f}s, {failures.get(mode, 0)} failed")
+        peak = max(s["histogram"].values()) or 1
+        for label, n in s["histogram"].items():
+            print(f"  {label:>7} {n:>5} {'#' * round(40 * n / peak)}")
+
+
+if __name__ == "__main__":
+    main()
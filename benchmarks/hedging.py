@@ -0,0 +1,72 @@
+"""
+Tail-latency benchmark for request hedging (utils.hedging), using the latency-injecting stub
+model from tests/fakes.py instead of the Gemini API:
+
+    python benchmarks/hedging.py
+    python benchmarks/hedging.py --calls 2000 --slow-rate 0.02 --budget 0.05
+
+Hedges only go out when a scheduler slot is free, so --slots should leave headroom above --concurrency.
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import gemini  # noqa: E402
+from utils.hedging import Hedger  # noqa: E402
+from utils.llm_scheduler import LLMScheduler, set_scheduler  # noqa: E402
+from tests.fakes import latency_stub_factory  # noqa: E402
+
+
+def _pct(sorted_values: list[float], pct: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))]
+
+
+def run(mode: str, args) -> list[float]:
+    set_scheduler(LLMScheduler(capacity=args.slots or 2 * args.concurrency))
+    gemini.set_model_factory(latency_stub_factory(args.base_latency, args.slow_latency, args.slow_rate, seed=args.seed))
+    gemini.set_hedger(Hedger(mode=mode, percentile=args.percentile, min_samples=args.min_samples,
+                             budget_ratio=args.budget))
+    latencies = []
+
+    def one(_):
+        start = time.perf_counter()
+        gemini.generate_with_fallback("benchmark prompt", "stub-key", analyzer="style")
+        latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.calls)))
+    return sorted(latencies)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare tail latency with and without request hedging.")
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--slots", type=int, default=None, help="Model-call slots (default: twice --concurrency)")
+    parser.add_argument("--base-latency", type=float, default=0.02)
+    parser.add_argument("--slow-latency", type=float, default=0.5)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--percentile", type=float, default=95)
+    parser.add_argument("--min-samples", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=0.1, help="Hedge budget as a fraction of calls")
+    parser.add_argument("--modes", nargs="+", default=["off", "same", "fallback"])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    logging.getLogger("utils").setLevel(logging.WARNING)
+    print(f"{'mode':>9} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7} {'hedged':>7} {'wins':>5} {'no_slot':>7}")
+    for mode in args.modes:
+        latencies = run(mode, args)
+        stats = gemini.get_hedge_stats()
+        print(f"{mode:>9} {_pct(latencies, 50):>7.3f} {_pct(latencies, 95):>7.3f} {_pct(latencies, 99):>7.3f} "
+              f"{latencies[-1]:>7.3f} {stats['hedged']:>7} {stats['hedge_wins']:>5} {stats['no_capacity']:>7}")
+    gemini.set_model_factory(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Import-time budget check for the CLI entry points.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for each entry point,
+reports the cumulative import time, and fails if a module exceeds its budget or pulls in one of
+the heavy dependencies that must only load when the stage needing them runs.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget-ms 150 --runs 5
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry points (and the modules batch workers import) that must stay cheap to import
+ENTRY_MODULES = [
+    "main",
+    "agent-2",
+    "batch",
+    "analyzer.analysis_runner",
+    "utils.gemini",
+    "utils.content_fetcher",
+    "utils.report_store",
+]
+
+HEAVY_MODULES = ("playwright", "google.generativeai", "bs4", "readability", "textstat", "rich")
+
+DEFAULT_BUDGET_MS = 100.0
+
+
+def measure(module: str) -> tuple[float, set[str]]:
+    """Returns (cumulative import time in ms, set of imported module names) for one fresh import."""
+    code = f"__import__({module!r})"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    imported = set()
+    target_us = 0
+    for line in proc.stderr.splitlines():
+        # Format: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        name = name.strip()
+        imported.add(name)
+        if name == module:
+            target_us = int(cumulative)
+    return target_us / 1000.0, imported
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS)))
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per module; the median is reported")
+    parser.add_argument("modules", nargs="*", default=ENTRY_MODULES)
+    args = parser.parse_args(argv)
+
+    failures = []
+    print(f"{'module':<28} {'median ms':>10}  heavy imports")
+    for module in args.modules:
+        timings = []
+        heavy = set()
+        for _ in range(args.runs):
+            ms, imported = measure(module)
+            timings.append(ms)
+            heavy |= {m for m in imported if m.split(".")[0] in HEAVY_MODULES or m in HEAVY_MODULES}
+        median = statistics.median(timings)
+        print(f"{module:<28} {median:>10.1f}  {', '.join(sorted(heavy)) or '-'}")
+        if median > args.budget_ms:
+            failures.append(f"{module}: {median:.1f} ms exceeds budget of {args.budget_ms:.0f} ms")
+        if heavy:
+            failures.append(f"{module}: eagerly imports {', '.join(sorted(heavy))}")
+
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,11 +2,10 @@ import os
 import sys
 import logging
 import json
-from utils.content_fetcher import ContentFetcher
-from analyzer.analysis_runner import run_full_analysis
-from rich import print as rprint
-from rich.console import Console
-from rich.syntax import Syntax
+import argparse
+
+# Heavy dependencies (playwright, google.generativeai, bs4, textstat, rich) are imported inside the
+# functions that need them so short commands like --render start instantly.
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,15 +14,86 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    logger.warning("---------------------------------------------------------------------------")
-    logger.warning("GEMINI_API_KEY environment variable is not set.")
-    logger.warning("Please set your GEMINI_API_KEY to enable full analysis.")
-    logger.warning("---------------------------------------------------------------------------")
-    sys.exit(1)
 
-def main():
+def render_report(analysis_report: dict):
+    """Pretty-print a JSON report with rich."""
+    from rich.console import Console
+    from rich.syntax import Syntax
+
+    console = Console()
+    console.rule("[bold green]JSON Report[/]")
+    json_str = json.dumps(analysis_report, indent=2, ensure_ascii=False)
+    syntax = Syntax(json_str, "json", theme="monokai", line_numbers=False)
+    console.print(syntax)
+    console.rule()
+
+
+def render_section(console, section: str, result):
+    from rich.syntax import Syntax
+
+    console.rule(f"[bold green]{section}[/]")
+    json_str = json.dumps(result, indent=2, ensure_ascii=False)
+    console.print(Syntax(json_str, "json", theme="monokai", line_numbers=False))
+
+
+def write_json_atomic(path: str, data: dict):
+    """Write JSON via a temp file + rename so readers never see a half-written report."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _status_table(sections: list[str], status: dict):
+    from rich.table import Table
+
+    table = Table(title="Analysis progress", show_header=True)
+    table.add_column("Section")
+    table.add_column("Status")
+    for section in sections:
+        table.add_row(section, status[section])
+    return table
+
+
+def render_cached_report(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            analysis_report = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Could not load cached report '{path}': {e}")
+        return
+    render_report(analysis_report)
+
+
+def run_local_metrics(path: str):
+    """Score previously scraped text with the local readability metrics only (no browser, no LLM)."""
+    from analyzer.readability_analyzer import compute_readability_score
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+    except OSError as e:
+        logger.error(f"Could not read scraped text '{path}': {e}")
+        return
+    score = compute_readability_score(content)
+    print(json.dumps({"source": path, "flesch_reading_ease": score}, indent=2))
+
+
+def run_interactive_analysis():
+    from rich.console import Console
+    from rich.live import Live
+    from utils.content_fetcher import ContentFetcher
+    from analyzer.analysis_runner import run_full_analysis, SECTIONS
+    from utils.report_store import ReportStore
+    from utils.key_pool import configured_api_keys
+
+    if not configured_api_keys(os.getenv("GEMINI_API_KEY")):
+        logger.warning("---------------------------------------------------------------------------")
+        logger.warning("GEMINI_API_KEY (or GEMINI_API_KEYS) environment variable is not set.")
+        logger.warning("Please set your GEMINI_API_KEY to enable full analysis.")
+        logger.warning("---------------------------------------------------------------------------")
+        sys.exit(1)
+
     url = input("Enter the MoEngage documentation URL: ").strip()
     if not url:
         logger.error("No URL provided. Exiting.")
@@ -39,31 +109,70 @@ def main():
         if not content.strip():
             logger.warning("Fetched content is empty. Analysis might not be meaningful.")
 
-        logger.info("Running analysis modules...")
-        analysis_report = run_full_analysis(url, content)
-        logger.info("Analysis complete.")
+        try:
+            with open("scraped_text.txt", "w", encoding="utf-8") as f_md:
+                f_md.write(content.strip() + "\n")
+        except IOError as e:
+            logger.error(f"Error saving scraped text: {e}")
 
-        # Pretty-print JSON with rich
+        logger.info("Running analysis modules...")
+        sections = [key for key, _ in SECTIONS]
+        partial_report = {"url_analyzed": url, **{key: None for key in sections}, "errors": []}
+        status = {key: "waiting" for key in sections}
+        streamed_chars = {key: 0 for key in sections}
         console = Console()
-        console.rule("[bold green]JSON Report[/]")
-        json_str = json.dumps(analysis_report, indent=2, ensure_ascii=False)
-        syntax = Syntax(json_str, "json", theme="monokai", line_numbers=False)
-        console.print(syntax)
-        console.rule()
 
-        try:
-            with open("analysis_report.json", "w", encoding="utf-8") as f_json:
-                json.dump(analysis_report, f_json, indent=2, ensure_ascii=False)
-            logger.info("JSON report saved to analysis_report.json")
+        with Live(_status_table(sections, status), console=console, refresh_per_second=8) as live:
+            def on_chunk(section, text):
+                streamed_chars[section] += len(text)
+                status[section] = f"streaming ({streamed_chars[section]} chars)"
+                live.update(_status_table(sections, status))
 
-            with open("scraped_text.txt", "w", encoding="utf-8") as f_md:
-                f_md.write(content.strip() + "\n")
+            def progress(section, result):
+                # Show and persist each section as soon as it is done
+                partial_report[section] = result
+                status[section] = "[green]done[/]"
+                live.update(_status_table(sections, status))
+                render_section(live.console, section, result)
+                try:
+                    write_json_atomic("analysis_report.json", partial_report)
+                except IOError as e:
+                    logger.error(f"Error saving partial report: {e}")
+
+            analysis_report = run_full_analysis(url, content, progress=progress, on_chunk=on_chunk)
+        logger.info("Analysis complete.")
 
+        try:
+            write_json_atomic("analysis_report.json", analysis_report)
+            logger.info("JSON report saved to analysis_report.json")
         except IOError as e:
             logger.error(f"Error saving report files: {e}")
 
+        try:
+            with ReportStore() as store:
+                store.add_report(analysis_report, content)
+        except Exception as e:
+            logger.error(f"Error recording report in the report store: {e}")
+
     except Exception as e:
         logger.error(f"An error occurred in the main process: {e}", exc_info=True)
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a MoEngage documentation page.")
+    parser.add_argument("--render", metavar="REPORT_JSON", nargs="?", const="analysis_report.json",
+                        help="Re-render a cached JSON report instead of running an analysis")
+    parser.add_argument("--local-only", metavar="TEXT_FILE", nargs="?", const="scraped_text.txt",
+                        help="Only compute local readability metrics for previously scraped text")
+    args = parser.parse_args(argv)
+
+    if args.render:
+        render_cached_report(args.render)
+    elif args.local_only:
+        run_local_metrics(args.local_only)
+    else:
+        run_interactive_analysis()
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
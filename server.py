@@ -0,0 +1,263 @@
+import os
+import sys
+import hmac
+import json
+import logging
+import hashlib
+import importlib
+from urllib.parse import urlparse
+from flask import Flask, Response, jsonify, request
+from flask_cors import CORS
+from utils.content_fetcher import ContentFetcher
+from utils.job_queue import JobQueue, QueueFullError, JOB_DONE, JOB_FAILED
+from utils.report_store import ReportStore
+from utils.gemini import get_route_stats, get_hedge_stats, get_key_pool_stats
+from utils.page_readiness import get_fetch_stats
+from utils.llm_scheduler import get_scheduler_stats
+from utils.key_pool import configured_api_keys
+from analyzer.analysis_runner import run_full_analysis
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+# agent-2.py is not a valid module name for a normal import statement
+revision_agent = importlib.import_module("agent-2")
+
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "2"))
+SERVICE_QUEUE_SIZE = int(os.getenv("SERVICE_QUEUE_SIZE", "32"))
+SERVICE_RETRY_AFTER_SECONDS = int(os.getenv("SERVICE_RETRY_AFTER_SECONDS", "30"))
+# Hosts /jobs/analyze may fetch (comma-separated, exact host names); the browser never sees anything else
+SERVICE_ALLOWED_HOSTS = [h.strip().lower() for h in os.getenv("SERVICE_ALLOWED_HOSTS", "help.moengage.com").split(",") if h.strip()]
+SERVICE_ALLOWED_SCHEMES = ("https", "http")
+# Optional shared secret; when set, every endpoint but /health needs "Authorization: Bearer <token>"
+SERVICE_API_TOKEN = os.getenv("SERVICE_API_TOKEN")
+# Origins allowed to call the API from a browser (comma-separated); CORS is off when unset
+SERVICE_CORS_ORIGINS = [o.strip() for o in os.getenv("SERVICE_CORS_ORIGINS", "").split(",") if o.strip()]
+
+
+def _start_browser():
+    """Per-worker state: one Playwright driver, one warm Chromium instance and a report store handle."""
+    from playwright.sync_api import sync_playwright
+
+    playwright = sync_playwright().start()
+    browser = playwright.chromium.launch(headless=True)
+    logger.info("SERVICE: Worker browser launched.")
+    return {"playwright": playwright, "browser": browser, "store": ReportStore()}
+
+
+def _close_browser(state):
+    state["browser"].close()
+    state["playwright"].stop()
+    state["store"].close()
+
+
+def _ensure_browser(state):
+    """Relaunch the worker's browser if it crashed or was closed."""
+    if not state["browser"].is_connected():
+        logger.warning("SERVICE: Worker browser disconnected. Relaunching.")
+        state["browser"] = state["playwright"].chromium.launch(headless=True)
+    return state["browser"]
+
+
+def handle_analyze(job, state):
+    url = job.payload["url"]
+    job.emit("fetching", {"url": url})
+    browser = _ensure_browser(state) if state else None
+    content = ContentFetcher.get_content(url, browser=browser)
+    job.emit("fetched", {"chars": len(content)})
+
+    def progress(section, result):
+        job.emit("section", {"section": section, "result": result})
+
+    def on_chunk(section, text):
+        job.emit("tokens", {"section": section, "text": text})
+
+    report = run_full_analysis(url, content, progress=progress, on_chunk=on_chunk)
+    if state and state.get("store"):
+        state["store"].add_report(report, content)
+    return {"report": report, "content": content}
+
+
+def handle_patch(job, state):
+    text = job.payload["text"]
+    suggestions = job.payload["suggestions"]
+    job.emit("patching", {"suggestions": len(suggestions)})
+    revised_text = revision_agent.apply_readability_patches(text, suggestions, os.getenv("GEMINI_API_KEY"))
+    applied = sum(1 for s in suggestions if s.get("applied"))
+    return {"revised_text": revised_text, "applied": applied, "total": len(suggestions)}
+
+
+def check_url(url: str, allowed_hosts=None) -> str | None:
+    """Why url may not be fetched (scheme, host or port outside the allowlist), or None if it may."""
+    allowed_hosts = SERVICE_ALLOWED_HOSTS if allowed_hosts is None else allowed_hosts
+    try:
+        parsed = urlparse(url)
+        port = parsed.port
+    except ValueError as e:
+        return f"Invalid URL: {e}"
+    if parsed.scheme not in SERVICE_ALLOWED_SCHEMES:
+        return f"URL scheme must be one of {', '.join(SERVICE_ALLOWED_SCHEMES)}."
+    if parsed.username or parsed.password or port not in (None, 80, 443):
+        return "URLs with credentials or a non-default port are not accepted."
+    if (parsed.hostname or "").lower() not in allowed_hosts:
+        return f"Host '{parsed.hostname}' is not allowed. Allowed hosts: {', '.join(allowed_hosts) or 'none'}."
+    return None
+
+
+def _queue_full_response(e):
+    response = jsonify({"error": str(e)})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(SERVICE_RETRY_AFTER_SECONDS)
+    return response
+
+
+def _accepted(job, created):
+    body = job.to_dict()
+    body["deduplicated"] = not created
+    return jsonify(body), 202
+
+
+def create_app(job_queue: JobQueue, api_token: str | None = None, cors_origins=None) -> Flask:
+    """
+    The HTTP API over job_queue. The queue lives in memory, so serve the app from a single process
+    (any number of threads); api_token and cors_origins default to SERVICE_API_TOKEN and
+    SERVICE_CORS_ORIGINS.
+    """
+    app = Flask(__name__)
+    api_token = SERVICE_API_TOKEN if api_token is None else api_token
+    cors_origins = SERVICE_CORS_ORIGINS if cors_origins is None else cors_origins
+    if cors_origins:
+        CORS(app, origins=cors_origins)
+
+    @app.before_request
+    def require_token():
+        if not api_token or request.path == "/health":
+            return None
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied.encode("utf-8"), api_token.encode("utf-8")):
+            return jsonify({"error": "Missing or invalid API token."}), 401
+        return None
+
+    @app.get("/health")
+    def health():
+        return jsonify({"status": "ok", "queue": job_queue.stats()})
+
+    @app.get("/stats")
+    def stats():
+        return jsonify({"queue": job_queue.stats(), "model_routes": get_route_stats(),
+                        "hedging": get_hedge_stats(), "llm_scheduler": get_scheduler_stats(),
+                        "api_keys": get_key_pool_stats(),
+                        "fetch_times": get_fetch_stats()})
+
+    @app.post("/jobs/analyze")
+    def submit_analyze():
+        body = request.get_json(silent=True) or {}
+        url = (body.get("url") or "").strip()
+        if not url:
+            return jsonify({"error": "Field 'url' is required."}), 400
+        url_error = check_url(url)
+        if url_error:
+            return jsonify({"error": url_error}), 400
+        try:
+            job, created = job_queue.submit("analyze", url, {"url": url})
+        except QueueFullError as e:
+            return _queue_full_response(e)
+        return _accepted(job, created)
+
+    @app.post("/jobs/patch")
+    def submit_patch():
+        body = request.get_json(silent=True) or {}
+        text = body.get("text")
+        if not isinstance(text, str) or not text.strip():
+            return jsonify({"error": "Field 'text' is required."}), 400
+        suggestions = body.get("suggestions")
+        if suggestions is None and isinstance(body.get("analysis_report"), dict):
+            suggestions = revision_agent.extract_readability_suggestions(body["analysis_report"])
+        if not suggestions:
+            return jsonify({"error": "Provide 'suggestions' or an 'analysis_report' with readability suggestions."}), 400
+
+        dedup_key = hashlib.sha256(json.dumps([text, suggestions], sort_keys=True).encode("utf-8")).hexdigest()
+        try:
+            job, created = job_queue.submit("patch", dedup_key, {"text": text, "suggestions": suggestions})
+        except QueueFullError as e:
+            return _queue_full_response(e)
+        return _accepted(job, created)
+
+    @app.get("/jobs/<job_id>")
+    def job_status(job_id):
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({"error": "Unknown job."}), 404
+        return jsonify(job.to_dict())
+
+    @app.get("/jobs/<job_id>/result")
+    def job_result(job_id):
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({"error": "Unknown job."}), 404
+        if job.status == JOB_DONE:
+            return jsonify({"job_id": job.id, "status": job.status, "result": job.result})
+        if job.status == JOB_FAILED:
+            return jsonify({"job_id": job.id, "status": job.status, "error": job.error}), 500
+        return jsonify(job.to_dict()), 202
+
+    @app.get("/jobs/<job_id>/events")
+    def job_events(job_id):
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({"error": "Unknown job."}), 404
+        start = request.args.get("from", default=0, type=int)
+
+        def stream():
+            for event in job.iter_events(start=start):
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['seq']}\nevent: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+        return Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    return app
+
+
+def build_job_queue() -> JobQueue:
+    return JobQueue(
+        handlers={"analyze": handle_analyze, "patch": handle_patch},
+        workers=SERVICE_WORKERS,
+        max_queue=SERVICE_QUEUE_SIZE,
+        worker_init=_start_browser,
+        worker_close=_close_browser,
+    )
+
+
+def build_app() -> Flask:
+    """
+    App factory for a WSGI server, e.g. gunicorn --workers 1 --threads 8 'server:build_app()'.
+    Starts the job queue's workers; use a single process, since jobs live in its memory.
+    """
+    if not configured_api_keys(os.getenv("GEMINI_API_KEY")):
+        logger.error("GEMINI_API_KEY (or GEMINI_API_KEYS) environment variable is not set. Aborting.")
+        sys.exit(1)
+
+    job_queue = build_job_queue()
+    job_queue.start()
+    app = create_app(job_queue)
+    app.job_queue = job_queue
+    return app
+
+
+def main():
+    # Flask's development server, for local use; see build_app() for deployments
+    app = build_app()
+    try:
+        app.run(host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "5000")), threaded=True)
+    finally:
+        app.job_queue.stop()
+
+
+if __name__ == "__main__":
+    main()
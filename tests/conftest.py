@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Tests import the root-level scripts and the utils/analyzer packages directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the host-wide model-call slot table of the code under test away from real runs on this machine
+if "LLM_SCHEDULER_DB" not in os.environ:
+    import tempfile
+
+    os.environ["LLM_SCHEDULER_DB"] = os.path.join(tempfile.mkdtemp(prefix="llm-slots-"), "llm_slots.db")
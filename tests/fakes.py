@@ -0,0 +1,87 @@
+"""
+Local stand-ins for the Gemini SDK used by the tests and benchmarks/: models that answer after an
+injected latency, and API keys with a per-minute request limit. No network calls are made.
+"""
+import time
+import random
+import threading
+from collections import deque
+
+from utils.gemini import BatchResponse
+
+DEFAULT_RESPONSE = '{"assessment": "Stub response.", "suggestions": []}'
+
+
+class LatencyStubModel:
+    """
+    Stand-in for GenerativeModel that sleeps for latency_fn(model_name) seconds before answering
+    with responder(prompt, model_name). Install with gemini.set_model_factory.
+    """
+
+    def __init__(self, model_name: str, latency_fn=None, responder=None):
+        self.model_name = model_name
+        self.latency_fn = latency_fn or (lambda name: 0.0)
+        self.responder = responder or (lambda prompt, name: DEFAULT_RESPONSE)
+
+    def generate_content(self, prompt_text, **kwargs):
+        time.sleep(self.latency_fn(self.model_name))
+        return BatchResponse(self.responder(prompt_text, self.model_name))
+
+
+def latency_stub_factory(base_latency: float = 0.05, slow_latency: float = 2.0, slow_rate: float = 0.05,
+                         seed: int | None = None, responder=None):
+    """Model factory whose calls usually take base_latency but take slow_latency slow_rate of the time."""
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    def latency(model_name):
+        with rng_lock:
+            return slow_latency if rng.random() < slow_rate else base_latency
+
+    return lambda model_name: LatencyStubModel(model_name, latency, responder)
+
+
+class FakeKeyClient:
+    """
+    Stand-in for one API key's client (utils.key_pool): its models answer after `latency` seconds
+    and raise ResourceExhausted once the key has served `rpm` calls to that model in the last
+    minute, as Gemini quotas are per key and model. Use with
+    ApiKeyPool(keys, client_factory=lambda key: FakeKeyClient(key, rpm=...)).
+    """
+
+    # Like GeminiKeyClient: shared contexts are sent inline, so no provider cache is created with a fake key
+    supports_context_cache = False
+
+    def __init__(self, api_key: str, rpm: int = 60, latency: float = 0.0, responder=None):
+        self.api_key = api_key
+        self.rpm = rpm
+        self.latency = latency
+        self.responder = responder or (lambda prompt, name: DEFAULT_RESPONSE)
+        self.served = {}           # model -> deque of call times
+        self._lock = threading.Lock()
+
+    def _admit(self, model_name: str):
+        from google.api_core.exceptions import ResourceExhausted
+
+        now = time.monotonic()
+        with self._lock:
+            served = self.served.setdefault(model_name, deque())
+            while served and now - served[0] > 60:
+                served.popleft()
+            if len(served) >= self.rpm:
+                raise ResourceExhausted(f"Quota exceeded for {model_name} on fake key ...{self.api_key[-4:]}")
+            served.append(now)
+
+    def model(self, model_name: str):
+        return FakeKeyModel(self, model_name)
+
+
+class FakeKeyModel:
+    def __init__(self, client: FakeKeyClient, model_name: str):
+        self.client = client
+        self.model_name = model_name
+
+    def generate_content(self, prompt_text, **kwargs):
+        self.client._admit(self.model_name)
+        time.sleep(self.client.latency)
+        return BatchResponse(self.client.responder(prompt_text, self.model_name))
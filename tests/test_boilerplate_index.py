@@ -0,0 +1,73 @@
+from utils.boilerplate_index import BoilerplateIndex, split_blocks
+
+PREREQUISITES = (
+    "[H2] Prerequisites\n"
+    "- Install the MoEngage SDK version 12.0 or later in your Android and iOS applications before you start.\n"
+    "- Make sure your workspace has push notifications enabled and the FCM or APNs credentials uploaded.\n"
+    "- Ask your account manager to enable the campaign feature flag for the data center your workspace uses."
+)
+
+
+def prose(topic: str) -> str:
+    return (f"This article explains how {topic} works in the dashboard, which settings control it, and how "
+            f"the results of {topic} show up in analytics once the first users have been reached by it.")
+
+
+def test_paragraphs_become_separate_blocks_with_their_headings():
+    text = "[H1] Title\nFirst paragraph.\nSecond paragraph.\n- one\n- two\nA | B\n--- | ---\n1 | 2"
+    assert split_blocks(text) == ["[H1] Title\nFirst paragraph.", "Second paragraph.", "- one\n- two",
+                                  "A | B\n--- | ---\n1 | 2"]
+
+
+def test_page_without_headings_is_split_per_paragraph():
+    assert len(split_blocks("\n".join(prose(t) for t in ("segments", "flows", "cards")))) == 3
+
+
+def build(pages: dict) -> BoilerplateIndex:
+    index = BoilerplateIndex()
+    for url, text in pages.items():
+        index.add_page(url, text)
+    index.build()
+    return index
+
+
+def test_near_duplicate_blocks_are_shared_and_replaced():
+    variant = PREREQUISITES.replace("version 12.0", "version 12.1")
+    index = build({
+        "a": f"[H1] Push\n{prose('push')}\n{PREREQUISITES}",
+        "b": f"[H1] Email\n{prose('email')}\n{variant}",
+        "c": f"[H1] Cards\n{prose('cards')}\n{PREREQUISITES}",
+    })
+    [block] = index.shared.values()
+    assert block["pages"] == ["a", "b", "c"] and block["text"] == PREREQUISITES
+
+    text, ids = index.reduced_text("b")
+    assert ids == [block["id"]]
+    assert prose("email") in text and "[SHARED BLOCK" in text and "FCM" not in text
+
+    savings = index.savings_report()
+    assert savings["shared_blocks"] == 1 and savings["shared_block_occurrences"] == 3
+    assert savings["estimated_input_tokens_saved"] > 0
+
+
+UNRELATED = {
+    "a": "Push templates let marketers reuse layouts across campaigns. Pick a template in step two of the "
+         "campaign editor, then fill in the title, message and deep link; images are cropped to a 2:1 ratio on Android devices.",
+    "b": "Segment exports are written to your S3 bucket every night as gzipped CSV files. Each file holds one "
+         "row per user with the attributes selected in the export settings, plus the time the export job started.",
+    "c": "Content cards stay in the app inbox until they expire or the user dismisses them. Cards can be "
+         "pinned to the top of the inbox, and their order otherwise follows the time each card was delivered to the device.",
+}
+
+
+def test_unrelated_blocks_are_not_clustered():
+    assert all(len(text) >= 200 for text in UNRELATED.values())
+    index = build(UNRELATED)
+    assert index.shared == {}
+    assert index.reduced_text("a") == (UNRELATED["a"], [])
+
+
+def test_page_made_only_of_shared_blocks_keeps_its_text():
+    index = build({"a": PREREQUISITES, "b": f"{prose('email')}\n{PREREQUISITES}"})
+    assert index.reduced_text("a") == (PREREQUISITES, [])
+    assert index.reduced_text("b")[1] == list(index.shared)
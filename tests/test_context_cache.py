@@ -0,0 +1,108 @@
+import sys
+import types
+import datetime
+
+import pytest
+
+from utils.context_cache import ContextCache, GeminiContextCacheBackend, LocalContextCacheBackend, context_key
+
+
+class FakeCachedContent:
+    """Stands in for google.generativeai.caching.CachedContent; counts provider list() round-trips."""
+
+    store = []
+    list_calls = 0
+
+    def __init__(self, model, display_name, ttl):
+        self.model = model
+        self.display_name = display_name
+        self.expire_time = datetime.datetime.now(datetime.timezone.utc) + ttl
+
+    @classmethod
+    def create(cls, model, display_name, contents, ttl):
+        cached = cls(model, display_name, ttl)
+        cls.store.append(cached)
+        return cached
+
+    @classmethod
+    def list(cls):
+        cls.list_calls += 1
+        return list(cls.store)
+
+    def delete(self):
+        self.store.remove(self)
+
+
+@pytest.fixture
+def fake_caching(monkeypatch):
+    FakeCachedContent.store = []
+    FakeCachedContent.list_calls = 0
+    genai = types.ModuleType("google.generativeai")
+    genai.caching = types.SimpleNamespace(CachedContent=FakeCachedContent)
+    monkeypatch.setitem(sys.modules, "google.generativeai", genai)
+    return FakeCachedContent
+
+
+def cache_for(backend):
+    return ContextCache(backend, ttl=600, min_chars=10)
+
+
+def test_provider_is_listed_once_per_process(fake_caching):
+    backend = GeminiContextCacheBackend()
+    cache = cache_for(backend)
+    for page in range(5):
+        cache._get_or_create("gemini-2.0-flash", f"page {page} " * 10)
+    assert fake_caching.list_calls == 1
+    assert len(fake_caching.store) == 5
+
+
+def test_cache_from_an_earlier_process_is_reused(fake_caching):
+    context = "shared page text " * 10
+    cache_for(GeminiContextCacheBackend())._get_or_create("gemini-2.0-flash", context)
+
+    later = cache_for(GeminiContextCacheBackend())
+    later._get_or_create("gemini-2.0-flash", context)
+    assert later.stats["created"] == 0
+    assert len(fake_caching.store) == 1
+
+
+def test_released_cache_is_not_found_again(fake_caching):
+    backend = GeminiContextCacheBackend()
+    cache = cache_for(backend)
+    context = "page to release " * 10
+    cache._get_or_create("gemini-2.0-flash", context)
+    cache.release(context)
+
+    cache._get_or_create("gemini-2.0-flash", context)
+    assert cache.stats["created"] == 2
+    assert fake_caching.list_calls == 1
+
+
+def test_release_key_drops_every_model_for_that_context(fake_caching):
+    cache = cache_for(GeminiContextCacheBackend())
+    context = "page released by key " * 10
+    cache._get_or_create("gemini-2.0-flash", context)
+    cache._get_or_create("gemini-1.5-pro", context)
+    cache._get_or_create("gemini-2.0-flash", "another page " * 10)
+
+    cache.release_key(context_key(context))
+    assert [c.display_name.split("-", 2)[2] for c in fake_caching.store] == ["gemini-2.0-flash"]
+
+
+class RecordingModel:
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt_text, **kwargs):
+        self.prompts.append(prompt_text)
+        return prompt_text
+
+
+def test_local_backend_prefixes_the_callers_model():
+    cache = ContextCache(LocalContextCacheBackend(), ttl=600, min_chars=10)
+    caller_model = RecordingModel()
+    model = cache.model_for("gemini-2.0-flash", "page context " * 10, caller_model)
+
+    model.generate_content("prompt")
+    assert caller_model.prompts == ["page context " * 10 + "prompt"]
+    assert cache.stats["created"] == 1
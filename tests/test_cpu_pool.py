@@ -0,0 +1,45 @@
+import threading
+
+from utils.cpu_pool import find_close_sentences, parse_and_score_pages, create_cpu_pool
+
+
+def test_inline_matching_is_isolated_between_threads():
+    documents = {
+        i: [f"Document {i} sentence number {n} is here." for n in range(50)]
+        for i in range(8)
+    }
+    results = {}
+    start = threading.Barrier(len(documents))
+
+    def match(i):
+        start.wait()
+        originals = [f"Document {i} sentence number {n} is here" for n in range(50)]
+        results[i] = find_close_sentences(originals, documents[i], workers=1)
+
+    threads = [threading.Thread(target=match, args=(i,)) for i in documents]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for i, sentences in documents.items():
+        assert results[i] == sentences
+
+
+def test_process_pool_matches_inline():
+    sentences = ["The quick brown fox jumps.", "Segments update every hour.", "Push needs a token."]
+    originals = ["Segments update every hour", "Push needs a token", "Nothing like this"]
+    inline = find_close_sentences(originals, sentences, workers=1)
+    assert inline == ["Segments update every hour.", "Push needs a token.", None]
+    assert find_close_sentences(originals, sentences, workers=2) == inline
+
+
+def test_shared_pool_is_reused_across_calls():
+    pool = create_cpu_pool(2)
+    try:
+        first = parse_and_score_pages([("a", ""), ("b", "")], workers=2, pool=pool)
+        second = parse_and_score_pages([("c", ""), ("d", "")], workers=2, pool=pool)
+    finally:
+        pool.shutdown()
+    assert [p["url"] for p in first + second] == ["a", "b", "c", "d"]
+    assert create_cpu_pool(1) is None
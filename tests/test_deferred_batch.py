@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from utils import gemini
+from utils.batch_backend import (
+    BatchBackend, JOB_FAILED, JOB_PENDING, JOB_SUCCEEDED, parse_result_lines, read_batch_file, run_deferred_jobs,
+)
+from utils.gemini import DeferredCollector, deferred_generation, generate_with_fallback
+
+
+class RecordingBackend(BatchBackend):
+    """Answers each prompt with "answer:<prompt>" after one pending poll; records every submission."""
+
+    def __init__(self, fail_jobs=()):
+        self.submitted = []
+        self.fail_jobs = set(fail_jobs)
+        self._jobs = {}
+
+    def submit(self, model_name, job_file, display_name):
+        job_name = f"jobs/{len(self.submitted) + 1}"
+        self.submitted.append((model_name, display_name))
+        self._jobs[job_name] = {"requests": read_batch_file(job_file), "polls": 0}
+        return job_name
+
+    def poll(self, job_name):
+        if job_name in self.fail_jobs:
+            return JOB_FAILED
+        job = self._jobs[job_name]
+        job["polls"] += 1
+        return JOB_SUCCEEDED if job["polls"] > 1 else JOB_PENDING
+
+    def results(self, job_name):
+        return parse_result_lines(
+            json.dumps({"key": key, "response": {"candidates": [{"content": {"parts": [{"text": f"answer:{prompt}"}]}}]}})
+            for key, prompt in self._jobs[job_name]["requests"]
+        )
+
+
+@pytest.fixture(autouse=True)
+def fixed_routes():
+    gemini.set_model_routes([
+        {"name": "fast", "analyzers": ["style"], "models": ["fast-model"]},
+        {"name": "default", "models": ["primary-model", "fallback-model"]},
+    ])
+    yield
+    gemini.set_model_routes(None)
+
+
+def collect(prompts):
+    collector = DeferredCollector()
+    with deferred_generation(collector):
+        for prompt, analyzer in prompts:
+            response = generate_with_fallback(prompt, None, analyzer=analyzer)
+            assert response.text == DeferredCollector.PLACEHOLDER_TEXT
+    return collector
+
+
+def test_batch_backend_requires_every_method():
+    class Incomplete(BatchBackend):
+        def submit(self, model_name, job_file, display_name):
+            return "job"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_collect_pass_dedupes_prompts_and_records_the_route_model():
+    collector = collect([("same prompt", "style"), ("same prompt", "style"), ("other prompt", "completeness")])
+    assert sorted(r["prompt"] for r in collector.requests.values()) == ["other prompt", "same prompt"]
+    models = {r["prompt"]: r["model"] for r in collector.requests.values()}
+    assert models == {"same prompt": "fast-model", "other prompt": "primary-model"}
+
+
+def test_replay_pass_answers_from_results(tmp_path):
+    collector = collect([("first", "style"), ("second", "completeness")])
+    backend = RecordingBackend()
+    collector.results = run_deferred_jobs(collector, backend, str(tmp_path), poll_interval=0)
+
+    assert sorted(model for model, _ in backend.submitted) == ["fast-model", "primary-model"]
+    with deferred_generation(collector):
+        assert generate_with_fallback("first", None, analyzer="style").text == "answer:first"
+        assert generate_with_fallback("second", None, analyzer="completeness").text == "answer:second"
+        # A prompt that was never collected has no result
+        assert generate_with_fallback("unseen", None, analyzer="style") is None
+
+
+def test_rerun_resumes_jobs_from_the_manifest(tmp_path):
+    collector = collect([("first", "style"), ("second", "completeness")])
+    backend = RecordingBackend()
+    first = run_deferred_jobs(collector, backend, str(tmp_path), poll_interval=0)
+
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert len(manifest) == 2 and all(entry["digest"] for entry in manifest)
+
+    second = run_deferred_jobs(collector, backend, str(tmp_path), poll_interval=0)
+    assert len(backend.submitted) == 2
+    assert second == first
+
+
+def test_changed_prompts_and_failed_jobs_are_resubmitted(tmp_path):
+    backend = RecordingBackend()
+    run_deferred_jobs(collect([("first", "style"), ("second", "completeness")]), backend, str(tmp_path), poll_interval=0)
+    manifest = {e["model"]: e["job"] for e in json.loads((tmp_path / "manifest.json").read_text())}
+
+    backend.fail_jobs.add(manifest["primary-model"])
+    results = run_deferred_jobs(collect([("first, edited", "style"), ("second", "completeness")]), backend,
+                                str(tmp_path), poll_interval=0)
+
+    assert len(backend.submitted) == 4
+    assert sorted(results.values()) == ["answer:first, edited", "answer:second"]
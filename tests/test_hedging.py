@@ -0,0 +1,121 @@
+import time
+import threading
+
+import pytest
+
+from utils.hedging import Hedger
+
+
+def primed_hedger(**kwargs):
+    """A hedger whose tracked p95 for model "m" is 50 ms."""
+    hedger = Hedger(mode="same", percentile=95, min_samples=5, budget_ratio=1.0, **kwargs)
+    for _ in range(10):
+        hedger.tracker.record("m", 0.05)
+    return hedger
+
+
+def scripted(latencies):
+    """fn(model_name) whose n-th call sleeps latencies[n] and returns ("call-n", model_name)."""
+    calls = []
+    lock = threading.Lock()
+
+    def fn(model_name):
+        with lock:
+            n = len(calls)
+            calls.append(model_name)
+        time.sleep(latencies[n])
+        return f"call-{n}", model_name
+
+    return fn, calls
+
+
+def test_no_hedge_before_enough_samples():
+    hedger = Hedger(mode="same", min_samples=5)
+    fn, calls = scripted([0.2])
+    assert hedger.call(fn, "m") == (("call-0", "m"), "m")
+    assert hedger.get_stats()["hedged"] == 0
+
+
+def test_fast_call_is_not_hedged():
+    hedger = primed_hedger()
+    fn, calls = scripted([0.0])
+    hedger.call(fn, "m")
+    assert len(calls) == 1
+    assert hedger.get_stats()["hedged"] == 0
+
+
+def test_hedge_fires_after_the_tracked_percentile_and_first_result_wins():
+    hedger = primed_hedger()
+    fn, calls = scripted([0.5, 0.0])
+    started = time.monotonic()
+    result, model = hedger.call(fn, "m")
+    elapsed = time.monotonic() - started
+
+    assert result == ("call-1", "m")
+    assert 0.05 <= elapsed < 0.4
+    stats = hedger.get_stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1 and stats["discarded"] == 1
+
+
+def test_primary_wins_when_the_hedge_is_slower():
+    hedger = primed_hedger()
+    fn, calls = scripted([0.1, 0.5])
+    assert hedger.call(fn, "m") == (("call-0", "m"), "m")
+    assert hedger.get_stats()["hedge_wins"] == 0
+
+
+def test_invalid_hedge_result_does_not_win():
+    hedger = primed_hedger()
+    fn, calls = scripted([0.15, 0.0])
+    result, _ = hedger.call(fn, "m", is_valid=lambda r: r[0] != "call-1")
+    assert result == ("call-0", "m")
+
+
+def test_hedge_skipped_without_spare_capacity_refunds_budget():
+    hedger = primed_hedger()
+    fn, calls = scripted([0.15])
+    assert hedger.call(fn, "m", prepare_hedge=lambda: None) == (("call-0", "m"), "m")
+    stats = hedger.get_stats()
+    assert len(calls) == 1
+    assert stats["hedged"] == 0 and stats["no_capacity"] == 1
+
+
+def test_losing_call_is_not_counted_and_keeps_its_slot_and_key():
+    pytest.importorskip("google.generativeai")
+    from utils import gemini
+    from utils.key_pool import ApiKeyPool, DefaultGeminiClient
+    from utils.llm_scheduler import LLMScheduler, set_scheduler, get_scheduler_stats
+    from tests.fakes import LatencyStubModel
+
+    latencies = iter([0.5, 0.0])
+    lock = threading.Lock()
+
+    def latency(model_name):
+        with lock:
+            return next(latencies, 0.0)
+
+    set_scheduler(LLMScheduler(capacity=2, reserved=0))
+    pool = ApiKeyPool(["key-aaaa", "key-bbbb"], client_factory=lambda key: DefaultGeminiClient())
+    gemini.set_key_pool(pool)
+    gemini.set_model_routes([{"name": "hedge-test", "models": ["m"]}])
+    gemini.set_model_factory(lambda name: LatencyStubModel(name, latency))
+    gemini.set_hedger(primed_hedger())
+    try:
+        response = gemini.generate_with_fallback("prompt", "key-aaaa", analyzer="style")
+        assert response is not None
+        assert gemini.get_hedge_stats()["hedge_wins"] == 1
+        route_calls = [s for s in gemini.get_route_stats() if s["route"] == "hedge-test"]
+        assert sum(s["calls"] for s in route_calls) == 1
+
+        # The slow primary is still running: it holds one slot and its key until it finishes
+        assert get_scheduler_stats()["classes"]["interactive"]["in_flight"] == 1
+        assert sorted(s["in_flight"] for s in gemini.get_key_pool_stats()) == [0, 1]
+        time.sleep(0.6)
+        assert get_scheduler_stats()["classes"]["interactive"]["in_flight"] == 0
+        assert [s["ok"] for s in gemini.get_key_pool_stats()] == [1, 1]
+    finally:
+        gemini.set_model_factory(None)
+        gemini.set_model_routes(None)
+        gemini.set_hedger(Hedger())
+        gemini.set_key_pool(None)
+        set_scheduler(LLMScheduler())
@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+from utils.job_queue import JobQueue, QueueFullError, JOB_DONE, JOB_FAILED
+
+
+def gated_queue(workers=1, max_queue=4):
+    """A queue whose "echo" jobs block until `gate` is set, then return their payload."""
+    gate = threading.Event()
+
+    def echo(job, state):
+        job.emit("working", {"n": job.payload["n"]})
+        gate.wait(timeout=5)
+        if job.payload.get("fail"):
+            raise RuntimeError("boom")
+        return job.payload["n"]
+
+    job_queue = JobQueue(handlers={"echo": echo}, workers=workers, max_queue=max_queue)
+    return job_queue, gate
+
+
+def wait_finished(job):
+    for _ in job.iter_events(heartbeat=0.1):
+        pass
+
+
+def test_identical_in_flight_job_is_deduplicated():
+    job_queue, gate = gated_queue()
+    job_queue.start()
+    try:
+        first, created = job_queue.submit("echo", "page-a", {"n": 1})
+        again, created_again = job_queue.submit("echo", "page-a", {"n": 1})
+        other, _ = job_queue.submit("echo", "page-b", {"n": 2})
+        assert created and not created_again and again is first and other is not first
+        assert job_queue.stats()["in_flight"] == 2
+
+        gate.set()
+        wait_finished(first)
+        wait_finished(other)
+        # Once finished, the same key runs again
+        later, created_later = job_queue.submit("echo", "page-a", {"n": 1})
+        assert created_later and later is not first
+        wait_finished(later)
+    finally:
+        gate.set()
+        job_queue.stop()
+
+
+def test_full_queue_rejects_new_jobs():
+    job_queue, gate = gated_queue(max_queue=2)
+    # Not started: nothing drains the queue
+    job_queue.submit("echo", "a", {"n": 1})
+    job_queue.submit("echo", "b", {"n": 2})
+    with pytest.raises(QueueFullError):
+        job_queue.submit("echo", "c", {"n": 3})
+    # A duplicate of a queued job is still answered with that job
+    assert job_queue.submit("echo", "a", {"n": 1})[1] is False
+
+
+def test_events_stream_in_order_until_the_job_finishes():
+    job_queue, gate = gated_queue()
+    job_queue.start()
+    try:
+        job, _ = job_queue.submit("echo", "a", {"n": 7})
+        failing, _ = job_queue.submit("echo", "b", {"n": 8, "fail": True})
+        gate.set()
+        events = [e for e in job.iter_events(heartbeat=0.1) if e is not None]
+        assert [e["event"] for e in events] == ["queued", "running", "working", JOB_DONE]
+        assert [e["seq"] for e in events] == list(range(4))
+        assert job.status == JOB_DONE and job.result == 7
+
+        wait_finished(failing)
+        assert failing.status == JOB_FAILED and failing.error == "boom"
+        # Replaying from an offset only yields the rest
+        assert [e["event"] for e in failing.iter_events(start=3)] == [JOB_FAILED]
+    finally:
+        job_queue.stop()
+
+
+def test_stream_sends_heartbeats_while_waiting():
+    job_queue, gate = gated_queue()
+    job_queue.start()
+    try:
+        job, _ = job_queue.submit("echo", "a", {"n": 1})
+        stream = job.iter_events(start=3, heartbeat=0.05)
+        assert next(stream) is None
+        gate.set()
+        assert [e["event"] for e in stream if e is not None] == [JOB_DONE]
+    finally:
+        job_queue.stop()
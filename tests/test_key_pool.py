@@ -0,0 +1,163 @@
+import time
+
+import pytest
+
+from utils.key_pool import ApiKeyPool, GeminiKeyClient
+from tests.fakes import FakeKeyClient
+
+
+def fake_pool(n=3, rpm=60, **kwargs):
+    return ApiKeyPool([f"key-{i}-abcd" for i in range(n)], client_factory=lambda key: FakeKeyClient(key, rpm=rpm), **kwargs)
+
+
+def test_calls_are_spread_evenly_over_keys():
+    pool = fake_pool(3)
+    held = [pool.acquire("m") for _ in range(3)]
+    assert len({c.id for c in held}) == 3
+    for credential in held:
+        pool.release(credential, "m", "ok")
+
+    for _ in range(9):
+        pool.release(pool.acquire("m"), "m", "ok")
+    assert [s["calls"] for s in pool.get_stats()] == [4, 4, 4]
+
+
+def test_rate_limited_key_is_quarantined_for_that_model_only():
+    pool = fake_pool(2, quarantine_after=2, quarantine_seconds=60)
+    limited = pool.credentials[0]
+    for _ in range(2):
+        pool.acquire("m", exclude={pool.credentials[1].id})
+        pool.release(limited, "m", "rate_limited")
+
+    assert all(pool.acquire("m") is pool.credentials[1] for _ in range(3))
+    # The other key is busier now, but the quarantined key still serves other models
+    assert pool.acquire("fallback") is limited
+    stats = pool.get_stats()[0]
+    assert list(stats["quarantined"]) == ["m"] and stats["quarantines"] == 1
+
+
+def test_fully_quarantined_pool_still_serves_the_first_key_to_recover():
+    pool = fake_pool(2, quarantine_after=1, quarantine_seconds=60)
+    for credential in pool.credentials:
+        pool.acquire("m", exclude={c.id for c in pool.credentials if c is not credential})
+        pool.release(credential, "m", "rate_limited")
+
+    assert pool.acquire("m") is pool.credentials[0]
+    # Retries on a model never come back to a key already tried for it
+    assert pool.acquire("m", exclude={pool.credentials[0].id}) is None
+
+
+@pytest.fixture
+def fake_keys():
+    pytest.importorskip("google.generativeai")
+    from utils import gemini
+    from utils.hedging import Hedger
+    from utils.llm_scheduler import LLMScheduler, set_scheduler
+
+    def install(pool, route_name):
+        gemini.set_key_pool(pool)
+        gemini.set_model_routes([{"name": route_name, "models": ["primary", "fallback"]}])
+        return gemini
+
+    gemini.set_hedger(Hedger(mode="off"))
+    yield install
+    gemini.set_model_routes(None)
+    gemini.set_hedger(Hedger())
+    gemini.set_key_pool(None)
+    set_scheduler(LLMScheduler())
+
+
+def test_rate_limited_call_is_retried_on_another_key(fake_keys):
+    pool = ApiKeyPool(["key-0-abcd", "key-1-abcd"],
+                      client_factory=lambda key: FakeKeyClient(key, rpm=0 if key == "key-0-abcd" else 10))
+    gemini = fake_keys(pool, "key-retry")
+
+    assert gemini.generate_with_fallback("prompt", "key-0-abcd", analyzer="style") is not None
+    assert [(s["rate_limited"], s["ok"]) for s in gemini.get_key_pool_stats()] == [(1, 0), (0, 1)]
+    route = {s["model"]: s for s in gemini.get_route_stats() if s["route"] == "key-retry"}
+    assert route["primary"]["ok"] == 1 and "fallback" not in route
+
+
+def test_key_exhausted_on_primary_model_still_serves_the_fallback(fake_keys):
+    pool = ApiKeyPool(["key-0-abcd"], client_factory=lambda key: FakeKeyClient(key, rpm=1), quarantine_after=1)
+    gemini = fake_keys(pool, "key-fallback")
+
+    assert gemini.generate_with_fallback("first", "key-0-abcd", analyzer="style") is not None
+    assert gemini.generate_with_fallback("second", "key-0-abcd", analyzer="style") is not None
+    [stats] = gemini.get_key_pool_stats()
+    assert (stats["ok"], stats["rate_limited"]) == (2, 1)
+    assert list(stats["quarantined"]) == ["primary"]
+
+
+class RecordingTransport:
+    """Stands in for GenerativeServiceClient; answers every request with `text`."""
+
+    def __init__(self, text="key answer"):
+        import google.generativeai as genai
+
+        self.requests = []
+        self.reply = genai.protos.GenerateContentResponse(
+            candidates=[{"content": {"role": "model", "parts": [{"text": text}]}, "finish_reason": "STOP"}])
+
+    def generate_content(self, request):
+        self.requests.append(request)
+        return self.reply
+
+    def stream_generate_content(self, request):
+        self.requests.append(request)
+        return iter([self.reply, self.reply])
+
+
+def test_key_client_sends_requests_through_its_own_transport():
+    pytest.importorskip("google.generativeai")
+    transport = RecordingTransport()
+    model = GeminiKeyClient("key-0-abcd", transport=transport).model("gemini-2.0-flash")
+
+    assert model.generate_content("prompt").text == "key answer"
+    [request] = transport.requests
+    assert request.model == "models/gemini-2.0-flash"
+    assert [(c.role, [p.text for p in c.parts]) for c in request.contents] == [("user", ["prompt"])]
+
+
+def test_key_client_streams():
+    pytest.importorskip("google.generativeai")
+    response = GeminiKeyClient("key-0-abcd", transport=RecordingTransport()).model("m").generate_content("p", stream=True)
+
+    assert [chunk.text for chunk in response] == ["key answer", "key answer"]
+    response.resolve()
+    assert response.text == "key answer" * 2
+
+
+def test_large_context_goes_through_the_fake_key_client(fake_keys):
+    from utils.context_cache import CONTEXT_CACHE_MIN_CHARS
+
+    prompts = []
+    context = "x" * (CONTEXT_CACHE_MIN_CHARS + 1000)
+    pool = ApiKeyPool(["key-0-abcd"], client_factory=lambda key: FakeKeyClient(
+        key, responder=lambda prompt, name: prompts.append(prompt) or '{"assessment": "ok", "suggestions": []}'))
+    gemini = fake_keys(pool, "key-context")
+
+    assert gemini.generate_with_fallback("prompt", "key-0-abcd", analyzer="style", context=context) is not None
+    assert prompts == [context + "prompt"]
+    assert gemini.get_context_cache().stats["created"] == 0
+
+
+def test_queued_call_does_not_hold_a_key(fake_keys):
+    import threading
+    from utils.llm_scheduler import LLMScheduler, set_scheduler
+
+    pool = ApiKeyPool(["key-0-abcd", "key-1-abcd"], client_factory=lambda key: FakeKeyClient(key, latency=0.3))
+    gemini = fake_keys(pool, "key-queue")
+    set_scheduler(LLMScheduler(capacity=1, reserved=0))
+
+    calls = [threading.Thread(target=gemini.generate_with_fallback, args=("prompt", "key-0-abcd", "style"))
+             for _ in range(2)]
+    for call in calls:
+        call.start()
+    time.sleep(0.1)
+    keys_in_flight = sum(s["in_flight"] for s in gemini.get_key_pool_stats())
+    for call in calls:
+        call.join()
+    # One call ran while the other waited for the only slot without taking a key
+    assert keys_in_flight == 1
+    assert sum(s["calls"] for s in gemini.get_key_pool_stats()) == 2
@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+import subprocess
+import threading
+
+import pytest
+
+from utils.llm_scheduler import LLMScheduler, SharedLLMScheduler
+
+I, P, B = "interactive", "patching", "batch"
+
+
+@pytest.fixture(params=["local", "shared"])
+def make_scheduler(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "local":
+            return LLMScheduler(**kwargs)
+        return SharedLLMScheduler(str(tmp_path / "slots.db"), poll_interval=0.01, **kwargs)
+    return make
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+class QueuedCalls:
+    """Calls queued one at a time on their own threads; each keeps its slot until the test releases it."""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.granted = []
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def queue(self, priority_class):
+        depth = self.depth(priority_class)
+        thread = threading.Thread(target=self._call, args=(priority_class,), daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        wait_for(lambda: self.depth(priority_class) == depth + 1)
+
+    def depth(self, priority_class):
+        return self.scheduler.get_stats()["classes"][priority_class]["queue_depth"]
+
+    def _call(self, priority_class):
+        self.scheduler.acquire(priority_class)
+        with self._lock:
+            self.granted.append(priority_class)
+
+    def drain(self, first_release):
+        """Release first_release, then each call as it is granted; returns the grant order."""
+        self.scheduler.release(first_release)
+        for n in range(1, len(self._threads) + 1):
+            wait_for(lambda: len(self.granted) >= n)
+            self.scheduler.release(self.granted[n - 1])
+        return list(self.granted)
+
+
+def test_free_slots_follow_weighted_fair_order(make_scheduler):
+    scheduler = make_scheduler(capacity=1, reserved=0, starvation_seconds=60)
+    scheduler.acquire(I)
+    calls = QueuedCalls(scheduler)
+    for priority_class in (B, B, P, P, I, I, I, I):
+        calls.queue(priority_class)
+
+    # Finish tags: interactive every 1/8, patching every 1/4, batch every 1 unit of virtual time
+    assert calls.drain(I) == [I, I, P, I, I, P, B, B]
+
+
+def test_starving_call_is_promoted(make_scheduler):
+    scheduler = make_scheduler(capacity=1, reserved=0, starvation_seconds=0.2)
+    scheduler.acquire(I)
+    calls = QueuedCalls(scheduler)
+    calls.queue(B)
+    time.sleep(0.3)
+    calls.queue(I)
+    calls.queue(I)
+
+    assert calls.drain(I) == [B, I, I]
+    assert scheduler.get_stats()["classes"][B]["starvation_promotions"] == 1
+
+
+def test_batch_never_takes_the_reserved_slot(make_scheduler):
+    scheduler = make_scheduler(capacity=2, reserved=1, starvation_seconds=60)
+    scheduler.acquire(B)
+    calls = QueuedCalls(scheduler)
+    calls.queue(B)
+    assert not scheduler.try_acquire(B)
+
+    interactive = threading.Thread(target=scheduler.acquire, args=(I,), daemon=True)
+    interactive.start()
+    interactive.join(timeout=5)
+    assert not interactive.is_alive()
+    assert calls.granted == []
+
+    scheduler.release(B)
+    wait_for(lambda: calls.granted == [B])
+    stats = scheduler.get_stats()["classes"]
+    assert (stats[I]["in_flight"], stats[B]["in_flight"]) == (1, 1)
+
+
+def test_processes_share_one_budget(tmp_path):
+    path = str(tmp_path / "slots.db")
+    crawl = SharedLLMScheduler(path, capacity=2, reserved=1, poll_interval=0.01)
+    editor = SharedLLMScheduler(path, capacity=2, reserved=1, poll_interval=0.01)
+
+    crawl.acquire(B)
+    crawl_calls = QueuedCalls(crawl)
+    crawl_calls.queue(B)
+    assert editor.get_stats()["classes"][B]["queue_depth"] == 1
+    # The editor's call takes the reserved slot at once, ahead of the crawl's queued call
+    call = threading.Thread(target=editor.acquire, args=(I,), daemon=True)
+    call.start()
+    call.join(timeout=5)
+    assert not call.is_alive()
+
+    editor_calls = QueuedCalls(editor)
+    editor_calls.queue(I)
+    crawl.release(B)
+    wait_for(lambda: editor_calls.granted == [I])
+    assert crawl_calls.granted == []
+
+
+def test_slots_of_an_exited_process_are_reclaimed(tmp_path):
+    path = str(tmp_path / "slots.db")
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = ("from utils.llm_scheduler import SharedLLMScheduler\n"
+              f"SharedLLMScheduler({path!r}, capacity=1, reserved=0).acquire('batch')\n")
+    subprocess.run([sys.executable, "-c", script], cwd=repo, check=True, timeout=60)
+
+    scheduler = SharedLLMScheduler(path, capacity=1, reserved=0, poll_interval=0.01)
+    call = threading.Thread(target=scheduler.acquire, args=(I,), daemon=True)
+    call.start()
+    call.join(timeout=5)
+    assert not call.is_alive()
+    assert scheduler.get_stats()["classes"][B]["in_flight"] == 0
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from utils import gemini
+
+
+@pytest.fixture(autouse=True)
+def reset_routes(monkeypatch):
+    monkeypatch.delenv("GEMINI_MODEL_ROUTES", raising=False)
+    monkeypatch.delenv("GEMINI_MODEL_ROUTES_FILE", raising=False)
+    gemini.set_model_routes(None)
+    yield
+    gemini.set_model_routes(None)
+
+
+def test_unnamed_route_gets_a_name(monkeypatch):
+    monkeypatch.setenv("GEMINI_MODEL_ROUTES", json.dumps([
+        {"analyzers": ["style"], "models": ["fast"]},
+        {"name": "default", "models": ["primary"]},
+    ]))
+    route = gemini.select_route("style", 100)
+    assert route["name"] == "route-1"
+    assert route["models"] == ["fast"]
+
+
+@pytest.mark.parametrize("routes", [
+    [{"name": "bare-string", "models": "gemini-2.0-flash"}],
+    [{"name": "bad-analyzers", "analyzers": "style", "models": ["fast"]}],
+    [{"name": "bad-bound", "max_prompt_chars": "20000", "models": ["fast"]}],
+    [{"name": "no-models"}],
+    {"name": "not-a-list", "models": ["fast"]},
+])
+def test_malformed_routes_fall_back_to_defaults(monkeypatch, routes):
+    monkeypatch.setenv("GEMINI_MODEL_ROUTES", json.dumps(routes))
+    assert gemini.select_route("completeness", 100)["name"] == "completeness"
+
+
+def test_set_model_routes_rejects_malformed_routes():
+    with pytest.raises(ValueError, match="models"):
+        gemini.set_model_routes([{"name": "x", "models": "fast"}])
@@ -0,0 +1,63 @@
+import json
+
+from utils.page_readiness import HostProfiles, should_block, wait_adaptive
+
+
+class FakePage:
+    """Playwright page stand-in: `present` selectors exist after goto; `appear_on_settle` once the wait has settled."""
+
+    def __init__(self, present, appear_on_settle=()):
+        self.present = set(present)
+        self.appear_on_settle = set(appear_on_settle)
+        self.watched = None
+        self.mouse = self
+
+    def goto(self, url, **kwargs):
+        pass
+
+    def wheel(self, x, y):
+        pass
+
+    def wait_for_selector(self, selector, timeout=None):
+        assert any(s.strip() in self.present for s in selector.split(", "))
+
+    def query_selector(self, selector):
+        return object() if selector in self.present else None
+
+    def evaluate(self, script, args):
+        self.watched = args[0]
+        self.present |= self.appear_on_settle
+        return {"settleMs": 120.0, "elapsedMs": 520.0, "mutations": 3, "timedOut": False}
+
+
+def test_generic_shell_does_not_hide_the_article(tmp_path):
+    profiles = HostProfiles(str(tmp_path / "profiles.json"))
+    page = FakePage(present={"main"}, appear_on_settle={".article"})
+
+    ready = wait_adaptive(page, "https://help.example.com/a", profiles)
+
+    assert page.watched == "main"
+    assert ready["selector"] == ".article"
+    assert profiles.get("help.example.com")["selector"] == ".article"
+
+
+def test_profiles_are_written_every_n_updates_and_on_flush(tmp_path):
+    path = tmp_path / "profiles.json"
+    profiles = HostProfiles(str(path), save_every=3)
+    for _ in range(2):
+        profiles.record("docs.example.com", ".article", 100.0, False)
+    assert not path.exists()
+
+    profiles.record("docs.example.com", ".article", 100.0, False)
+    assert json.loads(path.read_text())["docs.example.com"]["samples"] == 3
+
+    profiles.record("docs.example.com", ".article", 100.0, True)
+    profiles.flush()
+    saved = json.loads(path.read_text())["docs.example.com"]
+    assert saved["samples"] == 4 and saved["timeouts"] == 1
+
+
+def test_help_center_scripts_are_not_blocked():
+    assert not should_block("script", "https://static.zdassets.com/hc/assets/theme.js")
+    assert should_block("script", "https://www.googletagmanager.com/gtm.js")
+    assert should_block("image", "https://help.moengage.com/hc/logo.png")
@@ -0,0 +1,28 @@
+from utils.prompt_compaction import compact_document
+
+
+def compacted_lines(text):
+    return compact_document(text, rules=("boilerplate",)).text.splitlines()
+
+
+def test_navigation_lines_are_dropped():
+    lines = compacted_lines("Submit a request\nSign in\n[H1] Create a campaign\nPick a segment first.\nBack to top")
+    assert lines == ["[H1] Create a campaign", "Pick a segment first."]
+
+
+def test_headings_with_navigation_wording_are_kept():
+    text = "[H2] Sign in\nUse your workspace email.\n[H3] Submit a request\nOpen the support form.\n[H3] Share"
+    assert compacted_lines(text) == text.splitlines()
+
+
+def test_help_center_widget_headings_are_dropped():
+    text = "[H2] Segments\nGroups of users.\n[H3] Related articles\n[H2] Was this article helpful?\n[H2] 0 comments"
+    assert compacted_lines(text) == ["[H2] Segments", "Groups of users."]
+
+
+def test_offsets_point_back_into_the_original_text():
+    text = "Sign in\n[H2] Sign in\nUse your workspace email."
+    compacted = compact_document(text)
+    start = compacted.text.index("[H2] Sign in")
+    o_start, o_end = compacted.to_original(start, start + len("[H2] Sign in"))
+    assert text[o_start:o_end] == "[H2] Sign in"
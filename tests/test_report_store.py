@@ -0,0 +1,87 @@
+import pytest
+
+from utils.report_store import ReportStore, main
+
+
+def report(url, score=60.0, completeness=None, suggestions=()):
+    return {
+        "url_analyzed": url,
+        "readability": {"score": score, "assessment": "Readable."},
+        "completeness_of_information": {"assessment": completeness or "Complete.", "suggestions": list(suggestions)},
+        "errors": [],
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ReportStore(str(tmp_path / "reports.db")) as store:
+        yield store
+
+
+def test_add_reports_keeps_every_run(store):
+    ids = store.add_reports([
+        (report("https://docs/a", 40.0), "old text", 100.0),
+        (report("https://docs/a", 55.0), "new text", 200.0),
+    ])
+    assert len(ids) == 2
+    assert [r["readability_score"] for r in store.history("https://docs/a")] == [55.0, 40.0]
+    assert store.latest("https://docs/a")["report"]["readability"]["score"] == 55.0
+
+
+def test_worst_readability_uses_latest_report_per_url(store):
+    store.add_reports([
+        (report("https://docs/a", 10.0), "a", 100.0),
+        (report("https://docs/a", 80.0), "a2", 200.0),
+        (report("https://docs/b", 30.0), "b", 100.0),
+        (report("https://docs/c", None), "c", 100.0),
+    ])
+    assert [r["url"] for r in store.worst_readability(limit=5)] == ["https://docs/b", "https://docs/a"]
+
+
+def test_search_matches_terms_with_punctuation_as_a_phrase(store):
+    store.add_reports([
+        (report("https://docs/a", completeness="Explain the segment-setup flow for in-app messages.",
+                suggestions=[{"suggestion": "Add iOS/Android steps."}]), "a", 100.0),
+        (report("https://docs/b", completeness="Segment exports are covered."), "b", 100.0),
+    ])
+    assert [r["url"] for r in store.search("segment-setup")] == ["https://docs/a"]
+    assert [r["url"] for r in store.search("in-app")] == ["https://docs/a"]
+    assert [r["url"] for r in store.search('say "hi"')] == []
+    assert [r["url"] for r in store.completeness_issues("iOS/Android")] == ["https://docs/a"]
+
+
+def test_raw_search_uses_fts_syntax(store):
+    store.add_reports([(report("https://docs/a", completeness="Segment and push notification gaps."), "a", 100.0)])
+    assert len(store.search('segment AND "push notification"', raw=True)) == 1
+    with pytest.raises(ValueError):
+        store.search("segment-setup", raw=True)
+
+
+def test_completeness_issues_skips_pages_without_suggestions(store):
+    store.add_reports([
+        (report("https://docs/a", completeness="SDK setup is missing.", suggestions=["Add SDK setup."]), "a", 100.0),
+        (report("https://docs/b", completeness="SDK setup is covered."), "b", 100.0),
+    ])
+    assert [r["url"] for r in store.completeness_issues("SDK")] == ["https://docs/a"]
+    assert len(store.search("SDK")) == 2
+
+
+def test_changed_since_reports_new_and_changed_pages_only(store):
+    store.add_reports([
+        (report("https://docs/same"), "unchanged", 100.0),
+        (report("https://docs/same"), "unchanged", 300.0),
+        (report("https://docs/edited"), "before", 100.0),
+        (report("https://docs/edited"), "after", 300.0),
+        (report("https://docs/new"), "brand new", 300.0),
+        (report("https://docs/old"), "old", 100.0),
+    ])
+    changed = {r["url"]: r for r in store.changed_since(200.0)}
+    assert sorted(changed) == ["https://docs/edited", "https://docs/new"]
+    assert changed["https://docs/new"]["previous_hash"] is None
+
+
+def test_cli_search_quotes_by_default(store, capsys):
+    store.add_reports([(report("https://docs/a", completeness="Document the opt-in flow."), "a", 100.0)])
+    assert main(["--db", store.path, "search", "opt-in"]) == 0
+    assert "https://docs/a" in capsys.readouterr().out
+    assert main(["--db", store.path, "search", "--raw", "opt-in"]) == 2
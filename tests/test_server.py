@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+pytest.importorskip("flask")
+import server
+from utils.job_queue import JobQueue
+
+
+@pytest.fixture
+def service():
+    """The app over a queue whose analyze jobs wait for `gate` and never touch a browser."""
+    gate = threading.Event()
+
+    def analyze(job, state):
+        job.emit("fetched", {"chars": 5})
+        gate.wait(timeout=5)
+        return {"report": {"url_analyzed": job.payload["url"]}}
+
+    job_queue = JobQueue(handlers={"analyze": analyze, "patch": analyze}, workers=1, max_queue=1)
+    app = server.create_app(job_queue, api_token="", cors_origins=[])
+    yield app.test_client(), job_queue, gate
+    gate.set()
+    job_queue.stop()
+
+
+ARTICLE = "https://help.moengage.com/hc/en-us/articles/1-Segments"
+
+
+@pytest.mark.parametrize("url", [
+    "http://169.254.169.254/latest/meta-data/",
+    "http://localhost:5000/stats",
+    "file:///etc/passwd",
+    "https://help.moengage.com.evil.example/hc/",
+    "https://user:pw@help.moengage.com/hc/",
+    "https://help.moengage.com:8443/hc/",
+])
+def test_urls_outside_the_allowlist_are_rejected(service, url):
+    client, job_queue, _ = service
+    response = client.post("/jobs/analyze", json={"url": url})
+    assert response.status_code == 400
+    assert job_queue.stats()["tracked_jobs"] == 0
+
+
+def test_allowed_host_is_configurable():
+    assert server.check_url(ARTICLE) is None
+    assert server.check_url("https://docs.example.com/a", allowed_hosts=["docs.example.com"]) is None
+    assert server.check_url(ARTICLE, allowed_hosts=["docs.example.com"]) is not None
+
+
+def test_duplicate_submission_and_full_queue(service):
+    client, job_queue, gate = service
+    first = client.post("/jobs/analyze", json={"url": ARTICLE}).get_json()
+    again = client.post("/jobs/analyze", json={"url": ARTICLE}).get_json()
+    assert again["job_id"] == first["job_id"] and again["deduplicated"] is True
+
+    # Not started, so the single queue slot stays taken
+    response = client.post("/jobs/analyze", json={"url": ARTICLE + "-2"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(server.SERVICE_RETRY_AFTER_SECONDS)
+
+
+def test_events_are_streamed_as_server_sent_events(service):
+    client, job_queue, gate = service
+    job_queue.start()
+    job_id = client.post("/jobs/analyze", json={"url": ARTICLE}).get_json()["job_id"]
+    gate.set()
+
+    body = client.get(f"/jobs/{job_id}/events").get_data(as_text=True)
+    events = [line.split(": ", 1)[1] for line in body.splitlines() if line.startswith("event: ")]
+    assert events == ["queued", "running", "fetched", "done"]
+    result = client.get(f"/jobs/{job_id}/result").get_json()
+    assert result["result"]["report"]["url_analyzed"] == ARTICLE
+
+
+def test_api_token_is_required_when_configured():
+    job_queue = JobQueue(handlers={"analyze": lambda job, state: None}, workers=1)
+    client = server.create_app(job_queue, api_token="s3cret", cors_origins=[]).test_client()
+    assert client.get("/health").status_code == 200
+    assert client.get("/stats").status_code == 401
+    assert client.get("/stats", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/stats", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def test_cors_is_off_unless_origins_are_configured():
+    job_queue = JobQueue(handlers={}, workers=1)
+    closed = server.create_app(job_queue, api_token="", cors_origins=[]).test_client()
+    assert "Access-Control-Allow-Origin" not in closed.get("/health", headers={"Origin": "https://evil.example"}).headers
+
+    app = server.create_app(job_queue, api_token="", cors_origins=["https://editor.example"])
+    headers = app.test_client().get("/health", headers={"Origin": "https://editor.example"}).headers
+    assert headers["Access-Control-Allow-Origin"] == "https://editor.example"
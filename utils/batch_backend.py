@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+MAX_REQUESTS_PER_JOB = int(os.getenv("BATCH_MAX_REQUESTS_PER_JOB", "10000"))
+
+
+def write_batch_file(path: str, requests: list[tuple[str, str]]):
+    """Write (key, prompt) pairs as a JSONL batch job file in the Gemini batch request format."""
+    with open(path, "w", encoding="utf-8") as f:
+        for key, prompt in requests:
+            line = {"key": key, "request": {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}}
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+def read_batch_file(path: str) -> list[tuple[str, str]]:
+    requests = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                parts = item["request"]["contents"][0]["parts"]
+                requests.append((item["key"], "".join(p.get("text", "") for p in parts)))
+    return requests
+
+
+def parse_result_lines(lines) -> dict:
+    """Map key -> response text from Gemini batch output JSONL lines. Errored lines map to None."""
+    results = {}
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        key = item.get("key")
+        try:
+            parts = item["response"]["candidates"][0]["content"]["parts"]
+            results[key] = "".join(p.get("text", "") for p in parts)
+        except (KeyError, IndexError, TypeError):
+            logger.warning(f"BATCH_BACKEND: No usable response for request {key}: {item.get('error')}")
+            results[key] = None
+    return results
+
+
+class BatchBackend(ABC):
+    """Interface for bulk/batch model providers used by deferred audits."""
+
+    @abstractmethod
+    def submit(self, model_name: str, job_file: str, display_name: str) -> str:
+        """Submit a JSONL job file for model_name. Returns a job name to poll."""
+
+    @abstractmethod
+    def poll(self, job_name: str) -> str:
+        """Returns JOB_PENDING, JOB_SUCCEEDED or JOB_FAILED."""
+
+    @abstractmethod
+    def results(self, job_name: str) -> dict:
+        """Map request key -> response text (None for requests that errored)."""
+
+
+class GeminiBatchBackend(BatchBackend):
+    """Gemini Batch API through the google-genai SDK (uploaded JSONL file -> batch job)."""
+
+    FAILED_STATES = ("JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED")
+
+    def __init__(self, api_key: str):
+        from google import genai as google_genai
+
+        self.client = google_genai.Client(api_key=api_key)
+
+    def submit(self, model_name: str, job_file: str, display_name: str) -> str:
+        uploaded = self.client.files.upload(
+            file=job_file, config={"display_name": display_name, "mime_type": "jsonl"}
+        )
+        job = self.client.batches.create(model=model_name, src=uploaded.name, config={"display_name": display_name})
+        logger.info(f"BATCH_BACKEND: Submitted batch job {job.name} ({display_name}).")
+        return job.name
+
+    def poll(self, job_name: str) -> str:
+        state = self.client.batches.get(name=job_name).state.name
+        if state == "JOB_STATE_SUCCEEDED":
+            return JOB_SUCCEEDED
+        if state in self.FAILED_STATES:
+            return JOB_FAILED
+        return JOB_PENDING
+
+    def results(self, job_name: str) -> dict:
+        job = self.client.batches.get(name=job_name)
+        content = self.client.files.download(file=job.dest.file_name)
+        return parse_result_lines(content.splitlines())
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    Development backend for dry runs (`batch.py --deferred --batch-backend local`); never calls a
+    model. Reads the submitted job file, reports the job as pending for `polls_until_done` polls,
+    then answers every prompt with responder(prompt, model) (a canned empty assessment by default).
+    Jobs live in memory, so a resumed run needs the same instance.
+    """
+
+    def __init__(self, responder=None, polls_until_done: int = 1):
+        self.responder = responder or (lambda prompt, model: json.dumps(
+            {"assessment": "Local batch backend response.", "suggestions": []}
+        ))
+        self.polls_until_done = polls_until_done
+        self._jobs = {}
+
+    def submit(self, model_name: str, job_file: str, display_name: str) -> str:
+        job_name = f"local-batches/{len(self._jobs) + 1}"
+        self._jobs[job_name] = {"model": model_name, "requests": read_batch_file(job_file), "polls": 0}
+        return job_name
+
+    def poll(self, job_name: str) -> str:
+        job = self._jobs.get(job_name)
+        if job is None:
+            # A job from another process's manifest; report it failed so it is resubmitted
+            return JOB_FAILED
+        job["polls"] += 1
+        return JOB_SUCCEEDED if job["polls"] >= self.polls_until_done else JOB_PENDING
+
+    def results(self, job_name: str) -> dict:
+        job = self._jobs[job_name]
+        lines = []
+        for key, prompt in job["requests"]:
+            try:
+                text = self.responder(prompt, job["model"])
+                lines.append(json.dumps({"key": key, "response": {"candidates": [{"content": {"parts": [{"text": text}]}}]}}))
+            except Exception as e:
+                lines.append(json.dumps({"key": key, "error": {"message": str(e)}}))
+        return parse_result_lines(lines)
+
+
+def _file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _load_manifest(path: str) -> dict:
+    """Job file path -> manifest entry from an earlier run in the same workdir (empty if none)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {entry["file"]: entry for entry in json.load(f)}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"BATCH_BACKEND: Ignoring unreadable manifest {path}: {e}")
+        return {}
+
+
+def _write_manifest(path: str, manifest: list[dict]):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_deferred_jobs(collector, backend: BatchBackend, workdir: str, poll_interval: float = 60.0,
+                      timeout: float | None = None) -> dict:
+    """
+    Write the collector's prompts into per-model job files under workdir, submit them, poll until
+    every job finishes, and return key -> response text. A manifest.json records submitted jobs
+    as they are submitted; a rerun in the same workdir with the same prompts resumes those jobs
+    instead of submitting (and paying for) them again. Jobs that had failed are resubmitted.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    manifest_path = os.path.join(workdir, "manifest.json")
+    previous = _load_manifest(manifest_path)
+
+    by_model = {}
+    # Sorted by key so job files (and their digests) do not depend on analyzer thread timing
+    for key, req in sorted(collector.requests.items()):
+        by_model.setdefault(req["model"], []).append((key, req["prompt"]))
+
+    manifest = []
+    resumed = 0
+    for model_name, requests in sorted(by_model.items()):
+        for start in range(0, len(requests), MAX_REQUESTS_PER_JOB):
+            chunk = requests[start:start + MAX_REQUESTS_PER_JOB]
+            safe_model = model_name.replace("/", "_")
+            job_file = os.path.join(workdir, f"batch-{safe_model}-{start // MAX_REQUESTS_PER_JOB}.jsonl")
+            write_batch_file(job_file, chunk)
+            digest = _file_digest(job_file)
+            earlier = previous.get(job_file)
+            if earlier and earlier.get("digest") == digest and earlier.get("model") == model_name \
+                    and backend.poll(earlier["job"]) != JOB_FAILED:
+                job_name = earlier["job"]
+                resumed += 1
+                logger.info(f"BATCH_BACKEND: Resuming batch job {job_name} for {os.path.basename(job_file)}.")
+            else:
+                job_name = backend.submit(model_name, job_file, os.path.basename(job_file))
+            manifest.append({"job": job_name, "model": model_name, "file": job_file,
+                             "requests": len(chunk), "digest": digest})
+            # Written after every submission so an interrupted run still knows what it paid for
+            _write_manifest(manifest_path, manifest)
+
+    logger.info(f"BATCH_BACKEND: Submitted {len(collector.requests)} prompts in {len(manifest)} job(s)"
+                f" ({resumed} resumed).")
+
+    results = {}
+    pending = {m["job"] for m in manifest}
+    deadline = time.monotonic() + timeout if timeout else None
+    while pending:
+        for job_name in sorted(pending):
+            state = backend.poll(job_name)
+            if state == JOB_SUCCEEDED:
+                results.update(backend.results(job_name))
+                pending.discard(job_name)
+                logger.info(f"BATCH_BACKEND: Job {job_name} succeeded.")
+            elif state == JOB_FAILED:
+                pending.discard(job_name)
+                logger.error(f"BATCH_BACKEND: Job {job_name} failed; its prompts will be reported as LLM failures.")
+        if not pending:
+            break
+        if deadline and time.monotonic() > deadline:
+            logger.error(f"BATCH_BACKEND: Timed out waiting for {len(pending)} job(s): {sorted(pending)}")
+            break
+        time.sleep(poll_interval)
+    return results
@@ -0,0 +1,208 @@
+import re
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16                      # 16 bands x 4 rows: pairs at ~0.8 Jaccard collide with high probability
+SHINGLE_WORDS = 3
+SIMILARITY_THRESHOLD = 0.8
+MIN_BLOCK_CHARS = 200               # Smaller blocks are not worth a separate analysis
+MIN_PAGES = 2
+CHARS_PER_TOKEN = 4                 # Rough estimate used for the savings report
+PROMPTS_PER_PAGE = 4                # One prompt per analyzer
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_HEADING_RE = re.compile(r"^\[H[1-6]\] ")
+_TABLE_SEPARATOR_RE = re.compile(r"^-{3,}( \| -{3,})*$")
+
+
+def _permutations():
+    # Deterministic (a, b) pairs so signatures are comparable across runs and processes
+    perms = []
+    for i in range(NUM_PERMUTATIONS):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "big") % (_MERSENNE_PRIME - 1) + 1
+        b = int.from_bytes(digest[8:], "big") % _MERSENNE_PRIME
+        perms.append((a, b))
+    return perms
+
+
+_PERMUTATIONS = _permutations()
+
+
+def _line_kind(line: str) -> str:
+    if _HEADING_RE.match(line):
+        return "heading"
+    if line.startswith("- "):
+        return "list"
+    if " | " in line or _TABLE_SEPARATOR_RE.match(line):
+        return "table"
+    return "paragraph"
+
+
+def split_blocks(text: str) -> list[str]:
+    """
+    Split parse_main_content output into paragraph-level blocks: one paragraph, one run of list
+    items or one table, each with the heading lines directly above it. A page without headings
+    still yields one block per paragraph, so a shared block never stands in for a whole section.
+    """
+    blocks = []
+    current = []
+    current_kind = None
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        kind = _line_kind(line)
+        continues = current_kind == "heading" or (kind == current_kind and kind in ("heading", "list", "table"))
+        if current and not continues:
+            blocks.append("\n".join(current))
+            current = []
+        current.append(line)
+        current_kind = kind
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+
+def _shingles(text: str) -> set[int]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_WORDS:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    return {int.from_bytes(hashlib.blake2b(g.encode(), digest_size=4).digest(), "big") for g in grams}
+
+
+def minhash_signature(text: str) -> tuple[int, ...]:
+    shingles = _shingles(text)
+    if not shingles:
+        return tuple([_MAX_HASH] * NUM_PERMUTATIONS)
+    return tuple(
+        min(((a * s + b) % _MERSENNE_PRIME) & _MAX_HASH for s in shingles)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def estimated_similarity(sig_a: tuple[int, ...], sig_b: tuple[int, ...]) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERMUTATIONS
+
+
+class BoilerplateIndex:
+    """
+    MinHash/LSH index over the paragraph-level blocks of every page in a crawl. Blocks that occur
+    (identically or nearly so) on at least MIN_PAGES pages become shared blocks: they are analyzed
+    once and replaced in each page's prompt text by a short reference line. A page made up only of
+    shared blocks keeps its full text, so its analyzers always have the page itself to review.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, min_block_chars: int = MIN_BLOCK_CHARS,
+                 min_pages: int = MIN_PAGES):
+        self.threshold = threshold
+        self.min_block_chars = min_block_chars
+        self.min_pages = min_pages
+        self.pages = {}          # url -> list of block texts
+        self._blocks = []        # (url, position, text, signature)
+        self.shared = {}         # block id -> {"id", "text", "pages", "occurrences"}
+        self._block_to_shared = {}
+
+    def add_page(self, url: str, text: str):
+        blocks = split_blocks(text)
+        self.pages[url] = blocks
+        for position, block in enumerate(blocks):
+            if len(block) >= self.min_block_chars:
+                self._blocks.append((url, position, block, minhash_signature(block)))
+
+    def build(self) -> dict:
+        """Cluster near-duplicate blocks and keep the clusters that span enough pages."""
+        rows = NUM_PERMUTATIONS // LSH_BANDS
+        parent = list(range(len(self._blocks)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        buckets = {}
+        for i, (_, _, _, sig) in enumerate(self._blocks):
+            for band in range(LSH_BANDS):
+                buckets.setdefault((band, sig[band * rows:(band + 1) * rows]), []).append(i)
+
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                root_a, root_b = find(first), find(other)
+                if root_a != root_b and estimated_similarity(self._blocks[first][3], self._blocks[other][3]) >= self.threshold:
+                    parent[root_b] = root_a
+
+        clusters = {}
+        for i in range(len(self._blocks)):
+            clusters.setdefault(find(i), []).append(i)
+
+        self.shared = {}
+        self._block_to_shared = {}
+        for members in clusters.values():
+            pages = sorted({self._blocks[i][0] for i in members})
+            if len(pages) < self.min_pages:
+                continue
+            texts = [self._blocks[i][2] for i in members]
+            # The most common exact variant represents the cluster
+            representative = max(set(texts), key=texts.count)
+            block_id = "SB" + hashlib.sha256(representative.encode("utf-8")).hexdigest()[:10]
+            self.shared[block_id] = {"id": block_id, "text": representative, "pages": pages, "occurrences": len(members)}
+            for i in members:
+                url, position = self._blocks[i][0], self._blocks[i][1]
+                self._block_to_shared[(url, position)] = block_id
+
+        logger.info(f"BOILERPLATE_INDEX: {len(self.shared)} shared blocks found across {len(self.pages)} pages.")
+        return self.shared
+
+    @staticmethod
+    def reference_line(block: dict) -> str:
+        first_line = block["text"].splitlines()[0][:80]
+        return f"[SHARED BLOCK {block['id']}: \"{first_line}\" - analyzed separately, do not review]"
+
+    def reduced_text(self, url: str) -> tuple[str, list[str]]:
+        """Page text with shared blocks replaced by reference lines, plus the referenced block ids."""
+        blocks = self.pages[url]
+        if all((url, position) in self._block_to_shared for position in range(len(blocks))):
+            return "\n".join(blocks), []
+        out = []
+        ids = []
+        for position, block in enumerate(blocks):
+            block_id = self._block_to_shared.get((url, position))
+            if block_id is None:
+                out.append(block)
+                continue
+            out.append(self.reference_line(self.shared[block_id]))
+            if block_id not in ids:
+                ids.append(block_id)
+        return "\n".join(out), ids
+
+    def savings_report(self) -> dict:
+        """Estimated prompt-size savings for the crawl (document text only, all four analyzer prompts)."""
+        chars_before = sum(len("\n".join(blocks)) for blocks in self.pages.values())
+        chars_after = sum(len(self.reduced_text(url)[0]) for url in self.pages)
+        # Each shared block is still analyzed once on its own
+        chars_after += sum(len(block["text"]) for block in self.shared.values())
+        tokens_before = chars_before // CHARS_PER_TOKEN * PROMPTS_PER_PAGE
+        tokens_after = chars_after // CHARS_PER_TOKEN * PROMPTS_PER_PAGE
+        return {
+            "pages": len(self.pages),
+            "shared_blocks": len(self.shared),
+            "shared_block_occurrences": sum(b["occurrences"] for b in self.shared.values()),
+            "document_chars_before": chars_before,
+            "document_chars_after": chars_after,
+            "estimated_input_tokens_before": tokens_before,
+            "estimated_input_tokens_after": tokens_after,
+            "estimated_input_tokens_saved": tokens_before - tokens_after,
+            "saved_ratio": round(1 - tokens_after / tokens_before, 4) if tokens_before else 0.0,
+            "blocks": [
+                {"id": b["id"], "preview": b["text"].splitlines()[0][:80], "pages": len(b["pages"]),
+                 "chars": len(b["text"])}
+                for b in sorted(self.shared.values(), key=lambda b: -b["occurrences"] * len(b["text"]))
+            ],
+        }
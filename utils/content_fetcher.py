@@ -1,8 +1,7 @@
+import time
 import logging
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
-from readability import Document
-from playwright.sync_api import sync_playwright
+from utils.page_readiness import route_filter_for, wait_until_ready, record_fetch_time, READINESS_MODE
 
 logger = logging.getLogger(__name__)
 
@@ -10,69 +9,100 @@ class ContentFetcher:
     def __init__(self, url):
         self.url = url
         self.html = None
+        self.content_selector = None    # Container readiness matched; the parser extracts from it
 
-    def fetch_html(self):
-        """Fetch HTML using Playwright with advanced bot evasion."""
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36",
-                viewport={'width': 1280, 'height': 800},
-                java_script_enabled=True,
-                locale='en-US',
-            )
+    def fetch_html(self, browser=None, readiness=None):
+        """Fetch HTML using Playwright with advanced bot evasion.
 
-            page = context.new_page()
+        If a launched browser is passed in it is reused and only the page context is
+        closed afterwards; otherwise a browser is launched for this single fetch.
+        readiness picks how to decide the page is loaded ("adaptive" or "fixed", see
+        utils.page_readiness); it defaults to READINESS_MODE.
+        """
+        readiness = readiness or READINESS_MODE
+        if browser is not None:
+            self._fetch_with_browser(browser, readiness)
+            return
 
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
             try:
-                page.route("**/*", lambda route, request: route.continue_() if request.resource_type in ['document', 'script', 'xhr'] else route.abort())
-                page.goto(self.url, timeout=60000, wait_until="networkidle")
-                page.wait_for_selector(".article", timeout=20000)
-                page.mouse.wheel(0, 3000)
-                page.wait_for_timeout(1500)
-
-                self.html = page.content()
-                logger.info("Successfully fetched HTML content via Playwright.")
-            except Exception as e:
-                logger.error(f"Playwright failed to fetch content: {e}")
-                raise
+                self._fetch_with_browser(browser, readiness)
             finally:
                 browser.close()
 
+    def _fetch_with_browser(self, browser, readiness):
+        context = browser.new_context(
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36",
+            viewport={'width': 1280, 'height': 800},
+            java_script_enabled=True,
+            locale='en-US',
+        )
+
+        page = context.new_page()
+
+        try:
+            page.route("**/*", route_filter_for(readiness))
+            start = time.monotonic()
+            ready = wait_until_ready(page, self.url, readiness)
+
+            self.html = page.content()
+            self.content_selector = ready.get("selector")
+            elapsed = time.monotonic() - start
+            record_fetch_time(ready["mode"], elapsed)
+            logger.info(f"Successfully fetched HTML content via Playwright in {elapsed:.2f}s ({ready['mode']} readiness).")
+        except Exception as e:
+            logger.error(f"Playwright failed to fetch content: {e}")
+            raise
+        finally:
+            context.close()
+
     def parse_main_content(self):
         """Extract structured main content from the page using BeautifulSoup."""
         if not self.html:
             raise ValueError("No HTML content to parse.")
-
-        soup = BeautifulSoup(self.html, 'html.parser')
-
-        main_wrapper = soup.select_one('.article') or soup.body  
-
-        structure = []
-        for tag in main_wrapper.select('h1, h2, h3, h4, h5, h6, p, ul, ol, table'):
-            if tag.name.startswith('h'):
-                structure.append(f"[{tag.name.upper()}] {tag.get_text(strip=True)}")
-            elif tag.name in ['ul', 'ol']:
-                for li in tag.find_all('li'):
-                    structure.append(f"- {li.get_text(strip=True)}")
-            elif tag.name == 'p':
-                structure.append(tag.get_text(strip=True))
-            elif tag.name == 'table':
-                rows = tag.find_all('tr')
-                table_lines = []
-                for i, row in enumerate(rows):
-                    cols = [col.get_text(strip=True) for col in row.find_all(['td', 'th'])]
-                    line = " | ".join(cols)
-                    table_lines.append(line)
-                    # Add markdown-like separator after header row
-                    if i == 0 and len(cols) > 1:
-                        table_lines.append(" | ".join(['---'] * len(cols)))
-                structure.append("\n".join(table_lines))
-
-        return '\n'.join(structure)
+        return parse_main_content_html(self.html, self.content_selector)
 
     @classmethod
-    def get_content(cls, url):
+    def get_content(cls, url, browser=None):
         fetcher = cls(url)
-        fetcher.fetch_html()
-        return fetcher.parse_main_content()
\ No newline at end of file
+        fetcher.fetch_html(browser=browser)
+        return fetcher.parse_main_content()
+
+
+def parse_main_content_html(html: str, selector: str | None = None) -> str:
+    """
+    Extract structured main content from raw HTML using BeautifulSoup.
+    selector is the content container readiness detection matched (default '.article').
+    Takes and returns plain strings so it can run in a worker process (see utils.cpu_pool).
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+
+    main_wrapper = (selector and soup.select_one(selector)) or soup.select_one('.article') or soup.body
+
+    structure = []
+    for tag in main_wrapper.select('h1, h2, h3, h4, h5, h6, p, ul, ol, table'):
+        if tag.name.startswith('h'):
+            structure.append(f"[{tag.name.upper()}] {tag.get_text(strip=True)}")
+        elif tag.name in ['ul', 'ol']:
+            for li in tag.find_all('li'):
+                structure.append(f"- {li.get_text(strip=True)}")
+        elif tag.name == 'p':
+            structure.append(tag.get_text(strip=True))
+        elif tag.name == 'table':
+            rows = tag.find_all('tr')
+            table_lines = []
+            for i, row in enumerate(rows):
+                cols = [col.get_text(strip=True) for col in row.find_all(['td', 'th'])]
+                line = " | ".join(cols)
+                table_lines.append(line)
+                # Add markdown-like separator after header row
+                if i == 0 and len(cols) > 1:
+                    table_lines.append(" | ".join(['---'] * len(cols)))
+            structure.append("\n".join(table_lines))
+
+    return '\n'.join(structure)
@@ -0,0 +1,253 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "600"))
+# Providers refuse to cache small contexts (Gemini needs ~1k-4k tokens depending on the model)
+CONTEXT_CACHE_MIN_CHARS = int(os.getenv("CONTEXT_CACHE_MIN_CHARS", "8192"))
+
+
+def context_key(context: str) -> str:
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+
+class PrefixedModel:
+    """Model wrapper that sends the shared context inline in front of every prompt."""
+
+    def __init__(self, model, context: str):
+        self.model = model
+        self.context = context
+
+    def generate_content(self, prompt_text, **kwargs):
+        return self.model.generate_content(self.context + prompt_text, **kwargs)
+
+
+class GeminiContextCacheBackend:
+    """
+    Explicit context caching via google.generativeai.caching.CachedContent. Caches left by an
+    earlier process for the same page are found by display name; the provider is listed once, on
+    the first lookup, and after that the process-local index is kept up to date on create/delete.
+    """
+
+    def __init__(self):
+        self._by_display_name = None     # display name -> CachedContent, loaded on first find()
+        self._lock = threading.Lock()
+
+    def _display_name(self, model_name: str, key: str) -> str:
+        return f"doc-{key[:32]}-{model_name}"[:120]
+
+    def _index(self) -> dict:
+        with self._lock:
+            if self._by_display_name is None:
+                from google.generativeai import caching
+
+                self._by_display_name = {}
+                for cached in caching.CachedContent.list():
+                    if cached.display_name and cached.display_name.startswith("doc-"):
+                        self._by_display_name[cached.display_name] = cached
+                logger.info(f"CONTEXT_CACHE: Found {len(self._by_display_name)} existing document cache(s).")
+            return self._by_display_name
+
+    def create(self, model_name: str, context: str, key: str, ttl: int):
+        import datetime
+        from google.generativeai import caching
+
+        display_name = self._display_name(model_name, key)
+        handle = caching.CachedContent.create(
+            model=f"models/{model_name}",
+            display_name=display_name,
+            contents=[context],
+            ttl=datetime.timedelta(seconds=ttl),
+        )
+        index = self._index()
+        with self._lock:
+            index[display_name] = handle
+        return handle
+
+    def find(self, model_name: str, key: str):
+        """Look up a cache created earlier (by this or a previous process) for the same page."""
+        index = self._index()
+        display_name = self._display_name(model_name, key)
+        with self._lock:
+            cached = index.get(display_name)
+        if cached is None or not cached.model.endswith(model_name):
+            return None
+        remaining = self.remaining_ttl(cached)
+        if remaining is not None and remaining <= 60:
+            with self._lock:
+                index.pop(display_name, None)
+            return None
+        return cached
+
+    def remaining_ttl(self, handle) -> float | None:
+        import datetime
+
+        expire_time = getattr(handle, "expire_time", None)
+        if expire_time is None:
+            return None
+        return (expire_time - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+
+    def model_for(self, handle, model_name: str, inline_model):
+        """A model bound to the provider cache; inline_model is not needed, the cache carries the context."""
+        import google.generativeai as genai
+
+        return genai.GenerativeModel.from_cached_content(cached_content=handle)
+
+    def delete(self, handle):
+        handle.delete()
+        with self._lock:
+            if self._by_display_name is not None:
+                self._by_display_name.pop(getattr(handle, "display_name", None), None)
+
+
+class LocalContextCacheBackend:
+    """
+    In-process stand-in for tests and providers without explicit caching. "Cached" contexts are
+    sent inline as a prefix to the caller's own model (whatever client or key it is bound to),
+    which still lets implicit prefix caching kick in.
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.deleted = 0
+
+    def create(self, model_name: str, context: str, key: str, ttl: int):
+        self.created += 1
+        return {"model": model_name, "context": context, "key": key}
+
+    def find(self, model_name: str, key: str):
+        return None
+
+    def remaining_ttl(self, handle) -> float | None:
+        return None
+
+    def model_for(self, handle, model_name: str, inline_model):
+        return PrefixedModel(inline_model, handle["context"])
+
+    def delete(self, handle):
+        self.deleted += 1
+
+
+class ContextCache:
+    """
+    Per-page registry of cached document contexts, keyed by (model, context hash). Entries live for
+    `ttl` seconds from creation and are forgotten on the next lookup after that; release() deletes a
+    page's caches early. Contexts that are too small, or that the provider refused to cache, are
+    sent inline instead.
+    """
+
+    def __init__(self, backend, ttl: int = CONTEXT_CACHE_TTL_SECONDS, min_chars: int = CONTEXT_CACHE_MIN_CHARS):
+        self.backend = backend
+        self.ttl = ttl
+        self.min_chars = min_chars
+        self._entries = {}       # (model, key) -> {"handle", "expires_at"}
+        self._refused = set()    # (model, key) the provider would not cache
+        self._creating = {}      # (model, key) -> Event, so concurrent analyzers create a cache only once
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "created": 0, "inline": 0, "expired": 0, "errors": 0}
+
+    def model_for(self, model_name: str, context: str, inline_model):
+        """
+        Returns a model object whose generate_content(prompt) sees `context` followed by the prompt:
+        a model bound to a cached context when possible, otherwise inline_model with the context prefixed.
+        """
+        if len(context) < self.min_chars:
+            self._count("inline")
+            return PrefixedModel(inline_model, context)
+
+        handle = self._get_or_create(model_name, context)
+        if handle is None:
+            self._count("inline")
+            return PrefixedModel(inline_model, context)
+        try:
+            return self.backend.model_for(handle, model_name, inline_model)
+        except Exception as e:
+            logger.warning(f"CONTEXT_CACHE: Could not bind model {model_name} to cached context: {e}")
+            self._count("errors")
+            return PrefixedModel(inline_model, context)
+
+    def _count(self, stat: str, n: int = 1):
+        with self._lock:
+            self.stats[stat] += n
+
+    def _get_or_create(self, model_name: str, context: str):
+        key = context_key(context)
+        entry_key = (model_name, key)
+        self._expire()
+
+        while True:
+            with self._lock:
+                entry = self._entries.get(entry_key)
+                if entry:
+                    self.stats["hits"] += 1
+                    return entry["handle"]
+                if entry_key in self._refused:
+                    return None
+                pending = self._creating.get(entry_key)
+                if pending is None:
+                    self._creating[entry_key] = threading.Event()
+                    self.stats["misses"] += 1
+                    break
+            # Another analyzer thread is creating this page's cache; wait for it and re-check
+            pending.wait(timeout=30)
+
+        handle = None
+        ttl = self.ttl
+        try:
+            handle = self.backend.find(model_name, key)
+            if handle is not None:
+                ttl = min(ttl, self.backend.remaining_ttl(handle) or ttl)
+            else:
+                handle = self.backend.create(model_name, context, key, self.ttl)
+                self._count("created")
+                logger.info(f"CONTEXT_CACHE: Created cached context for {model_name} ({len(context)} chars, ttl {self.ttl}s).")
+        except Exception as e:
+            logger.warning(f"CONTEXT_CACHE: Provider did not cache context for {model_name}: {e}. Sending it inline.")
+            self._count("errors")
+        finally:
+            with self._lock:
+                if handle is not None:
+                    self._entries[entry_key] = {"handle": handle, "expires_at": time.monotonic() + ttl}
+                else:
+                    self._refused.add(entry_key)
+                self._creating.pop(entry_key).set()
+        return handle
+
+    def _expire(self):
+        # The provider drops expired caches itself, so only the local reference needs to go
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, e in self._entries.items() if e["expires_at"] <= now]
+            for k in expired:
+                del self._entries[k]
+            self.stats["expired"] += len(expired)
+
+    def release(self, context: str):
+        """Drop every cached copy of this page's context (all models) before its TTL runs out."""
+        self.release_key(context_key(context))
+
+    def release_key(self, key: str):
+        """release() by context_key(context), e.g. the key run_full_analysis reports."""
+        with self._lock:
+            doomed = [k for k in self._entries if k[1] == key]
+            handles = [self._entries.pop(k)["handle"] for k in doomed]
+        for handle in handles:
+            self._delete(handle)
+
+    def clear(self):
+        with self._lock:
+            handles = [e["handle"] for e in self._entries.values()]
+            self._entries.clear()
+            self._refused.clear()
+        for handle in handles:
+            self._delete(handle)
+
+    def _delete(self, handle):
+        try:
+            self.backend.delete(handle)
+        except Exception as e:
+            logger.warning(f"CONTEXT_CACHE: Failed to delete cached context: {e}")
@@ -0,0 +1,99 @@
+"""
+Process-pool stage for the CPU-bound parts of batch runs: HTML parsing, local readability scoring
+and difflib sentence matching. Everything crossing the process boundary is a plain string, tuple
+or float (never soup objects) to keep pickling cheap, and tasks are submitted in chunks.
+"""
+import os
+import difflib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 1)))
+
+
+def default_chunksize(task_count: int, workers: int) -> int:
+    """Roughly four chunks per worker: few enough to amortise IPC, enough to balance load."""
+    return max(1, task_count // (workers * 4))
+
+
+def _parse_and_score(item: tuple) -> tuple[str, str | None, float | None, str | None]:
+    """(url, html[, content selector]) -> (url, text, score, error). Runs inside a worker process."""
+    from utils.content_fetcher import parse_main_content_html
+    from analyzer.readability_analyzer import compute_readability_score
+
+    url, html = item[:2]
+    selector = item[2] if len(item) > 2 else None
+    try:
+        text = parse_main_content_html(html, selector)
+    except Exception as e:
+        return url, None, None, f"parse failed: {e}"
+
+    score = None
+    if text and not text.isspace():
+        try:
+            score = compute_readability_score(text)
+        except Exception as e:
+            return url, text, None, f"scoring failed: {e}"
+    return url, text, score, None
+
+
+def create_cpu_pool(workers: int = DEFAULT_CPU_WORKERS) -> ProcessPoolExecutor | None:
+    """A pool to reuse across parse_and_score_pages calls (e.g. every window of a batch run); None for inline."""
+    return ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+
+def parse_and_score_pages(pages: list[tuple], workers: int = DEFAULT_CPU_WORKERS,
+                          chunksize: int | None = None, pool: ProcessPoolExecutor | None = None) -> list[dict]:
+    """
+    Parse and score (url, html) pairs, or (url, html, content selector) triples. Returns dicts with url, text, score and error, in input order.
+    workers <= 1 runs inline, which avoids process start-up for tiny batches. Pass a pool from
+    create_cpu_pool to reuse its worker processes; otherwise one is started for this call.
+    """
+    if not pages:
+        return []
+
+    if workers <= 1 or len(pages) == 1:
+        results = map(_parse_and_score, pages)
+        return [dict(zip(("url", "text", "score", "error"), r)) for r in results]
+
+    chunksize = chunksize or default_chunksize(len(pages), min(workers, len(pages)))
+    if pool is not None:
+        results = list(pool.map(_parse_and_score, pages, chunksize=chunksize))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pages))) as own_pool:
+            results = list(own_pool.map(_parse_and_score, pages, chunksize=chunksize))
+    return [dict(zip(("url", "text", "score", "error"), r)) for r in results]
+
+
+# Worker processes only: sentences are shipped once via the pool initializer instead of with every task.
+# The inline path passes sentences explicitly, since several threads (server patch jobs) match at once.
+_worker_sentences: list[str] = []
+
+
+def _set_worker_sentences(sentences: list[str]):
+    global _worker_sentences
+    _worker_sentences = sentences
+
+
+def _closest_sentence(original: str, sentences: list[str] | None = None, cutoff: float = 0.75) -> str | None:
+    candidates = _worker_sentences if sentences is None else sentences
+    matches = difflib.get_close_matches(original, candidates, n=1, cutoff=cutoff)
+    return matches[0] if matches else None
+
+
+def find_close_sentences(originals: list[str], sentences: list[str], workers: int = 1,
+                         chunksize: int | None = None) -> list[str | None]:
+    """
+    For each original, the closest sentence (difflib ratio >= 0.75) or None, in input order.
+    With workers > 1 a pool is started for this call, seeded with `sentences` once per worker.
+    """
+    if workers <= 1 or len(originals) < 2:
+        return [_closest_sentence(o, sentences) for o in originals]
+
+    workers = min(workers, len(originals))
+    chunksize = chunksize or default_chunksize(len(originals), workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_set_worker_sentences,
+                             initargs=(sentences,)) as pool:
+        return list(pool.map(_closest_sentence, originals, chunksize=chunksize))
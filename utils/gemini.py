@@ -1,79 +1,582 @@
 import os
+import json
+import time
 import logging
-import google.generativeai as genai
-from google.api_core.exceptions import ResourceExhausted, GoogleAPIError
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from collections import deque
+from typing import TYPE_CHECKING
+from utils.hedging import Hedger
+from utils.llm_scheduler import get_scheduler, current_priority
+from utils.key_pool import ApiKeyPool, DefaultGeminiClient, GeminiKeyClient, configured_api_keys
+
+# google.generativeai takes seconds to import, so it is loaded on the first model call instead
+if TYPE_CHECKING:
+    import google.generativeai as genai
 
 logger = logging.getLogger(__name__)
 
 PRIMARY_MODEL_NAME = "gemini-2.5-flash-preview-05-20"
 FALLBACK_MODEL_NAME = "gemini-2.0-flash" # Fallback for rate limits
+FAST_MODEL_NAME = "gemini-2.0-flash-lite" # Cheap/fast model for short pages
+
+# Routing policy: the first route whose analyzers and prompt-size bounds match a call picks the
+# ordered model list for that call (later models are fallbacks on ResourceExhausted).
+# Override with GEMINI_MODEL_ROUTES (JSON list) or GEMINI_MODEL_ROUTES_FILE (path to a JSON file).
+DEFAULT_MODEL_ROUTES = [
+    {
+        "name": "short-style-structure",
+        "analyzers": ["style", "structure"],
+        "max_prompt_chars": 20000,
+        "models": [FAST_MODEL_NAME, FALLBACK_MODEL_NAME],
+    },
+    {
+        "name": "short-rewrite",
+        "analyzers": ["rewrite_sentence"],
+        "models": [FAST_MODEL_NAME, FALLBACK_MODEL_NAME],
+    },
+    {
+        "name": "completeness",
+        "analyzers": ["completeness"],
+        "models": [PRIMARY_MODEL_NAME, FALLBACK_MODEL_NAME],
+    },
+    {
+        "name": "default",
+        "models": [PRIMARY_MODEL_NAME, FALLBACK_MODEL_NAME],
+    },
+]
+
+# Latency samples kept per (route, model) for percentile stats
+ROUTE_STATS_WINDOW = 500
 
 # To ensure genai.configure is called only once with a valid key
 gemini_configured = False
 gemini_config_success = False
+_configure_lock = threading.Lock()
+
+# GenerativeModel instances are reused across calls so long-running workers keep warm clients
+_model_cache = {}
+_model_cache_lock = threading.Lock()
+_model_factory = None    # Optional model_name -> model callable replacing GenerativeModel (local stubs)
+
+_hedger = Hedger()
+
+_key_pool = None
+_key_pool_lock = threading.Lock()
+
+_context_cache = None
+_context_cache_lock = threading.Lock()
+
+_model_routes = None
+_route_stats = {}
+_route_stats_lock = threading.Lock()
+
+
+def _load_model_routes() -> list[dict]:
+    raw = os.getenv("GEMINI_MODEL_ROUTES")
+    path = os.getenv("GEMINI_MODEL_ROUTES_FILE")
+    try:
+        if raw:
+            routes = json.loads(raw)
+        elif path:
+            with open(path, "r", encoding="utf-8") as f:
+                routes = json.load(f)
+        else:
+            return DEFAULT_MODEL_ROUTES
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"GEMINI_UTILS: Could not load model routes ({e}). Using default routes.")
+        return DEFAULT_MODEL_ROUTES
+
+    try:
+        return _validate_routes(routes)
+    except ValueError as e:
+        logger.error(f"GEMINI_UTILS: Invalid model routes ({e}). Using default routes.")
+        return DEFAULT_MODEL_ROUTES
+
+
+def _is_str_list(value) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(v, str) and v for v in value)
+
+
+def _validate_routes(routes) -> list[dict]:
+    """
+    Check a routing policy's shape and return it with every route named. Raises ValueError naming
+    the first bad route: models (and analyzers, if given) must be non-empty lists of strings, and
+    the prompt-size bounds numbers. A route without a name is called route-<position>.
+    """
+    if not isinstance(routes, list) or not routes:
+        raise ValueError("routes must be a non-empty list of objects")
+    validated = []
+    for i, route in enumerate(routes):
+        if not isinstance(route, dict):
+            raise ValueError(f"route {i + 1} is not an object")
+        label = route.get("name", f"route {i + 1}")
+        if not _is_str_list(route.get("models")):
+            raise ValueError(f"{label}: 'models' must be a non-empty list of model names")
+        if "analyzers" in route and not _is_str_list(route["analyzers"]):
+            raise ValueError(f"{label}: 'analyzers' must be a non-empty list of analyzer names")
+        for bound in ("min_prompt_chars", "max_prompt_chars"):
+            value = route.get(bound)
+            if bound in route and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise ValueError(f"{label}: '{bound}' must be a number")
+        if not isinstance(route.get("name", ""), str) or not route.get("name"):
+            route = dict(route, name=f"route-{i + 1}")
+        validated.append(route)
+    return validated
+
+
+def set_model_routes(routes: list[dict] | None):
+    """
+    Replace the routing policy at runtime (None reloads it from the environment/defaults).
+    Raises ValueError if the routes are malformed (see _validate_routes).
+    """
+    global _model_routes
+    _model_routes = _validate_routes(routes) if routes is not None else None
+
+
+def select_route(analyzer: str | None, prompt_chars: int) -> dict:
+    """Returns the first route matching the analyzer name and prompt size."""
+    global _model_routes
+    if _model_routes is None:
+        _model_routes = _load_model_routes()
+
+    for route in _model_routes:
+        analyzers = route.get("analyzers")
+        if analyzers and analyzer not in analyzers:
+            continue
+        if prompt_chars < route.get("min_prompt_chars", 0):
+            continue
+        if "max_prompt_chars" in route and prompt_chars > route["max_prompt_chars"]:
+            continue
+        return route
+    return {"name": "default", "models": [PRIMARY_MODEL_NAME, FALLBACK_MODEL_NAME]}
+
+
+def _response_quality(response) -> tuple[bool, bool]:
+    """(usable, json_ok): response has content, and that content parses as JSON after fence stripping."""
+    try:
+        if not response or not response.parts:
+            return False, False
+        text = response.text.strip()
+    except Exception:
+        return False, False
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.endswith("```"):
+        text = text[:-3]
+    try:
+        json.loads(text)
+        return True, True
+    except ValueError:
+        return True, False
+
+
+def _record_route_call(route_name: str, model_name: str, latency: float, outcome: str, response=None):
+    usable, json_ok = _response_quality(response) if outcome == "ok" else (False, False)
+    with _route_stats_lock:
+        stats = _route_stats.setdefault((route_name, model_name), {
+            "calls": 0, "ok": 0, "rate_limited": 0, "errors": 0, "usable": 0, "json_ok": 0,
+            "latencies": deque(maxlen=ROUTE_STATS_WINDOW),
+        })
+        stats["calls"] += 1
+        stats[outcome] += 1
+        stats["usable"] += usable
+        stats["json_ok"] += json_ok
+        if outcome == "ok":
+            stats["latencies"].append(latency)
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float | None:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def get_route_stats() -> list[dict]:
+    """Per (route, model) call counts, latency percentiles and quality rates."""
+    summary = []
+    with _route_stats_lock:
+        items = [(key, dict(stats, latencies=sorted(stats["latencies"]))) for key, stats in _route_stats.items()]
+    for (route_name, model_name), stats in items:
+        latencies = stats.pop("latencies")
+        ok = stats["ok"]
+        summary.append({
+            "route": route_name,
+            "model": model_name,
+            **stats,
+            "latency_p50": _percentile(latencies, 50),
+            "latency_p95": _percentile(latencies, 95),
+            "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+            "usable_rate": stats["usable"] / ok if ok else None,
+            "json_rate": stats["json_ok"] / ok if ok else None,
+        })
+    return summary
+
+
+def log_route_stats():
+    for s in get_route_stats():
+        p50 = f"{s['latency_p50']:.2f}s" if s["latency_p50"] is not None else "n/a"
+        p95 = f"{s['latency_p95']:.2f}s" if s["latency_p95"] is not None else "n/a"
+        json_rate = f"{s['json_rate']:.0%}" if s["json_rate"] is not None else "n/a"
+        logger.info(
+            f"GEMINI_UTILS: route={s['route']} model={s['model']} calls={s['calls']} ok={s['ok']} "
+            f"rate_limited={s['rate_limited']} errors={s['errors']} p50={p50} p95={p95} json={json_rate}"
+        )
+    hedging = get_hedge_stats()
+    if hedging["hedged"] or hedging["budget_denied"]:
+        logger.info(
+            f"GEMINI_UTILS: hedging mode={hedging['mode']} calls={hedging['calls']} hedged={hedging['hedged']} "
+            f"hedge_wins={hedging['hedge_wins']} budget_denied={hedging['budget_denied']}"
+        )
+
+
+class BatchResponse:
+    """Minimal stand-in for GenerateContentResponse built from bulk/batch job output text."""
+
+    def __init__(self, text: str | None):
+        self.text = text or ""
+        self.parts = [self.text] if self.text else []
+        self.prompt_feedback = None
+
+    def __iter__(self):
+        # Lets local stub models answer stream=True calls with a single chunk
+        yield self
+
+    def resolve(self):
+        pass
+
+
+class DeferredCollector:
+    """
+    Captures prompts instead of calling the model (collect mode) and later answers the same
+    prompts from bulk job results (replay mode). See utils.batch_backend.
+    """
+
+    # Returned while collecting so analyzers parse a well-formed (and discarded) result quietly
+    PLACEHOLDER_TEXT = json.dumps({"assessment": "Deferred to bulk job.", "suggestions": []})
+
+    def __init__(self):
+        self.requests = {}   # key -> {"model": ..., "prompt": ...}
+        self.results = None  # key -> response text, set once the bulk jobs finish
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def request_key(prompt_text: str) -> str:
+        return hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+
+    def handle(self, prompt_text: str, route: dict) -> BatchResponse | None:
+        key = self.request_key(prompt_text)
+        if self.results is None:
+            with self._lock:
+                self.requests.setdefault(key, {"model": route["models"][0], "prompt": prompt_text})
+            return BatchResponse(self.PLACEHOLDER_TEXT)
+        text = self.results.get(key)
+        return BatchResponse(text) if text else None
+
+
+_deferred_collector = contextvars.ContextVar("gemini_deferred_collector", default=None)
+
+
+@contextmanager
+def deferred_generation(collector: DeferredCollector):
+    """Route every generate_with_fallback call in this context through collector."""
+    token = _deferred_collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _deferred_collector.reset(token)
+
 
 def _configure_gemini_if_needed(api_key_to_use: str) -> bool:
     """Configures the Gemini API if not already done. Returns True if successful."""
     global gemini_configured, gemini_config_success
-    if not gemini_configured:
-        gemini_configured = True # Attempt configuration only once
-        if not api_key_to_use or api_key_to_use == "YOUR_API_KEY_PLACEHOLDER":
-            logger.warning("GEMINI_UTILS: API key is missing or a placeholder. Gemini calls will be skipped.")
-            gemini_config_success = False
-            return False
+    # Concurrent first calls (parallel analyzers, hedges) must all wait for the one configuration attempt
+    with _configure_lock:
+        if not gemini_configured:
+            gemini_configured = True # Attempt configuration only once
+            if not api_key_to_use or api_key_to_use == "YOUR_API_KEY_PLACEHOLDER":
+                logger.warning("GEMINI_UTILS: API key is missing or a placeholder. Gemini calls will be skipped.")
+                gemini_config_success = False
+                return False
+            try:
+                import google.generativeai as genai
+                genai.configure(api_key=api_key_to_use)
+                logger.info(f"GEMINI_UTILS: Gemini API configured successfully with key ending: ...{api_key_to_use[-4:]}")
+                gemini_config_success = True
+                return True
+            except Exception as e:
+                logger.error(f"GEMINI_UTILS: Error configuring Gemini API: {e}", exc_info=True)
+                gemini_config_success = False
+                return False
+        return gemini_config_success
+
+
+def _get_model(model_name: str) -> "genai.GenerativeModel":
+    """Returns a cached GenerativeModel for model_name, creating it on first use."""
+    with _model_cache_lock:
+        model = _model_cache.get(model_name)
+        if model is None:
+            if _model_factory is not None:
+                model = _model_factory(model_name)
+            else:
+                import google.generativeai as genai
+                model = genai.GenerativeModel(model_name)
+            _model_cache[model_name] = model
+        return model
+
+
+def set_model_factory(factory):
+    """
+    Build models with factory(model_name) instead of genai.GenerativeModel (None restores the SDK),
+    e.g. tests/fakes.py latency_stub_factory() for latency tests without network calls.
+    """
+    global _model_factory
+    with _model_cache_lock:
+        _model_factory = factory
+        _model_cache.clear()
+
+
+def _get_key_pool(api_key: str | None) -> ApiKeyPool | None:
+    """
+    The process-wide credential pool: GEMINI_API_KEYS if set, otherwise just api_key. The first key
+    is the one passed to genai.configure(); the others each get their own transport.
+    """
+    global _key_pool
+    with _key_pool_lock:
+        if _key_pool is None:
+            keys = configured_api_keys(api_key)
+            if not keys:
+                return None
+            _key_pool = ApiKeyPool(keys, client_factory=lambda key: DefaultGeminiClient() if key == keys[0] else GeminiKeyClient(key))
+            get_scheduler().set_key_count(len(keys))
+            if len(keys) > 1:
+                logger.info(f"GEMINI_UTILS: Balancing model calls over {len(keys)} API keys.")
+        return _key_pool
+
+
+def set_key_pool(pool: ApiKeyPool | None):
+    """Replace the credential pool (e.g. ApiKeyPool(keys, client_factory=tests.fakes.FakeKeyClient) in tests)."""
+    global _key_pool
+    with _key_pool_lock:
+        _key_pool = pool
+        if pool is not None:
+            get_scheduler().set_key_count(len(pool))
+
+
+def get_key_pool_stats() -> list[dict]:
+    pool = _key_pool
+    return pool.get_stats() if pool is not None else []
+
+
+def log_key_pool_stats():
+    stats = get_key_pool_stats()
+    if len(stats) < 2:
+        return
+    for s in stats:
+        logger.info(
+            f"GEMINI_UTILS: {s['key']} calls={s['calls']} ok={s['ok']} rate_limited={s['rate_limited']} "
+            f"errors={s['errors']} quarantines={s['quarantines']} quarantined={s['quarantined']}"
+        )
+
+
+def set_hedger(hedger: Hedger):
+    """Replace the request hedger (e.g. Hedger(mode="fallback", min_samples=5) in tests)."""
+    global _hedger
+    _hedger = hedger
+
+
+def get_hedge_stats() -> dict:
+    return _hedger.get_stats()
+
+
+def get_context_cache():
+    """
+    The process-wide document context cache. CONTEXT_CACHE selects the backend: "gemini" (explicit
+    provider caching, default), "local" (in-process stand-in) or "off" (always send context inline).
+    """
+    global _context_cache
+    with _context_cache_lock:
+        if _context_cache is None:
+            from utils.context_cache import ContextCache, GeminiContextCacheBackend, LocalContextCacheBackend
+
+            mode = os.getenv("CONTEXT_CACHE", "gemini").lower()
+            if mode == "off":
+                _context_cache = ContextCache(LocalContextCacheBackend(), min_chars=float("inf"))
+            elif mode == "local":
+                _context_cache = ContextCache(LocalContextCacheBackend())
+            else:
+                _context_cache = ContextCache(GeminiContextCacheBackend())
+        return _context_cache
+
+
+def set_context_cache(cache):
+    """Swap the context cache (e.g. for a ContextCache with a local backend in tests)."""
+    global _context_cache
+    with _context_cache_lock:
+        _context_cache = cache
+
+
+def _stream_content(model, prompt_text: str, on_chunk):
+    """Streams a generation, passing each partial text to on_chunk, and returns the resolved response."""
+    response = model.generate_content(prompt_text, stream=True)
+    for chunk in response:
         try:
-            genai.configure(api_key=api_key_to_use)
-            logger.info(f"GEMINI_UTILS: Gemini API configured successfully with key ending: ...{api_key_to_use[-4:]}")
-            gemini_config_success = True
-            return True
-        except Exception as e:
-            logger.error(f"GEMINI_UTILS: Error configuring Gemini API: {e}", exc_info=True)
-            gemini_config_success = False
-            return False
-    return gemini_config_success
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. safety metadata only) raise on .text
+            continue
+        if text:
+            on_chunk(text)
+    response.resolve()
+    return response
+
+
+def _holding(pool: ApiKeyPool, credential, model_name: str, priority_class: str, call):
+    """
+    Run call() (a model_name request) while holding a scheduler slot and an API key that were
+    acquired for it, then release both with the outcome. Runs on whichever thread makes the request, so a hedged call
+    that loses keeps its slot and key until it actually finishes.
+    """
+    from google.api_core.exceptions import ResourceExhausted
 
+    outcome = "errors"
+    try:
+        result = call()
+        outcome = "ok"
+        return result
+    except ResourceExhausted:
+        outcome = "rate_limited"
+        raise
+    finally:
+        pool.release(credential, model_name, outcome)
+        get_scheduler().release(priority_class)
 
-def generate_with_fallback(prompt_text: str, api_key: str) -> genai.types.GenerateContentResponse | None:
+
+def _hedge_preparer(pool: ApiKeyPool, primary_credential, hedge_model: str, priority_class: str,
+                    prompt_text: str, context: str | None):
+    """prepare_hedge for Hedger.call: a spare slot and (preferably another) key for hedge_model, or None if there is no slot."""
+    def prepare():
+        if not get_scheduler().try_acquire(priority_class):
+            return None
+        credential = pool.acquire(hedge_model, exclude={primary_credential.id}) or pool.acquire(hedge_model)
+        if credential is None:
+            get_scheduler().release(priority_class)
+            return None
+        return lambda name: _holding(
+            pool, credential, name, priority_class,
+            lambda: _bound_model(name, context, credential).generate_content(prompt_text),
+        )
+    return prepare
+
+
+def _bound_model(model_name: str, context: str | None, credential=None):
+    if credential is None or _model_factory is not None:
+        model = _get_model(model_name)
+    else:
+        model = credential.client.model(model_name)
+    if context:
+        if credential is None or credential.client.supports_context_cache:
+            model = get_context_cache().model_for(model_name, context, model)
+        else:
+            from utils.context_cache import PrefixedModel
+            model = PrefixedModel(model, context)
+    return model
+
+
+def generate_with_fallback(prompt_text: str, api_key: str, analyzer: str | None = None,
+                           on_chunk=None, context: str | None = None) -> "genai.types.GenerateContentResponse | None":
     """
-    Generates content using the primary Gemini model, with a fallback to a secondary
-    model in case of specific rate limit errors (ResourceExhausted).
+    Generates content with the models chosen by the routing policy for this analyzer and
+    prompt size, falling back to the next model on rate limit errors (ResourceExhausted).
+    If on_chunk is given the response is streamed (stream=True) and on_chunk(text) is called
+    with each partial text; after a fallback, chunks start again from the next model's output.
+    context is a large shared prefix (the page's document text, see analyzer.prompts) that is sent
+    ahead of prompt_text; it is served from the per-page context cache where the provider allows.
     Returns the response object or None if all attempts fail or API is not configured.
+    Inside deferred_generation() the prompt is collected for a bulk job (or answered from one) instead.
+    Model calls are admitted by the process-wide priority scheduler (utils.llm_scheduler), at
+    the priority class set with llm_priority() (interactive by default).
+    With GEMINI_HEDGING set, a non-streaming call that runs past the model's recent latency
+    percentile is duplicated (see utils.hedging) and the first valid response wins. The duplicate
+    takes its own scheduler slot and API key, and is only sent when a slot is free.
     """
-    if not _configure_gemini_if_needed(api_key):
+    full_length = len(prompt_text) + (len(context) if context else 0)
+    collector = _deferred_collector.get()
+    if collector is not None:
+        return collector.handle((context or "") + prompt_text, select_route(analyzer, full_length))
+
+    pool = _get_key_pool(api_key)
+    if pool is None or not _configure_gemini_if_needed(pool.credentials[0].api_key):
         logger.warning("GEMINI_UTILS: API not configured. Skipping content generation.")
         return None
 
-    models_to_try = [PRIMARY_MODEL_NAME, FALLBACK_MODEL_NAME]
+    from google.api_core.exceptions import ResourceExhausted, GoogleAPIError
+
+    route = select_route(analyzer, full_length)
+    models_to_try = route["models"]
     last_exception = None
 
+    priority_class = current_priority()
     for i, model_name in enumerate(models_to_try):
-        try:
-            logger.info(f"GEMINI_UTILS: Attempting content generation with model: {model_name}")
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt_text)
-            logger.info(f"GEMINI_UTILS: Successfully generated content with {model_name}.")
-            return response
-
-        except ResourceExhausted as re:
-            logger.warning(f"GEMINI_UTILS: ResourceExhausted (rate limit) error with model {model_name}: {re}")
-            last_exception = re
-            if i < len(models_to_try) - 1: # If there's a fallback model left
-                logger.info(f"GEMINI_UTILS: Attempting fallback to model {models_to_try[i+1]}.")
-                continue # Try next model
-            else: 
-                logger.error(f"GEMINI_UTILS: All model attempts failed due to ResourceExhausted.")
-                break 
-
-        except GoogleAPIError as api_err: 
-            logger.error(f"GEMINI_UTILS: GoogleAPIError with model {model_name}: {api_err}", exc_info=True)
-            last_exception = api_err
-            # Do not fallback for general API errors, only for ResourceExhausted
-            break
-
-        except Exception as e:
-            logger.error(f"GEMINI_UTILS: Unexpected error with model {model_name}: {e}", exc_info=True)
-            last_exception = e
-            break
+        # On ResourceExhausted, retry the same model on the other healthy keys before falling back
+        tried_keys = set()
+        while True:
+            # Wait for a model-call slot at this context's priority class (see utils.llm_scheduler)
+            # before taking a key, so a queued call neither counts against a key nor spends its
+            # RPM budget; _holding gives both back when the request finishes
+            get_scheduler().acquire(priority_class)
+            credential = pool.acquire(model_name, exclude=tried_keys)
+            if credential is None:
+                get_scheduler().release(priority_class)
+                break
+            tried_keys.add(credential.id)
+            logger.info(f"GEMINI_UTILS: Attempting content generation with model: {model_name} (route: {route['name']}, {credential.id})")
+            started = time.monotonic()
+            try:
+                if on_chunk is not None:
+                    # Streams are not hedged: two interleaved streams cannot feed one on_chunk
+                    response = _holding(pool, credential, model_name, priority_class, lambda: _stream_content(
+                        _bound_model(model_name, context, credential), prompt_text, on_chunk))
+                    used_model = model_name
+                else:
+                    hedge_model = _hedger.hedge_model_for(models_to_try, i)
+                    response, used_model = _hedger.call(
+                        lambda name: _holding(pool, credential, name, priority_class,
+                                              lambda: _bound_model(name, context, credential).generate_content(prompt_text)),
+                        model_name, hedge_model,
+                        is_valid=lambda r: _response_quality(r)[0],
+                        prepare_hedge=_hedge_preparer(pool, credential, hedge_model, priority_class, prompt_text, context),
+                    )
+                _record_route_call(route["name"], used_model, time.monotonic() - started, "ok", response)
+                logger.info(f"GEMINI_UTILS: Successfully generated content with {used_model}.")
+                return response
+
+            except ResourceExhausted as re:
+                _record_route_call(route["name"], model_name, time.monotonic() - started, "rate_limited")
+                logger.warning(f"GEMINI_UTILS: ResourceExhausted (rate limit) error with model {model_name} ({credential.id}): {re}")
+                last_exception = re
+                continue # Try the next key
+
+            except GoogleAPIError as api_err:
+                _record_route_call(route["name"], model_name, time.monotonic() - started, "errors")
+                logger.error(f"GEMINI_UTILS: GoogleAPIError with model {model_name}: {api_err}", exc_info=True)
+                # Do not fallback for general API errors, only for ResourceExhausted
+                logger.error(f"GEMINI_UTILS: Failed to generate content after all attempts. Last error: {api_err}")
+                return None
+
+            except Exception as e:
+                _record_route_call(route["name"], model_name, time.monotonic() - started, "errors")
+                logger.error(f"GEMINI_UTILS: Unexpected error with model {model_name}: {e}", exc_info=True)
+                logger.error(f"GEMINI_UTILS: Failed to generate content after all attempts. Last error: {e}")
+                return None
+
+        if i < len(models_to_try) - 1: # If there's a fallback model left
+            logger.info(f"GEMINI_UTILS: Attempting fallback to model {models_to_try[i+1]}.")
+        else:
+            logger.error(f"GEMINI_UTILS: All model attempts failed due to ResourceExhausted.")
 
     logger.error(f"GEMINI_UTILS: Failed to generate content after all attempts. Last error: {last_exception}")
     return None 
\ No newline at end of file
@@ -0,0 +1,165 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Hedging is opt-in: GEMINI_HEDGING=same duplicates a slow call to the same model,
+# GEMINI_HEDGING=fallback sends the duplicate to the route's next model
+HEDGING_MODE = os.getenv("GEMINI_HEDGING", "off").lower()
+HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+# Extra hedge calls allowed, as a fraction of primary calls (plus a small burst allowance)
+HEDGE_BUDGET_RATIO = float(os.getenv("GEMINI_HEDGE_BUDGET_RATIO", "0.05"))
+HEDGE_BUDGET_BURST = int(os.getenv("GEMINI_HEDGE_BUDGET_BURST", "2"))
+LATENCY_WINDOW = 200
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies per model, for online percentile estimates."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, model_name: str, latency: float):
+        with self._lock:
+            self._samples.setdefault(model_name, deque(maxlen=self._window)).append(latency)
+
+    def percentile(self, model_name: str, pct: float, min_samples: int = 1) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples.get(model_name, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))]
+
+
+def _start(fn, *args) -> Future:
+    """Run fn(*args) on its own daemon thread, in a copy of the caller's context."""
+    future = Future()
+    ctx = contextvars.copy_context()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(ctx.run(fn, *args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True, name="gemini-hedge").start()
+    return future
+
+
+class Hedger:
+    """
+    Issues a duplicate ("hedge") request when a call runs longer than the model's recent latency
+    percentile, and returns whichever valid response arrives first.
+
+    call(fn, model_name, hedge_model, is_valid, prepare_hedge) runs fn(model_name); once it has
+    taken longer than the threshold, and if the hedge budget allows, a second call is started on
+    hedge_model. prepare_hedge() returns the function for that second call (one that holds its own
+    scheduler slot and API key), or None if there is no spare capacity, in which case no hedge is
+    sent. generate_content is a blocking call and cannot be aborted, so the losing request always
+    runs to completion and spends its quota; only its result is discarded ("discarded" in stats).
+    """
+
+    def __init__(self, mode: str = HEDGING_MODE, percentile: float = HEDGE_PERCENTILE,
+                 min_samples: int = HEDGE_MIN_SAMPLES, budget_ratio: float = HEDGE_BUDGET_RATIO,
+                 budget_burst: int = HEDGE_BUDGET_BURST, tracker: LatencyTracker | None = None):
+        self.mode = mode
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.budget_ratio = budget_ratio
+        self.budget_burst = budget_burst
+        self.tracker = tracker or LatencyTracker()
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0, "no_capacity": 0,
+                      "discarded": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("same", "fallback")
+
+    def hedge_model_for(self, models: list[str], index: int) -> str:
+        if self.mode == "fallback" and index + 1 < len(models):
+            return models[index + 1]
+        return models[index]
+
+    def threshold(self, model_name: str) -> float | None:
+        return self.tracker.percentile(model_name, self.percentile, self.min_samples)
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self.stats["hedged"] + 1 > self.budget_ratio * self.stats["calls"] + self.budget_burst:
+                self.stats["budget_denied"] += 1
+                return False
+            self.stats["hedged"] += 1
+            return True
+
+    def _refund_budget(self):
+        with self._lock:
+            self.stats["hedged"] -= 1
+            self.stats["no_capacity"] += 1
+
+    def _timed(self, fn, model_name: str):
+        started = time.monotonic()
+        result = fn(model_name)
+        self.tracker.record(model_name, time.monotonic() - started)
+        return result
+
+    def call(self, fn, model_name: str, hedge_model: str | None = None, is_valid=None, prepare_hedge=None):
+        """Returns (result, model that produced it). Exceptions from the primary call propagate."""
+        self._count("calls")
+        threshold = self.threshold(model_name) if self.enabled else None
+        if threshold is None:
+            return self._timed(fn, model_name), model_name
+
+        primary = _start(self._timed, fn, model_name)
+        try:
+            return primary.result(timeout=threshold), model_name
+        except FutureTimeoutError:
+            pass
+
+        if not self._take_budget():
+            return primary.result(), model_name
+        hedge_fn = prepare_hedge() if prepare_hedge is not None else fn
+        if hedge_fn is None:
+            self._refund_budget()
+            return primary.result(), model_name
+
+        hedge_model = hedge_model or model_name
+        logger.info(f"GEMINI_UTILS: {model_name} call exceeded p{self.percentile:g} ({threshold:.2f}s); hedging to {hedge_model}.")
+        hedge = _start(self._timed, hedge_fn, hedge_model)
+        attempts = {primary: model_name, hedge: hedge_model}
+        pending = set(attempts)
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and (is_valid is None or is_valid(future.result())):
+                    # The loser keeps running in the background; its result is dropped when it lands
+                    for _ in pending:
+                        self._count("discarded")
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result(), attempts[future]
+
+        # Neither attempt produced a valid response: report the primary's outcome
+        return primary.result(), model_name
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["mode"] = self.mode
+        stats["hedge_rate"] = stats["hedged"] / stats["calls"] if stats["calls"] else 0.0
+        return stats
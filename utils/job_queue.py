@@ -0,0 +1,200 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Terminal job states; anything else is still "in flight"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+FINISHED_STATES = (JOB_DONE, JOB_FAILED)
+
+
+class QueueFullError(Exception):
+    """Raised by JobQueue.submit when the bounded queue cannot take another job."""
+
+
+class Job:
+    def __init__(self, kind: str, dedup_key: str, payload: dict):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.dedup_key = dedup_key
+        self.payload = payload
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = []
+        self._cond = threading.Condition()
+
+    def emit(self, event: str, data=None):
+        """Record a progress event and wake up anyone streaming this job."""
+        with self._cond:
+            self.events.append({"seq": len(self.events), "event": event, "data": data, "ts": time.time()})
+            self._cond.notify_all()
+
+    def set_status(self, status: str, result=None, error=None):
+        with self._cond:
+            self.status = status
+            if status == "running":
+                self.started_at = time.time()
+            if status in FINISHED_STATES:
+                self.finished_at = time.time()
+                self.result = result
+                self.error = error
+        self.emit(status, {"error": error} if error else None)
+
+    def iter_events(self, start: int = 0, heartbeat: float = 15.0):
+        """
+        Yield events from index `start` onwards until the job is finished.
+        Yields None every `heartbeat` seconds without news so callers can keep connections alive.
+        """
+        index = start
+        while True:
+            with self._cond:
+                if index >= len(self.events) and self.status not in FINISHED_STATES:
+                    self._cond.wait(timeout=heartbeat)
+                pending = self.events[index:]
+                finished = self.status in FINISHED_STATES
+            if not pending and not finished:
+                yield None
+                continue
+            for event in pending:
+                yield event
+            index += len(pending)
+            if finished and index >= len(self.events):
+                return
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "events": len(self.events),
+        }
+
+
+class JobQueue:
+    """
+    Bounded job queue drained by a fixed pool of worker threads.
+
+    handlers maps a job kind to handler(job, worker_state) -> result. worker_init() is called once
+    per worker thread to build long-lived state (browsers, model clients) and worker_close(state)
+    when the pool shuts down. Submitting a job whose dedup_key is already queued or running returns
+    the in-flight job instead of enqueueing a duplicate.
+    """
+
+    def __init__(self, handlers: dict, workers: int = 2, max_queue: int = 32,
+                 worker_init=None, worker_close=None, max_finished: int = 500):
+        self.handlers = handlers
+        self.workers = workers
+        self.worker_init = worker_init
+        self.worker_close = worker_close
+        self.max_finished = max_finished
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}
+        self._in_flight = {}
+        self._finished_order = []
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stopping = threading.Event()
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info(f"JOB_QUEUE: Started {self.workers} workers (queue size {self._queue.maxsize}).")
+
+    def stop(self, timeout: float = 30.0):
+        self._stopping.set()
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def submit(self, kind: str, dedup_key: str, payload: dict) -> tuple[Job, bool]:
+        """
+        Enqueue a job. Returns (job, created) where created is False if an identical job was
+        already in flight. Raises QueueFullError when the queue is at capacity.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        with self._lock:
+            existing = self._in_flight.get((kind, dedup_key))
+            if existing is not None:
+                return existing, False
+
+            job = Job(kind, dedup_key, payload)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFullError(f"Job queue is full ({self._queue.maxsize} pending jobs).")
+            self._jobs[job.id] = job
+            self._in_flight[(kind, dedup_key)] = job
+
+        job.emit("queued", {"position": self._queue.qsize()})
+        return job, True
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queued": self._queue.qsize(),
+                "max_queue": self._queue.maxsize,
+                "in_flight": len(self._in_flight),
+                "tracked_jobs": len(self._jobs),
+            }
+
+    def _worker_loop(self):
+        state = None
+        if self.worker_init:
+            try:
+                state = self.worker_init()
+            except Exception as e:
+                logger.error(f"JOB_QUEUE: Worker initialisation failed: {e}", exc_info=True)
+
+        try:
+            while not self._stopping.is_set():
+                job = self._queue.get()
+                if job is None:
+                    break
+                self._run_job(job, state)
+        finally:
+            if self.worker_close and state is not None:
+                try:
+                    self.worker_close(state)
+                except Exception as e:
+                    logger.warning(f"JOB_QUEUE: Worker cleanup failed: {e}")
+
+    def _run_job(self, job: Job, state):
+        job.set_status("running")
+        try:
+            result = self.handlers[job.kind](job, state)
+            job.set_status(JOB_DONE, result=result)
+        except Exception as e:
+            logger.error(f"JOB_QUEUE: Job {job.id} ({job.kind}) failed: {e}", exc_info=True)
+            job.set_status(JOB_FAILED, error=str(e))
+        finally:
+            with self._lock:
+                self._in_flight.pop((job.kind, job.dedup_key), None)
+                self._finished_order.append(job.id)
+                while len(self._finished_order) > self.max_finished:
+                    self._jobs.pop(self._finished_order.pop(0), None)
@@ -0,0 +1,205 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated keys (ideally from separate projects, so each has its own quota)
+GEMINI_API_KEYS_ENV = "GEMINI_API_KEYS"
+KEY_QUARANTINE_AFTER = int(os.getenv("GEMINI_KEY_QUARANTINE_AFTER", "3"))      # consecutive ResourceExhausted
+KEY_QUARANTINE_SECONDS = float(os.getenv("GEMINI_KEY_QUARANTINE_SECONDS", "60"))
+KEY_QUARANTINE_MAX_SECONDS = 900.0
+# Optional per-key requests-per-minute budget; keys at their budget are only used when all are
+KEY_RPM_LIMIT = int(os.getenv("GEMINI_KEY_RPM", "0"))
+
+
+def configured_api_keys(fallback_key: str | None = None) -> list[str]:
+    """Keys from GEMINI_API_KEYS, else the single fallback key (GEMINI_API_KEY)."""
+    keys = [k.strip() for k in os.getenv(GEMINI_API_KEYS_ENV, "").split(",") if k.strip()]
+    if not keys and fallback_key:
+        keys = [fallback_key]
+    return list(dict.fromkeys(keys))
+
+
+class DefaultGeminiClient:
+    """The key passed to genai.configure(): models use the SDK's default client, as context caching does."""
+
+    supports_context_cache = True
+
+    def model(self, model_name: str):
+        from utils.gemini import _get_model
+
+        return _get_model(model_name)
+
+
+class KeyBoundModel:
+    """
+    generate_content() for one model over one key's GenerativeServiceClient. GenerativeModel only
+    talks to the client set up by genai.configure(), so this adapter builds the request from the
+    public genai.protos types and wraps the reply with GenerateContentResponse.from_response /
+    from_iterator, which is what GenerativeModel.generate_content does (google-generativeai 0.8).
+    Only plain-text prompts are supported; that is all the analyzers send.
+    """
+
+    def __init__(self, transport, model_name: str):
+        self.transport = transport
+        self.model_name = model_name if "/" in model_name else f"models/{model_name}"
+
+    def generate_content(self, prompt_text: str, stream: bool = False):
+        import google.generativeai as genai
+
+        request = genai.protos.GenerateContentRequest(
+            model=self.model_name,
+            contents=[genai.protos.Content(role="user", parts=[genai.protos.Part(text=prompt_text)])],
+        )
+        if stream:
+            return genai.types.GenerateContentResponse.from_iterator(self.transport.stream_generate_content(request))
+        return genai.types.GenerateContentResponse.from_response(self.transport.generate_content(request))
+
+
+class GeminiKeyClient:
+    """One API key's own transport, so calls through it are billed to (and limited by) that key."""
+
+    # Explicit context caches live in the default key's project and are not visible to this key
+    supports_context_cache = False
+
+    def __init__(self, api_key: str, transport=None):
+        if transport is None:
+            from google.ai import generativelanguage as glm
+
+            transport = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+        self._transport = transport
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def model(self, model_name: str):
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model = self._models[model_name] = KeyBoundModel(self._transport, model_name)
+            return model
+
+
+class Credential:
+    def __init__(self, key_id: str, api_key: str, client):
+        self.id = key_id
+        self.api_key = api_key
+        self.client = client
+        self.in_flight = 0
+        self.calls = 0
+        self.ok = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.quarantines = 0
+        # Gemini quotas are per model, so rate-limit quarantine is too:
+        # model -> {"consecutive_rate_limited", "quarantines", "quarantined_until"}
+        self.model_health = {}
+        self.recent = deque()          # call start times within the last minute
+
+    def health(self, model_name: str) -> dict:
+        return self.model_health.setdefault(
+            model_name, {"consecutive_rate_limited": 0, "quarantines": 0, "quarantined_until": 0.0})
+
+    def quarantined_until(self, model_name: str) -> float:
+        health = self.model_health.get(model_name)
+        return health["quarantined_until"] if health else 0.0
+
+    def is_quarantined(self, model_name: str, now: float) -> bool:
+        return now < self.quarantined_until(model_name)
+
+    def quarantined_models(self, now: float) -> dict:
+        return {m: round(h["quarantined_until"] - now, 1) for m, h in self.model_health.items()
+                if now < h["quarantined_until"]}
+
+    def calls_last_minute(self, now: float) -> int:
+        while self.recent and now - self.recent[0] > 60:
+            self.recent.popleft()
+        return len(self.recent)
+
+
+class ApiKeyPool:
+    """
+    Load-balances model calls over several API keys. acquire() hands out the healthy key with the
+    fewest calls in flight (then the fewest calls in the last minute); release() records the
+    outcome. A key that hits ResourceExhausted `quarantine_after` times in a row on a model is left
+    out for that model (its other models are unaffected) for quarantine_seconds, doubling on each
+    repeat. If every key is quarantined for a model, the one that recovers first is still used, so
+    a single-key pool behaves like the plain SDK setup.
+    """
+
+    def __init__(self, api_keys: list[str], client_factory=None, quarantine_after: int = KEY_QUARANTINE_AFTER,
+                 quarantine_seconds: float = KEY_QUARANTINE_SECONDS, rpm_limit: int = KEY_RPM_LIMIT):
+        if not api_keys:
+            raise ValueError("ApiKeyPool needs at least one API key.")
+        client_factory = client_factory or GeminiKeyClient
+        self.credentials = [Credential(f"key-{i + 1}...{key[-4:]}", key, client_factory(key))
+                            for i, key in enumerate(api_keys)]
+        self.quarantine_after = quarantine_after
+        self.quarantine_seconds = quarantine_seconds
+        self.rpm_limit = rpm_limit
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.credentials)
+
+    def acquire(self, model_name: str, exclude=()) -> Credential | None:
+        """Pick a key for model_name not in exclude (ids); None once every healthy key has been tried."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [c for c in self.credentials if c.id not in exclude]
+            healthy = [c for c in candidates if not c.is_quarantined(model_name, now)]
+            if healthy:
+                under_budget = [c for c in healthy if not self.rpm_limit or c.calls_last_minute(now) < self.rpm_limit]
+                credential = min(under_budget or healthy, key=lambda c: (c.in_flight, c.calls_last_minute(now)))
+            elif candidates and not exclude:
+                credential = min(candidates, key=lambda c: c.quarantined_until(model_name))
+            else:
+                return None
+            credential.in_flight += 1
+            credential.calls += 1
+            credential.recent.append(now)
+            return credential
+
+    def release(self, credential: Credential, model_name: str, outcome: str):
+        """outcome of a model_name call on this key: "ok", "rate_limited" or "errors"."""
+        with self._lock:
+            credential.in_flight -= 1
+            health = credential.health(model_name)
+            if outcome == "ok":
+                credential.ok += 1
+                health["consecutive_rate_limited"] = 0
+            elif outcome == "rate_limited":
+                credential.rate_limited += 1
+                health["consecutive_rate_limited"] += 1
+                # A key used while already quarantined (every key was) does not extend its quarantine
+                if credential.is_quarantined(model_name, time.monotonic()):
+                    health["consecutive_rate_limited"] = 0
+                elif health["consecutive_rate_limited"] >= self.quarantine_after:
+                    duration = min(KEY_QUARANTINE_MAX_SECONDS, self.quarantine_seconds * 2 ** health["quarantines"])
+                    health["quarantined_until"] = time.monotonic() + duration
+                    health["quarantines"] += 1
+                    health["consecutive_rate_limited"] = 0
+                    credential.quarantines += 1
+                    logger.warning(f"KEY_POOL: Quarantining {credential.id} for {model_name} for {duration:.0f}s after repeated rate limits.")
+            else:
+                credential.errors += 1
+
+    def get_stats(self) -> list[dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "key": c.id,
+                    "in_flight": c.in_flight,
+                    "calls": c.calls,
+                    "ok": c.ok,
+                    "rate_limited": c.rate_limited,
+                    "errors": c.errors,
+                    "calls_last_minute": c.calls_last_minute(now),
+                    "quarantined": c.quarantined_models(now),     # model -> seconds remaining
+                    "quarantines": c.quarantines,
+                }
+                for c in self.credentials
+            ]
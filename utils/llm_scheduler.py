@@ -0,0 +1,484 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_PATCHING = "patching"
+PRIORITY_BATCH = "batch"
+
+# Share of model-call slots each class gets when all of them are waiting
+PRIORITY_WEIGHTS = {PRIORITY_INTERACTIVE: 8, PRIORITY_PATCHING: 4, PRIORITY_BATCH: 1}
+
+# Concurrent model calls allowed per API key in this process (see utils.key_pool); 0 disables scheduling
+LLM_MAX_CONCURRENT_CALLS = int(os.getenv("LLM_MAX_CONCURRENT_CALLS", "8"))
+# Slots batch work may never occupy, so interactive calls do not wait behind long batch calls
+LLM_INTERACTIVE_RESERVED_SLOTS = int(os.getenv("LLM_INTERACTIVE_RESERVED_SLOTS", "1"))
+# A request that has waited this long is dispatched next regardless of weights
+LLM_STARVATION_SECONDS = float(os.getenv("LLM_STARVATION_SECONDS", "30"))
+# SQLite file holding the slot table every process on this host shares (main.py, agent-2.py,
+# batch.py, server.py); "off" keeps a budget per process. Default: llm_slots.db in the temp dir.
+LLM_SCHEDULER_DB = os.getenv("LLM_SCHEDULER_DB")
+SHARED_POLL_SECONDS = 0.05          # How often a queued call checks for a grant made by another process
+SHARED_REAP_SECONDS = 1.0           # How often slots of exited processes are looked for while waiting
+WAIT_STATS_WINDOW = 500
+
+_priority = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority_class: str):
+    """Run every model call in this context (and contexts copied from it) at priority_class."""
+    if priority_class not in PRIORITY_WEIGHTS:
+        raise ValueError(f"Unknown priority class {priority_class!r}; expected one of {sorted(PRIORITY_WEIGHTS)}.")
+    token = _priority.set(priority_class)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+class _Waiter:
+    __slots__ = ("priority_class", "tag", "enqueued", "granted")
+
+    def __init__(self, priority_class: str, tag: float):
+        self.priority_class = priority_class
+        self.tag = tag
+        self.enqueued = time.monotonic()
+        self.granted = threading.Event()
+
+
+def _choose(heads: list, now: float, starvation_seconds: float) -> tuple:
+    """(waiter to dispatch, whether it was promoted for starving) among the queue heads."""
+    starving = [w for w in heads if now - w.enqueued >= starvation_seconds]
+    if starving:
+        return min(starving, key=lambda w: w.enqueued), True
+    return min(heads, key=lambda w: w.tag), False
+
+
+class LLMScheduler:
+    """
+    Weighted fair queuing over a fixed number of concurrent model-call slots.
+
+    Each waiting call gets a virtual finish tag of max(virtual time, its class's last tag) + 1/weight;
+    a free slot goes to the queued call with the smallest tag, so with every class busy, interactive,
+    patching and batch calls are dispatched 8:4:1. A call queued longer than starvation_seconds
+    jumps ahead, and batch calls never take the last `reserved` slots.
+    """
+
+    def __init__(self, capacity: int = LLM_MAX_CONCURRENT_CALLS, weights: dict | None = None,
+                 reserved: int = LLM_INTERACTIVE_RESERVED_SLOTS, starvation_seconds: float = LLM_STARVATION_SECONDS):
+        self.per_key_capacity = capacity
+        self.capacity = capacity
+        self.reserved = reserved
+        self.weights = weights or PRIORITY_WEIGHTS
+        self.batch_limit = max(1, capacity - reserved)
+        self.starvation_seconds = starvation_seconds
+        self._lock = threading.Lock()
+        self._queues = {c: deque() for c in self.weights}
+        self._last_tag = {c: 0.0 for c in self.weights}
+        self._virtual_time = 0.0
+        self._in_flight = {c: 0 for c in self.weights}
+        self._waits = {c: deque(maxlen=WAIT_STATS_WINDOW) for c in self.weights}
+        self._counts = {c: {"dispatched": 0, "starvation_promotions": 0} for c in self.weights}
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def set_key_count(self, keys: int):
+        """Scale the slot count with the number of API keys sharing the load."""
+        with self._lock:
+            self.capacity = self.per_key_capacity * max(1, keys)
+            self.batch_limit = max(1, self.capacity - self.reserved)
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority_class: str | None = None):
+        """Hold one model-call slot for the duration of the block."""
+        if not self.enabled:
+            yield
+            return
+        priority_class = priority_class or current_priority()
+        self.acquire(priority_class)
+        try:
+            yield
+        finally:
+            self.release(priority_class)
+
+    def acquire(self, priority_class: str):
+        """Block until a slot is granted. Pair with release(), possibly from another thread."""
+        if not self.enabled:
+            return
+        with self._lock:
+            tag = max(self._virtual_time, self._last_tag[priority_class]) + 1.0 / self.weights[priority_class]
+            self._last_tag[priority_class] = tag
+            waiter = _Waiter(priority_class, tag)
+            self._queues[priority_class].append(waiter)
+            self._dispatch()
+        waiter.granted.wait()
+
+    def try_acquire(self, priority_class: str) -> bool:
+        """Take a slot only if one is free and nobody is queued (for optional work such as hedges)."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            if any(self._queues.values()) or sum(self._in_flight.values()) >= self.capacity \
+                    or not self._eligible(priority_class):
+                return False
+            self._in_flight[priority_class] += 1
+            self._counts[priority_class]["dispatched"] += 1
+            return True
+
+    def release(self, priority_class: str):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._in_flight[priority_class] -= 1
+            self._dispatch()
+
+    def _eligible(self, priority_class: str, in_flight: dict | None = None) -> bool:
+        in_flight = self._in_flight if in_flight is None else in_flight
+        if priority_class == PRIORITY_BATCH:
+            return in_flight[priority_class] < self.batch_limit
+        return True
+
+    def _dispatch(self):
+        while sum(self._in_flight.values()) < self.capacity:
+            heads = [q[0] for c, q in self._queues.items() if q and self._eligible(c)]
+            if not heads:
+                return
+            now = time.monotonic()
+            waiter, starved = _choose(heads, now, self.starvation_seconds)
+            if starved:
+                self._counts[waiter.priority_class]["starvation_promotions"] += 1
+            self._queues[waiter.priority_class].popleft()
+            self._virtual_time = max(self._virtual_time, waiter.tag)
+            self._in_flight[waiter.priority_class] += 1
+            self._counts[waiter.priority_class]["dispatched"] += 1
+            self._waits[waiter.priority_class].append(now - waiter.enqueued)
+            waiter.granted.set()
+
+    def get_stats(self) -> dict:
+        """Per class: queue depth, calls in flight, dispatch counts and queue wait percentiles (seconds)."""
+        with self._lock:
+            snapshot = {
+                c: (len(self._queues[c]), self._in_flight[c], dict(self._counts[c]), sorted(self._waits[c]))
+                for c in self.weights
+            }
+        stats = {}
+        for c, (depth, in_flight, counts, waits) in snapshot.items():
+            stats[c] = {
+                "queue_depth": depth,
+                "in_flight": in_flight,
+                **counts,
+                "wait_p50": _percentile(waits, 50),
+                "wait_p95": _percentile(waits, 95),
+                "wait_max": waits[-1] if waits else None,
+            }
+        return {"capacity": self.capacity, "classes": stats}
+
+
+SHARED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_slots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pid INTEGER NOT NULL,
+    priority_class TEXT NOT NULL,
+    acquired REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS llm_waiters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pid INTEGER NOT NULL,
+    priority_class TEXT NOT NULL,
+    tag REAL NOT NULL,
+    enqueued REAL NOT NULL,
+    granted INTEGER NOT NULL DEFAULT 0      -- 1 once granted, 2 if granted for starving
+);
+CREATE TABLE IF NOT EXISTS llm_state (name TEXT PRIMARY KEY, value REAL NOT NULL);
+"""
+
+
+class _QueuedCall:
+    __slots__ = ("id", "pid", "priority_class", "tag", "enqueued")
+
+    def __init__(self, row):
+        self.id, self.pid, self.priority_class, self.tag, self.enqueued = row
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        return True     # os.kill(pid, 0) would terminate the process on Windows; never reclaim there
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedLLMScheduler(LLMScheduler):
+    """
+    LLMScheduler whose slots, queued calls and virtual clock live in a SQLite file shared by every
+    process on the host, so an editor's main.py run or an agent-2.py patch run competes with a
+    running batch.py crawl for one budget: the 8:4:1 weights, the starvation rule and the
+    reserved slots apply across processes. Whichever process frees a slot dispatches the next
+    call, in any process; queued calls notice grants from other processes by polling their row.
+    Slots and queued calls left by processes that exited without releasing them are reclaimed.
+    Every process should use the same LLM_MAX_CONCURRENT_CALLS and keys.
+    """
+
+    def __init__(self, path: str, capacity: int = LLM_MAX_CONCURRENT_CALLS, weights: dict | None = None,
+                 reserved: int = LLM_INTERACTIVE_RESERVED_SLOTS, starvation_seconds: float = LLM_STARVATION_SECONDS,
+                 poll_interval: float = SHARED_POLL_SECONDS):
+        super().__init__(capacity, weights, reserved, starvation_seconds)
+        self.path = path
+        self.poll_interval = poll_interval
+        self._conn = None
+        self._conn_pid = None
+        self._local_waiters = {}     # waiter row id -> Event, set when this process grants the call
+        self._last_reap = 0.0
+        self._connect()
+
+    def _connect(self):
+        # A forked child (e.g. a process-pool worker) must not share its parent's connection
+        if self._conn is None or self._conn_pid != os.getpid():
+            import sqlite3
+
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SHARED_SCHEMA)
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _state(conn, name: str) -> float:
+        row = conn.execute("SELECT value FROM llm_state WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0.0
+
+    @staticmethod
+    def _set_state(conn, name: str, value: float):
+        conn.execute("INSERT OR REPLACE INTO llm_state (name, value) VALUES (?, ?)", (name, value))
+
+    def _in_flight_counts(self, conn) -> dict:
+        counts = {c: 0 for c in self.weights}
+        for priority_class, n in conn.execute("SELECT priority_class, COUNT(*) FROM llm_slots GROUP BY priority_class"):
+            counts[priority_class] = counts.get(priority_class, 0) + n
+        return counts
+
+    def set_key_count(self, keys: int):
+        with self._lock:
+            self.capacity = self.per_key_capacity * max(1, keys)
+            self.batch_limit = max(1, self.capacity - self.reserved)
+        if self.enabled:
+            with self._transaction() as conn:
+                self._dispatch_shared(conn)
+
+    def acquire(self, priority_class: str):
+        if not self.enabled:
+            return
+        enqueued = time.monotonic()
+        granted = threading.Event()
+        with self._transaction() as conn:
+            tag = max(self._state(conn, "virtual_time"), self._state(conn, f"last_tag:{priority_class}")) \
+                + 1.0 / self.weights[priority_class]
+            self._set_state(conn, f"last_tag:{priority_class}", tag)
+            waiter_id = conn.execute(
+                "INSERT INTO llm_waiters (pid, priority_class, tag, enqueued) VALUES (?, ?, ?, ?)",
+                (os.getpid(), priority_class, tag, time.time()),
+            ).lastrowid
+            self._local_waiters[waiter_id] = granted
+            self._dispatch_shared(conn)
+
+        completed = False
+        try:
+            while not granted.wait(self.poll_interval):
+                if time.monotonic() - self._last_reap >= SHARED_REAP_SECONDS:
+                    with self._transaction() as conn:
+                        self._dispatch_shared(conn)
+                    continue
+                with self._lock:
+                    row = self._connect().execute("SELECT granted FROM llm_waiters WHERE id = ?", (waiter_id,)).fetchone()
+                if row and row[0]:
+                    break
+            completed = True
+        finally:
+            with self._transaction() as conn:
+                row = conn.execute("SELECT granted FROM llm_waiters WHERE id = ?", (waiter_id,)).fetchone()
+                conn.execute("DELETE FROM llm_waiters WHERE id = ?", (waiter_id,))
+                self._local_waiters.pop(waiter_id, None)
+                granted_as = row[0] if row else 0
+                if granted_as and completed:
+                    self._counts[priority_class]["dispatched"] += 1
+                    if granted_as == 2:
+                        self._counts[priority_class]["starvation_promotions"] += 1
+                    self._waits[priority_class].append(time.monotonic() - enqueued)
+                elif granted_as:
+                    # Interrupted after the grant: nobody will release this slot, so hand it on now
+                    conn.execute(
+                        "DELETE FROM llm_slots WHERE id = (SELECT id FROM llm_slots WHERE pid = ?"
+                        " AND priority_class = ? ORDER BY id DESC LIMIT 1)",
+                        (os.getpid(), priority_class),
+                    )
+                    self._dispatch_shared(conn)
+
+    def try_acquire(self, priority_class: str) -> bool:
+        if not self.enabled:
+            return True
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM llm_waiters WHERE granted = 0 LIMIT 1").fetchone():
+                return False
+            in_flight = self._in_flight_counts(conn)
+            if sum(in_flight.values()) >= self.capacity or not self._eligible(priority_class, in_flight):
+                return False
+            conn.execute("INSERT INTO llm_slots (pid, priority_class, acquired) VALUES (?, ?, ?)",
+                         (os.getpid(), priority_class, time.time()))
+            self._counts[priority_class]["dispatched"] += 1
+            return True
+
+    def release(self, priority_class: str):
+        if not self.enabled:
+            return
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM llm_slots WHERE id = (SELECT id FROM llm_slots WHERE pid = ? AND priority_class = ?"
+                " ORDER BY id LIMIT 1)",
+                (os.getpid(), priority_class),
+            )
+            self._dispatch_shared(conn)
+
+    def _reap(self, conn):
+        """Drop slots and queued calls of processes that exited without giving them back."""
+        self._last_reap = time.monotonic()
+        pids = {pid for (pid,) in conn.execute("SELECT pid FROM llm_slots UNION SELECT pid FROM llm_waiters")}
+        for pid in pids:
+            if pid != os.getpid() and not _pid_alive(pid):
+                slots = conn.execute("DELETE FROM llm_slots WHERE pid = ?", (pid,)).rowcount
+                conn.execute("DELETE FROM llm_waiters WHERE pid = ?", (pid,))
+                logger.warning(f"LLM_SCHEDULER: Reclaimed {slots} slot(s) of exited process {pid}.")
+
+    def _dispatch_shared(self, conn):
+        if time.monotonic() - self._last_reap >= SHARED_REAP_SECONDS:
+            self._reap(conn)
+        in_flight = self._in_flight_counts(conn)
+        queues = {c: deque() for c in self.weights}
+        for row in conn.execute("SELECT id, pid, priority_class, tag, enqueued FROM llm_waiters"
+                                " WHERE granted = 0 ORDER BY tag, id"):
+            call = _QueuedCall(row)
+            if call.priority_class in queues:
+                queues[call.priority_class].append(call)
+
+        virtual_time = self._state(conn, "virtual_time")
+        now = time.time()
+        while sum(in_flight.values()) < self.capacity:
+            heads = [q[0] for c, q in queues.items() if q and self._eligible(c, in_flight)]
+            if not heads:
+                break
+            call, starved = _choose(heads, now, self.starvation_seconds)
+            queues[call.priority_class].popleft()
+            virtual_time = max(virtual_time, call.tag)
+            in_flight[call.priority_class] += 1
+            conn.execute("UPDATE llm_waiters SET granted = ? WHERE id = ?", (2 if starved else 1, call.id))
+            conn.execute("INSERT INTO llm_slots (pid, priority_class, acquired) VALUES (?, ?, ?)",
+                         (call.pid, call.priority_class, now))
+            if call.pid == os.getpid() and call.id in self._local_waiters:
+                self._local_waiters[call.id].set()
+        self._set_state(conn, "virtual_time", virtual_time)
+
+    def get_stats(self) -> dict:
+        """As LLMScheduler.get_stats; queue depth and calls in flight are host-wide, the rest is this process's."""
+        with self._lock:
+            conn = self._connect()
+            depths = dict(conn.execute("SELECT priority_class, COUNT(*) FROM llm_waiters WHERE granted = 0"
+                                       " GROUP BY priority_class").fetchall())
+            in_flight = dict(conn.execute("SELECT priority_class, COUNT(*) FROM llm_slots"
+                                          " GROUP BY priority_class").fetchall())
+            snapshot = {c: (dict(self._counts[c]), sorted(self._waits[c])) for c in self.weights}
+        stats = {}
+        for c, (counts, waits) in snapshot.items():
+            stats[c] = {
+                "queue_depth": depths.get(c, 0),
+                "in_flight": in_flight.get(c, 0),
+                **counts,
+                "wait_p50": _percentile(waits, 50),
+                "wait_p95": _percentile(waits, 95),
+                "wait_max": waits[-1] if waits else None,
+            }
+        return {"capacity": self.capacity, "shared": self.path, "classes": stats}
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float | None:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _build_scheduler() -> LLMScheduler:
+    """The host-wide SharedLLMScheduler, or a per-process LLMScheduler with LLM_SCHEDULER_DB=off."""
+    path = LLM_SCHEDULER_DB
+    if path is None:
+        import tempfile
+
+        path = os.path.join(tempfile.gettempdir(), "llm_slots.db")
+    if path.lower() in ("", "off", "none"):
+        return LLMScheduler()
+    try:
+        return SharedLLMScheduler(path)
+    except Exception as e:
+        logger.warning(f"LLM_SCHEDULER: Could not open shared slot table {path} ({e}); using a per-process budget.")
+        return LLMScheduler()
+
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = _build_scheduler()
+        return _scheduler
+
+
+def set_scheduler(scheduler: LLMScheduler):
+    """Replace the process-wide scheduler (e.g. LLMScheduler(capacity=2) in tests)."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
+
+
+def get_scheduler_stats() -> dict:
+    return get_scheduler().get_stats()
+
+
+def log_scheduler_stats():
+    for priority_class, s in get_scheduler_stats()["classes"].items():
+        if not s["dispatched"]:
+            continue
+        logger.info(
+            f"LLM_SCHEDULER: class={priority_class} dispatched={s['dispatched']} queue_depth={s['queue_depth']} "
+            f"wait_p50={s['wait_p50']:.2f}s wait_p95={s['wait_p95']:.2f}s "
+            f"starvation_promotions={s['starvation_promotions']}"
+        )
@@ -0,0 +1,270 @@
+import os
+import json
+import atexit
+import bisect
+import logging
+import threading
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# "adaptive" waits for the content container to stop changing; "fixed" keeps the old
+# networkidle + selector + 1500 ms sleep sequence (useful for before/after comparisons)
+READINESS_MODE = os.getenv("READINESS_MODE", "adaptive").lower()
+QUIET_WINDOW_MS = int(os.getenv("READINESS_QUIET_MS", "400"))
+MAX_SETTLE_MS = int(os.getenv("READINESS_MAX_SETTLE_MS", "8000"))
+MIN_SETTLE_BUDGET_MS = 2000          # Never give a host less than this, however fast it has been
+SELECTOR_TIMEOUT_MS = 20000
+PROFILE_EWMA_ALPHA = 0.3
+PAGE_PROFILES_PATH = os.getenv("PAGE_PROFILES_PATH", "page_profiles.json")
+# Profiles are written after this many updates, and on flush_host_profiles()/interpreter exit
+PROFILE_SAVE_EVERY = int(os.getenv("READINESS_PROFILE_SAVE_EVERY", "25"))
+
+# In order of preference; the most specific one present once the page has settled is the one the
+# parser extracts from (see content_fetcher.parse_main_content_html), and is remembered per host
+CONTENT_SELECTORS = [".article", "article", "main", "[role='main']"]
+
+ALLOWED_RESOURCE_TYPES = ("document", "script", "xhr")
+# Scripts and beacons that never contribute article content. Zendesk's own CDN (zdassets.com)
+# serves help-center theme and runtime scripts, so it is deliberately not listed; zopim.com is
+# only the chat widget.
+BLOCKED_HOST_FRAGMENTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "facebook.net", "hotjar.com",
+    "segment.com", "segment.io", "intercom.io", "intercomcdn.com", "fullstory.com", "mixpanel.com",
+    "amplitude.com", "newrelic.com", "nr-data.net", "optimizely.com", "zopim.com",
+    "drift.com", "hs-scripts.com", "hs-analytics.net", "clarity.ms", "sentry.io", "cookielaw.org",
+)
+
+FETCH_TIME_BUCKETS = (0.5, 1, 2, 3, 5, 8, 13, 21, 34, 60)   # seconds, upper bounds
+
+# Resolves once the target has had no DOM mutations for quietMs (or maxMs has passed)
+_SETTLE_SCRIPT = """
+([selector, quietMs, maxMs]) => new Promise(resolve => {
+    const start = performance.now();
+    const target = document.querySelector(selector) || document.body;
+    let mutations = 0;
+    let lastMutation = start;
+    let quietTimer = null;
+    let capTimer = null;
+    let done = false;
+    const finish = (timedOut) => {
+        if (done) return;
+        done = true;
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(capTimer);
+        resolve({settleMs: lastMutation - start, elapsedMs: performance.now() - start, mutations, timedOut});
+    };
+    const observer = new MutationObserver(records => {
+        mutations += records.length;
+        lastMutation = performance.now();
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(() => finish(false), quietMs);
+    });
+    observer.observe(target, {childList: true, subtree: true, characterData: true});
+    quietTimer = setTimeout(() => finish(false), quietMs);
+    capTimer = setTimeout(() => finish(true), maxMs);
+})
+"""
+
+
+def should_block(resource_type: str, url: str) -> bool:
+    if resource_type not in ALLOWED_RESOURCE_TYPES:
+        return True
+    host = urlparse(url).netloc.lower()
+    return any(fragment in host for fragment in BLOCKED_HOST_FRAGMENTS)
+
+
+def route_filter(route, request):
+    """Playwright route handler: only first-party documents, scripts and XHR get through."""
+    if should_block(request.resource_type, request.url):
+        route.abort()
+    else:
+        route.continue_()
+
+
+def legacy_route_filter(route, request):
+    """The original rule (resource type only), kept with fixed readiness so "before" timings stay comparable."""
+    if request.resource_type in ALLOWED_RESOURCE_TYPES:
+        route.continue_()
+    else:
+        route.abort()
+
+
+def route_filter_for(mode: str | None = None):
+    return legacy_route_filter if (mode or READINESS_MODE) == "fixed" else route_filter
+
+
+class HostProfiles:
+    """
+    Learned per-host readiness profiles, persisted as JSON: which content selector the host's
+    pages use and how long their content typically keeps changing after it first appears.
+    A profile may also carry a hand-set "quiet_ms" to override the quiet window for that host.
+    """
+
+    def __init__(self, path: str | None = PAGE_PROFILES_PATH, save_every: int = PROFILE_SAVE_EVERY):
+        self.path = path
+        self.save_every = max(1, save_every)
+        self._profiles = None
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._profiles is not None:
+            return
+        self._profiles = {}
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._profiles = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"PAGE_READINESS: Could not read host profiles from {self.path}: {e}")
+
+    def get(self, host: str) -> dict:
+        with self._lock:
+            self._load()
+            return dict(self._profiles.get(host, {}))
+
+    def record(self, host: str, selector: str, settle_ms: float, timed_out: bool):
+        with self._lock:
+            self._load()
+            profile = self._profiles.setdefault(host, {"samples": 0, "timeouts": 0})
+            profile["selector"] = selector
+            previous = profile.get("settle_ms")
+            profile["settle_ms"] = round(settle_ms if previous is None
+                                         else previous + PROFILE_EWMA_ALPHA * (settle_ms - previous), 1)
+            profile["samples"] += 1
+            profile["timeouts"] += int(timed_out)
+            self._unsaved += 1
+            if self._unsaved >= self.save_every:
+                self._save()
+
+    def flush(self):
+        """Write pending profile updates (batch.py calls this at the end of a run)."""
+        with self._lock:
+            if self._unsaved:
+                self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        self._unsaved = 0
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._profiles, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"PAGE_READINESS: Could not save host profiles to {self.path}: {e}")
+
+
+_host_profiles = HostProfiles()
+
+
+def flush_host_profiles():
+    _host_profiles.flush()
+
+
+atexit.register(flush_host_profiles)
+
+
+def settle_budget_ms(profile: dict) -> int:
+    """Cap on the mutation wait: a few times the host's usual settle time, within fixed limits."""
+    if profile.get("settle_ms") is None:
+        return MAX_SETTLE_MS
+    return int(min(MAX_SETTLE_MS, max(MIN_SETTLE_BUDGET_MS, 3 * profile["settle_ms"])))
+
+
+def _wait_for_container(page, profile: dict) -> str:
+    """Wait until some content container exists; returns the one to watch for mutations."""
+    # The host's learned selector is checked first, but any candidate appearing ends the wait
+    known = profile.get("selector")
+    candidates = [known] + [s for s in CONTENT_SELECTORS if s != known] if known else CONTENT_SELECTORS
+    page.wait_for_selector(", ".join(candidates), timeout=SELECTOR_TIMEOUT_MS)
+    return _present_selector(page, candidates) or candidates[0]
+
+
+def _present_selector(page, candidates) -> str | None:
+    for selector in candidates:
+        if page.query_selector(selector) is not None:
+            return selector
+    return None
+
+
+def wait_fixed(page, url: str) -> dict:
+    """The original readiness sequence: full network idle, selector, scroll, fixed sleep."""
+    page.goto(url, timeout=60000, wait_until="networkidle")
+    page.wait_for_selector(".article", timeout=SELECTOR_TIMEOUT_MS)
+    page.mouse.wheel(0, 3000)
+    page.wait_for_timeout(1500)
+    return {"mode": "fixed", "selector": ".article"}
+
+
+def wait_adaptive(page, url: str, profiles: HostProfiles | None = None) -> dict:
+    """
+    Navigate to url and return once the content container exists and has had no DOM mutations
+    for the quiet window. The host's profile supplies the selector and caps the wait; the
+    observed settle time is fed back into it. The returned "selector" is the container the
+    parser should extract from.
+    """
+    profiles = profiles or _host_profiles
+    host = urlparse(url).netloc.lower()
+    profile = profiles.get(host)
+
+    page.goto(url, timeout=60000, wait_until="domcontentloaded")
+    watched = _wait_for_container(page, profile)
+    page.mouse.wheel(0, 3000)
+    result = page.evaluate(_SETTLE_SCRIPT, [watched, profile.get("quiet_ms", QUIET_WINDOW_MS), settle_budget_ms(profile)])
+    # A generic shell (e.g. <main>) may have ended the wait before the article rendered inside it;
+    # the parser reads the most specific container present now, so report (and learn) that one
+    selector = _present_selector(page, CONTENT_SELECTORS) or watched
+
+    profiles.record(host, selector, result["settleMs"], result["timedOut"])
+    if result["timedOut"]:
+        logger.info(f"PAGE_READINESS: {url} still changing after {result['elapsedMs']:.0f} ms; using it as is.")
+    return {"mode": "adaptive", "selector": selector, "settle_ms": result["settleMs"],
+            "mutations": result["mutations"], "timed_out": result["timedOut"]}
+
+
+def wait_until_ready(page, url: str, mode: str | None = None) -> dict:
+    mode = mode or READINESS_MODE
+    if mode == "fixed":
+        return wait_fixed(page, url)
+    return wait_adaptive(page, url)
+
+
+# Fetch-time histograms per readiness mode, so fixed and adaptive runs can be compared
+_fetch_times = {}
+_fetch_times_lock = threading.Lock()
+
+
+def record_fetch_time(mode: str, seconds: float):
+    with _fetch_times_lock:
+        stats = _fetch_times.setdefault(mode, {"count": 0, "total": 0.0, "max": 0.0,
+                                               "buckets": [0] * (len(FETCH_TIME_BUCKETS) + 1)})
+        stats["count"] += 1
+        stats["total"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+        stats["buckets"][bisect.bisect_left(FETCH_TIME_BUCKETS, seconds)] += 1
+
+
+def get_fetch_stats() -> dict:
+    """mode -> count, mean/max seconds and a histogram keyed by bucket upper bound ("+inf" last)."""
+    labels = [f"<={b}s" for b in FETCH_TIME_BUCKETS] + ["+inf"]
+    with _fetch_times_lock:
+        return {
+            mode: {
+                "count": s["count"],
+                "mean": s["total"] / s["count"] if s["count"] else None,
+                "max": s["max"],
+                "histogram": dict(zip(labels, s["buckets"])),
+            }
+            for mode, s in _fetch_times.items()
+        }
+
+
+def log_fetch_stats():
+    for mode, s in get_fetch_stats().items():
+        histogram = " ".join(f"{label}:{n}" for label, n in s["histogram"].items() if n)
+        logger.info(f"PAGE_READINESS: mode={mode} fetches={s['count']} mean={s['mean']:.2f}s "
+                    f"max={s['max']:.2f}s histogram=[{histogram}]")
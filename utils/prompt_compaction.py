@@ -0,0 +1,248 @@
+import os
+import re
+import bisect
+import logging
+
+logger = logging.getLogger(__name__)
+
+ALL_RULES = ("whitespace", "separators", "boilerplate", "duplicates", "tables")
+# "off" disables compaction; otherwise a comma-separated subset of ALL_RULES (default: all of them)
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", ",".join(ALL_RULES))
+# Optional file with one extra boilerplate regex per line, matched against whole normalized lines
+# including any heading marker (so `\[H\d\] Need help\?` drops that heading)
+PROMPT_BOILERPLATE_FILE = os.getenv("PROMPT_BOILERPLATE_FILE")
+
+DUPLICATE_MIN_CHARS = 20            # Short repeated lines ("- Yes", "[H3] Example") are kept
+TABLE_MAX_ROWS = int(os.getenv("PROMPT_TABLE_MAX_ROWS", "12"))
+TABLE_HEAD_ROWS = 6                 # Header plus the first rows of a long table are kept...
+TABLE_TAIL_ROWS = 2                 # ...and its last rows; the middle becomes one summary line
+CHARS_PER_TOKEN = 4                 # Rough estimate used for the per-page report
+
+_SEPARATOR_RE = re.compile(r"^\s*-{3,}(\s*\|\s*-{3,})*\s*$")
+_HEADING_PREFIX_RE = re.compile(r"^\[H[1-6]\] ")
+_WORD_RE = re.compile(r"\S+")
+
+# Help-center chrome that survives parse_main_content, matched case-insensitively against whole
+# non-heading lines. Headings are left alone: a doc may well have a "Sign in" or "Share" section.
+BOILERPLATE_PATTERNS = [
+    r"was this article helpful\??",
+    r"\d+ out of \d+ found this helpful",
+    r"have more questions\?( submit a request)?",
+    r"(submit a request|sign in|skip to (main )?content|return to top|back to top)",
+    r"(related|recently viewed) articles|articles in this section",
+    r"powered by zendesk",
+    r"(previous|next)( article)?",
+    r"(share|print)( this (article|page))?",
+    r"(\d+ )?comments?|please sign in to leave a comment\.?",
+    r"(accept( all)? )?cookies?( settings)?",
+    r"(yes|no)( (yes|no))?",
+]
+# Help-center widgets that are rendered as headings (matched against the heading text)
+BOILERPLATE_HEADING_PATTERNS = [
+    r"was this article helpful\??",
+    r"(related|recently viewed) articles|articles in this section",
+    r"\d+ comments?",
+]
+
+
+def _load_boilerplate_patterns() -> tuple[list, list, list]:
+    """(line patterns, heading patterns, extra patterns from PROMPT_BOILERPLATE_FILE), compiled."""
+    extra = []
+    if PROMPT_BOILERPLATE_FILE:
+        try:
+            with open(PROMPT_BOILERPLATE_FILE, "r", encoding="utf-8") as f:
+                extra = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        except OSError as e:
+            logger.warning(f"PROMPT_COMPACTION: Could not read boilerplate patterns from {PROMPT_BOILERPLATE_FILE}: {e}")
+    return tuple([re.compile(p, re.IGNORECASE) for p in patterns]
+                 for patterns in (BOILERPLATE_PATTERNS, BOILERPLATE_HEADING_PATTERNS, extra))
+
+
+_boilerplate_res = None
+
+
+def enabled_rules() -> tuple:
+    if PROMPT_COMPACTION.strip().lower() in ("off", "none", "0", ""):
+        return ()
+    rules = tuple(r.strip() for r in PROMPT_COMPACTION.split(",") if r.strip())
+    unknown = [r for r in rules if r not in ALL_RULES]
+    if unknown:
+        logger.warning(f"PROMPT_COMPACTION: Ignoring unknown rules {unknown}; valid rules are {list(ALL_RULES)}.")
+    return tuple(r for r in rules if r in ALL_RULES)
+
+
+class CompactedText:
+    """
+    Compacted prompt text plus a piecewise offset map back to the original document.
+
+    Each piece covers text[c_start:c_end] and comes from original[o_start:o_end]. Exact pieces are
+    verbatim copies, so offsets inside them map one-to-one; synthetic pieces (a collapsed whitespace
+    run, a line break, a table summary) map to the whole original range they replaced.
+    """
+
+    def __init__(self, original: str):
+        self.original = original
+        self.text = ""
+        self.dropped = {"separators": 0, "blank": 0, "boilerplate": 0, "duplicates": 0, "table_rows": 0}
+        self._parts = []
+        self._length = 0
+        self._c_starts = []
+        self._pieces = []         # (c_start, c_end, o_start, o_end, exact)
+
+    def _add(self, text: str, o_start: int, o_end: int, exact: bool):
+        c_start = self._length
+        c_end = c_start + len(text)
+        self._length = c_end
+        last = self._pieces[-1] if self._pieces else None
+        if exact and last and last[4] and last[1] == c_start and last[3] == o_start:
+            self._pieces[-1] = (last[0], c_end, last[2], o_end, True)
+        else:
+            self._pieces.append((c_start, c_end, o_start, o_end, exact))
+            self._c_starts.append(c_start)
+        self._parts.append(text)
+
+    def add_exact(self, o_start: int, o_end: int):
+        if o_end > o_start:
+            self._add(self.original[o_start:o_end], o_start, o_end, True)
+
+    def add_synthetic(self, text: str, o_start: int, o_end: int):
+        self._add(text, o_start, o_end, False)
+
+    def finish(self):
+        self.text = "".join(self._parts)
+        self._parts = [self.text]
+        return self
+
+    def _piece_at(self, pos: int):
+        return self._pieces[max(0, bisect.bisect_right(self._c_starts, pos) - 1)]
+
+    def to_original(self, start: int, end: int) -> tuple[int, int]:
+        """Map a [start, end) span of the compacted text to the original text."""
+        if not self._pieces or end <= start:
+            return 0, 0
+        first = self._piece_at(start)
+        o_start = first[2] + (start - first[0]) if first[4] else first[2]
+        last = self._piece_at(end - 1)
+        o_end = last[2] + (end - last[0]) if last[4] else last[3]
+        return o_start, o_end
+
+    def original_text_for(self, snippet: str) -> str | None:
+        """The original text behind a snippet quoted from the compacted text, or None if it is not in it."""
+        index = self.text.find(snippet) if snippet else -1
+        if index < 0:
+            return None
+        o_start, o_end = self.to_original(index, index + len(snippet))
+        return self.original[o_start:o_end]
+
+    def report(self) -> dict:
+        chars_before, chars_after = len(self.original), len(self.text)
+        return {
+            "chars_before": chars_before,
+            "chars_after": chars_after,
+            "estimated_tokens_before": chars_before // CHARS_PER_TOKEN,
+            "estimated_tokens_after": chars_after // CHARS_PER_TOKEN,
+            "saved_ratio": round(1 - chars_after / chars_before, 4) if chars_before else 0.0,
+            "dropped_lines": dict(self.dropped),
+        }
+
+
+def _line_spans(text: str):
+    start = 0
+    for line in text.split("\n"):
+        yield start, start + len(line)
+        start += len(line) + 1
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _is_boilerplate(normalized: str) -> bool:
+    global _boilerplate_res
+    if _boilerplate_res is None:
+        _boilerplate_res = _load_boilerplate_patterns()
+    line_res, heading_res, extra_res = _boilerplate_res
+    if any(p.fullmatch(normalized) for p in extra_res):
+        return True
+    heading = _HEADING_PREFIX_RE.match(normalized)
+    if heading:
+        return any(p.fullmatch(normalized[heading.end():]) for p in heading_res)
+    return any(p.fullmatch(normalized) for p in line_res)
+
+
+def compact_document(text: str, rules: tuple | None = None) -> CompactedText:
+    """
+    Shrink parse_main_content output before it is sent to the analyzers: drop table separator rows,
+    blank lines, help-center boilerplate and repeated lines, collapse whitespace runs, and cut long
+    tables down to their first and last rows. Deterministic for a given text and rule set, so the
+    same map can be rebuilt later (agent-2.py does this to point suggestions at the original text).
+    """
+    rules = enabled_rules() if rules is None else rules
+    compacted = CompactedText(text)
+    if not rules:
+        compacted.add_exact(0, len(text))
+        return compacted.finish()
+
+    kept = []            # (start, end, is_table_row) of the original lines that survive line rules
+    seen = set()
+    for start, end in _line_spans(text):
+        line = text[start:end]
+        normalized = _normalize(line)
+        if "separators" in rules and _SEPARATOR_RE.match(line):
+            compacted.dropped["separators"] += 1
+            continue
+        if "whitespace" in rules and not normalized:
+            compacted.dropped["blank"] += 1
+            continue
+        if "boilerplate" in rules and normalized and _is_boilerplate(normalized):
+            compacted.dropped["boilerplate"] += 1
+            continue
+        if "duplicates" in rules and len(normalized) >= DUPLICATE_MIN_CHARS:
+            if normalized in seen:
+                compacted.dropped["duplicates"] += 1
+                continue
+            seen.add(normalized)
+        kept.append((start, end, " | " in normalized))
+
+    # Group consecutive table rows so long tables can be sampled
+    groups = []
+    for line in kept:
+        if line[2] and groups and groups[-1][0][2]:
+            groups[-1].append(line)
+        else:
+            groups.append([line])
+
+    first_line = True
+    for group in groups:
+        if "tables" in rules and group[0][2] and len(group) > TABLE_MAX_ROWS:
+            omitted = group[TABLE_HEAD_ROWS:len(group) - TABLE_TAIL_ROWS]
+            compacted.dropped["table_rows"] += len(omitted)
+            summary = f"[... {len(omitted)} more rows of this table omitted ...]"
+            lines = group[:TABLE_HEAD_ROWS] + [(omitted[0][0], omitted[-1][1], None)] + group[-TABLE_TAIL_ROWS:]
+        else:
+            lines = group
+            summary = None
+        for start, end, is_row in lines:
+            if not first_line:
+                compacted.add_synthetic("\n", start, start)
+            first_line = False
+            if is_row is None:
+                compacted.add_synthetic(summary, start, end)
+            elif "whitespace" in rules:
+                _add_collapsed(compacted, text, start, end)
+            else:
+                compacted.add_exact(start, end)
+    return compacted.finish()
+
+
+def _add_collapsed(compacted: CompactedText, text: str, start: int, end: int):
+    """Add one line with leading/trailing whitespace dropped and inner whitespace runs collapsed."""
+    previous_end = None
+    for match in _WORD_RE.finditer(text, start, end):
+        if previous_end is not None:
+            if text[previous_end:match.start()] == " ":
+                compacted.add_exact(previous_end, match.start())
+            else:
+                compacted.add_synthetic(" ", previous_end, match.start())
+        compacted.add_exact(match.start(), match.end())
+        previous_end = match.end()
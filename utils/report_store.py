@@ -0,0 +1,304 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.getenv("REPORT_DB_PATH", "reports.db")
+
+# Report keys that get their own full-text column
+SECTION_COLUMNS = {
+    "readability": "readability",
+    "structure_and_flow": "structure",
+    "completeness_of_information": "completeness",
+    "style_guidelines": "style",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    readability_score REAL,
+    completeness_issues INTEGER NOT NULL DEFAULT 0,
+    error_count INTEGER NOT NULL DEFAULT 0,
+    report_json TEXT NOT NULL,
+    content TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reports_url_created ON reports(url, created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_created ON reports(created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_score ON reports(readability_score);
+CREATE INDEX IF NOT EXISTS idx_reports_hash ON reports(content_hash);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+    url, readability, structure, completeness, style,
+    tokenize = 'porter unicode61'
+);
+"""
+
+# Latest report per URL; used as the base for most cross-page queries
+LATEST_REPORTS = """
+SELECT r.* FROM reports r
+JOIN (SELECT url, MAX(created_at) AS created_at FROM reports GROUP BY url) latest
+  ON latest.url = r.url AND latest.created_at = r.created_at
+"""
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
+def _section_text(section) -> str:
+    """Flatten an analyzer section (assessment + suggestions of any shape) into searchable text."""
+    if not isinstance(section, dict):
+        return "" if section is None else str(section)
+    parts = [str(section.get("assessment") or "")]
+    suggestions = section.get("suggestions") or []
+    if not isinstance(suggestions, list):
+        suggestions = [suggestions]
+    for s in suggestions:
+        if isinstance(s, dict):
+            parts.extend(str(v) for v in s.values() if v)
+        else:
+            parts.append(str(s))
+    return "\n".join(p for p in parts if p)
+
+
+def _readability_score(report: dict):
+    score = (report.get("readability") or {}).get("score")
+    try:
+        return float(score) if score is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _completeness_issue_count(report: dict) -> int:
+    suggestions = (report.get("completeness_of_information") or {}).get("suggestions") or []
+    return len(suggestions) if isinstance(suggestions, list) else 1
+
+
+class ReportStore:
+    """
+    Embedded SQLite store for analysis reports. Every run is kept (keyed by URL, content hash and
+    timestamp) and section text is indexed with FTS5 so the whole doc set can be queried.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        try:
+            self._conn.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"REPORT_STORE: FTS5 unavailable ({e}); falling back to LIKE searches.")
+            self.has_fts = False
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_report(self, report: dict, content: str = "", created_at: float | None = None) -> int:
+        return self.add_reports([(report, content, created_at)])[0]
+
+    def add_reports(self, items) -> list[int]:
+        """
+        Bulk insert (report, content, created_at) tuples in a single transaction.
+        created_at may be None to use the current time. Returns the new row ids.
+        """
+        now = time.time()
+        rows = []
+        for report, content, created_at in items:
+            rows.append((
+                report.get("url_analyzed") or "",
+                content_hash(content),
+                created_at if created_at is not None else now,
+                _readability_score(report),
+                _completeness_issue_count(report),
+                len(report.get("errors") or []),
+                json.dumps(report, ensure_ascii=False),
+                content,
+                [_section_text(report.get(key)) for key in SECTION_COLUMNS],
+            ))
+        if not rows:
+            return []
+
+        ids = []
+        with self._lock, self._conn:
+            cur = self._conn.cursor()
+            for row in rows:
+                cur.execute(
+                    "INSERT INTO reports (url, content_hash, created_at, readability_score, completeness_issues,"
+                    " error_count, report_json, content) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    row[:8],
+                )
+                ids.append(cur.lastrowid)
+            if self.has_fts:
+                cur.executemany(
+                    "INSERT INTO reports_fts (rowid, url, readability, structure, completeness, style)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [(row_id, row[0], *row[8]) for row_id, row in zip(ids, rows)],
+                )
+        logger.info(f"REPORT_STORE: Stored {len(ids)} report(s) in {self.path}.")
+        return ids
+
+    def _query(self, sql: str, params=()) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row_to_dict(r) for r in rows]
+
+    @staticmethod
+    def _row_to_dict(row) -> dict:
+        d = dict(row)
+        if "report_json" in d:
+            d["report"] = json.loads(d.pop("report_json"))
+        d.pop("content", None)
+        return d
+
+    def history(self, url: str) -> list[dict]:
+        return self._query("SELECT * FROM reports WHERE url = ? ORDER BY created_at DESC", (url,))
+
+    def latest(self, url: str) -> dict | None:
+        rows = self._query("SELECT * FROM reports WHERE url = ? ORDER BY created_at DESC LIMIT 1", (url,))
+        return rows[0] if rows else None
+
+    def worst_readability(self, limit: int = 10) -> list[dict]:
+        """Latest report per URL, lowest Flesch reading ease first."""
+        return self._query(
+            f"SELECT * FROM ({LATEST_REPORTS}) WHERE readability_score IS NOT NULL"
+            " ORDER BY readability_score ASC LIMIT ?",
+            (limit,),
+        )
+
+    def search(self, term: str, section: str = "completeness", limit: int = 50,
+               issues_only: bool = False, raw: bool = False) -> list[dict]:
+        """
+        Latest reports whose `section` text (readability/structure/completeness/style) matches term.
+        term is matched as a phrase, so "in-app" or "iOS/Android" work as typed. With raw=True it is
+        passed to FTS5 as query syntax (e.g. 'segment AND "push notification"'); a malformed query
+        raises ValueError. issues_only keeps pages with completeness issues (filtered before LIMIT).
+        """
+        if section not in SECTION_COLUMNS.values():
+            raise ValueError(f"Unknown section '{section}'. Expected one of {sorted(SECTION_COLUMNS.values())}.")
+        issues_filter = " AND l.completeness_issues > 0" if issues_only else ""
+        if self.has_fts:
+            sql = (
+                f"SELECT l.*, bm25(reports_fts) AS rank FROM reports_fts"
+                f" JOIN ({LATEST_REPORTS}) l ON l.id = reports_fts.rowid"
+                f" WHERE reports_fts MATCH ?{issues_filter} ORDER BY rank LIMIT ?"
+            )
+            try:
+                query = term if raw else fts_phrase(term)
+                return self._query(sql, (f"{section}: ({query})", limit))
+            except sqlite3.OperationalError as e:
+                if _is_fts_query_error(e):
+                    raise ValueError(f"Invalid search query {term!r}: {e}") from e
+                raise
+
+        key = next(k for k, v in SECTION_COLUMNS.items() if v == section)
+        sql = (
+            f"SELECT * FROM ({LATEST_REPORTS}) l"
+            f" WHERE json_extract(l.report_json, '$.{key}') LIKE ?{issues_filter} LIMIT ?"
+        )
+        return self._query(sql, (f"%{term}%", limit))
+
+    def completeness_issues(self, term: str, limit: int = 50) -> list[dict]:
+        """Pages with completeness suggestions mentioning term."""
+        return self.search(term, section="completeness", limit=limit, issues_only=True)
+
+    def changed_since(self, since: float) -> list[dict]:
+        """
+        Reports recorded after `since` whose content differs from the last report for the
+        same URL before that time (new URLs are included too).
+        """
+        sql = f"""
+        SELECT l.*, prev.content_hash AS previous_hash, prev.readability_score AS previous_score
+        FROM ({LATEST_REPORTS}) l
+        LEFT JOIN reports prev ON prev.id = (
+            SELECT id FROM reports p WHERE p.url = l.url AND p.created_at < ?
+            ORDER BY p.created_at DESC LIMIT 1
+        )
+        WHERE l.created_at >= ? AND (prev.id IS NULL OR prev.content_hash != l.content_hash)
+        ORDER BY l.created_at DESC
+        """
+        return self._query(sql, (since, since))
+
+
+def fts_phrase(term: str) -> str:
+    """term as a single FTS5 phrase: punctuation inside it (e.g. "opt-in") is no longer query syntax."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _is_fts_query_error(e: sqlite3.OperationalError) -> bool:
+    """FTS5 reports query syntax problems as OperationalError; tell them apart from e.g. a locked database."""
+    message = str(e)
+    return message.startswith(("fts5:", "no such column", "unterminated string"))
+
+
+def _print_rows(rows):
+    for r in rows:
+        score = r.get("readability_score")
+        score_text = f"{score:.1f}" if isinstance(score, (int, float)) else "n/a"
+        stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(r["created_at"]))
+        print(f"{stamp}  score={score_text:>6}  completeness_issues={r['completeness_issues']}  {r['url']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query stored documentation analysis reports.")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    worst = sub.add_parser("worst", help="Pages with the lowest readability scores")
+    worst.add_argument("--limit", type=int, default=10)
+    search = sub.add_parser("search", help="Full-text search over a report section")
+    search.add_argument("term")
+    search.add_argument("--section", default="completeness", choices=sorted(SECTION_COLUMNS.values()))
+    search.add_argument("--raw", action="store_true", help="Treat term as FTS5 query syntax instead of a phrase")
+    changed = sub.add_parser("changed", help="Pages whose content changed in the last N days")
+    changed.add_argument("--days", type=float, default=7)
+    history = sub.add_parser("history", help="All stored reports for one URL")
+    history.add_argument("url")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No report database at '{args.db}'.", file=sys.stderr)
+        return 1
+
+    with ReportStore(args.db) as store:
+        if args.command == "worst":
+            _print_rows(store.worst_readability(args.limit))
+        elif args.command == "search":
+            try:
+                rows = store.search(args.term, section=args.section, raw=args.raw)
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                return 2
+            _print_rows(rows)
+        elif args.command == "changed":
+            _print_rows(store.changed_since(time.time() - args.days * 86400))
+        elif args.command == "history":
+            _print_rows(store.history(args.url))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())